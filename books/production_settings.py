@@ -0,0 +1,53 @@
+"""
+Settings for production workers, ``DJANGO_SETTINGS_MODULE=books.production_settings``.
+
+Those of ``books.settings`` with ``DEBUG`` off and without the debug
+toolbar. The secret key and allowed hosts come from the environment:
+``DJANGO_SECRET_KEY`` and ``BOOKS_ALLOWED_HOSTS`` (comma separated), both
+required.
+
+With ``BOOKS_API_ONLY=1`` a worker serves the book API only: the admin,
+the GitHub login (``social_django``), messages and static files are neither
+installed nor routed, so the worker never imports them and boots faster
+(``manage.py bench startup``). Sessions of the GitHub login are not
+recognised there, only those of ``ModelBackend`` logins: send logins, the
+admin and the writes of GitHub users to full workers.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from books.settings import *  # noqa: F401,F403
+from books.settings import AUTHENTICATION_BACKENDS, INSTALLED_APPS, MIDDLEWARE, TEMPLATES
+
+DEBUG = False
+
+# Never the development key of books.settings, it is public.
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Set DJANGO_SECRET_KEY for books.production_settings.')
+
+ALLOWED_HOSTS = [host for host in os.environ.get('BOOKS_ALLOWED_HOSTS', '').split(',') if host]
+if not ALLOWED_HOSTS:
+    raise ImproperlyConfigured('Set BOOKS_ALLOWED_HOSTS for books.production_settings.')
+
+API_ONLY = os.environ.get('BOOKS_API_ONLY') in ('1', 'true')
+
+DEBUG_APPS = ['debug_toolbar']
+# Apps of the pages around the API, not installed in API-only workers.
+SITE_APPS = ['django.contrib.admin', 'django.contrib.messages', 'django.contrib.staticfiles', 'social_django']
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS
+                  if app not in DEBUG_APPS and not (API_ONLY and app in SITE_APPS)]
+
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if not middleware.startswith('debug_toolbar')]
+
+if API_ONLY:
+    MIDDLEWARE = [middleware for middleware in MIDDLEWARE
+                  if middleware != 'django.contrib.messages.middleware.MessageMiddleware']
+    TEMPLATES = [dict(TEMPLATES[0], OPTIONS=dict(TEMPLATES[0]['OPTIONS'], context_processors=[
+        processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+        if processor != 'django.contrib.messages.context_processors.messages'
+    ]))]
+    AUTHENTICATION_BACKENDS = tuple(backend for backend in AUTHENTICATION_BACKENDS
+                                    if not backend.startswith('social_core.'))
@@ -40,10 +40,12 @@ INSTALLED_APPS = [
     'rest_framework',
     'social_django',
 
-    'shop'
+    'shop.apps.ShopConfig'
 ]
 
 MIDDLEWARE = [
+    'shop.metrics.RequestMetricsMiddleware',
+    'shop.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,15 +83,84 @@ WSGI_APPLICATION = 'books.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        # psycopg2 with an in-process connection pool, see shop/backends/postgresql_pool
+        'ENGINE': 'shop.backends.postgresql_pool',
         'NAME': 'books_db',
         'USER': 'admin',
         'PASSWORD': 'admin',
         'HOST': 'localhost',
         'PORT': '5432',
+        # Connections go back to the pool at the end of every request.
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'pool': {
+                # At least the threads of a process doing database work.
+                'max_size': 20,
+                'timeout': 5.0,
+                'max_lifetime': 1800.0,
+                'max_idle': 600.0,
+                'check_interval': 30.0,
+            },
+        },
+    }
+}
+
+# Aliases of read replicas of the default database, see shop/routers.py, e.g.
+# DATABASES['replica'] = {...} and DATABASE_REPLICAS = ['replica']
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['shop.routers.ReplicaRouter']
+# Reads stay on the primary this long after a client's write
+REPLICA_LAG_SECONDS = 5.0
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# Cache used for book list/detail responses, see shop/cache.py
+BOOK_CACHE_ALIAS = 'default'
+BOOK_CACHE_TIMEOUT = 300
+# Concurrent misses of the same book detail share one query, see shop/coalescing.py
+BOOK_COALESCE_READS = True
+BOOK_COALESCE_TIMEOUT = 10.0
+
+# Upper bounds of the price buckets of /book/facets/, see shop/facets.py.
+# Run manage.py rebuild_book_facets after changing them.
+BOOK_PRICE_BUCKETS = [10, 25, 50, 100, 250, 500]
+
+# Delta sync tokens stay this far behind the clock, see shop/sync.py
+BOOK_SYNC_SETTLE_SECONDS = 10.0
+
+# Queue book_relation PATCHes and write them in batches, see shop/writebehind.py
+RELATION_WRITE_BEHIND = False
+# Directory of the per-process logs of queued changes, None keeps them in memory only
+RELATION_WRITE_BEHIND_DIR = None
+RELATION_WRITE_BEHIND_INTERVAL = 1.0
+RELATION_WRITE_BEHIND_BATCH_SIZE = 500
+
+# Token buckets of book_relation writes per user and per IP, see shop/throttling.py
+RELATION_THROTTLE_RATES = {'user': '120/min', 'ip': '600/min'}
+
+# Threads running the database work of the async views, see shop/async_views.py
+ASYNC_DB_THREADS = 20
+
+# Share of requests timed by shop.metrics.RequestMetricsMiddleware (0 to 1)
+REQUEST_METRICS_SAMPLE_RATE = 0.1
+# Directory the per-process histograms are dumped to for `manage.py request_metrics`
+REQUEST_METRICS_DIR = None
+REQUEST_METRICS_FLUSH_INTERVAL = 10.0
+# Clients allowed to read /__metrics__/ besides staff users
+REQUEST_METRICS_ALLOWED_IPS = []
+
+# File slow queries are logged to, None disables the log, see shop/slowlog.py
+SLOW_QUERY_LOG = None
+SLOW_QUERY_THRESHOLD_MS = 100
+# Share of the slow SELECTs explained (EXPLAIN ANALYZE runs them again)
+SLOW_QUERY_EXPLAIN_RATE = 0.05
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+
 SOCIAL_AUTH_POSTGRES_JSONFIELD = True
 
 # Authentication backends
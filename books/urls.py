@@ -1,10 +1,10 @@
-import debug_toolbar
+from django.apps import apps
 from django.conf.urls import url
-from django.contrib import admin
 from django.urls import path, include
 
 from rest_framework.routers import SimpleRouter
 
+from shop import async_views, metrics
 from shop.views import BookViewSet, auth, UserBookRelationView
 
 router = SimpleRouter()
@@ -12,10 +12,29 @@ router.register(r'book', BookViewSet)
 router.register(r'book_relation', UserBookRelationView)
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
-    url('', include('social_django.urls', namespace='social')),
-    path('auth/', auth),
-    path('__debug__/', include(debug_toolbar.urls)),
+    path('__metrics__/', metrics.metrics_view, name='request-metrics'),
+    # Async read routes for ASGI servers, see shop/async_views.py
+    path('async/book/', async_views.book_list, name='async-book-list'),
+    path('async/book/<int:pk>/', async_views.book_detail, name='async-book-detail'),
+    path('async/book_relation/', async_views.relation_list, name='async-userbookrelation-list'),
 ]
 
+# Only imported where installed, API-only workers have none of them
+# (see books/production_settings.py).
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.append(path('admin/', admin.site.urls))
+
+if apps.is_installed('social_django'):
+    urlpatterns += [
+        url('', include('social_django.urls', namespace='social')),
+        path('auth/', auth),
+    ]
+
+if apps.is_installed('debug_toolbar'):
+    import debug_toolbar
+
+    urlpatterns.append(path('__debug__/', include(debug_toolbar.urls)))
+
 urlpatterns += router.urls
@@ -2,5 +2,18 @@ from django.contrib import admin
 
 from shop.models import Book, UserBookRelation
 
-admin.site.register(Book)
-admin.site.register(UserBookRelation)
\ No newline at end of file
+
+@admin.register(Book)
+class BookAdmin(admin.ModelAdmin):
+    list_display = ('name', 'author_name', 'price', 'owner')
+    list_select_related = ('owner',)
+
+
+@admin.register(UserBookRelation)
+class UserBookRelationAdmin(admin.ModelAdmin):
+    raw_id_fields = ('user', 'book')
+
+    def get_queryset(self, request):
+        # __str__ reads the user and the book, load them on the change list
+        # and the change/delete pages alike.
+        return super().get_queryset(request).select_related('user', 'book')
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ShopConfig(AppConfig):
     name = 'shop'
+
+    def ready(self):
+        from shop import cache, metrics, signals, slowlog, writebehind  # noqa: F401
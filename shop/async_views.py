@@ -0,0 +1,132 @@
+"""
+Async read endpoints for ASGI deployments.
+
+Django 3.1 has no async ORM and DRF views are sync. Under ASGI Django runs
+sync views through ``sync_to_async(thread_sensitive=True)``, which with this
+asgiref version is a single thread shared by the whole process, so every
+request waits for that one thread no matter how many are in flight.
+
+The views here are async instead:
+
+* A book list/detail response already in the response cache is served on
+  the event loop, without any thread, when the cache is in-process
+  (``LocMemCache``).
+* Everything else runs the regular DRF view, with its database queries, on
+  a pool of ``settings.ASYNC_DB_THREADS`` threads. Each thread holds its own
+  connection, closed or kept between requests as ``CONN_MAX_AGE`` says.
+
+Responses are the same as those of the sync routes. Streamed lists are
+buffered, since the ASGI handler would iterate them on the event loop.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import close_old_connections
+from django.http import HttpResponse, HttpResponseNotAllowed
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.request import Request
+
+from shop.cache import get_cache
+from shop.views import BookViewSet, UserBookRelationView
+
+book_list_view = BookViewSet.as_view({'get': 'list'})
+book_detail_view = BookViewSet.as_view({'get': 'retrieve'})
+relation_list_view = UserBookRelationView.as_view({'get': 'list'})
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'ASYNC_DB_THREADS', 20),
+                                               thread_name_prefix='shop-db')
+    return _executor
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    loop = asyncio.get_event_loop()
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(), call)
+
+
+def call_view(view, request, **kwargs):
+    """
+    Run a sync view and return its response fully rendered, as a plain
+    ``HttpResponse`` the ASGI handler can send without a thread hop.
+    """
+    close_old_connections()
+    try:
+        response = view(request, **kwargs)
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            if hasattr(response, 'render'):
+                response.render()
+            content = response.content
+        plain = HttpResponse(content, status=response.status_code)
+        for header, value in response.items():
+            plain[header] = value
+        return plain
+    finally:
+        close_old_connections()
+
+
+def get_cached_on_loop(request, prefix):
+    """
+    The cached book response for ``request``, looked up without touching
+    the database, or ``None`` if it has to go through the view.
+    """
+    if not isinstance(get_cache(), LocMemCache):
+        return None
+    view = BookViewSet(format_kwarg=None)
+    drf_request = Request(request)
+    try:
+        drf_request.accepted_renderer, drf_request.accepted_media_type = \
+            view.perform_content_negotiation(drf_request)
+    except NotAcceptable:
+        return None
+    if (view.is_streaming(drf_request) or view.includes_my_relation(drf_request) or
+            view.since_query_param in drf_request.query_params):
+        # Not cached, or cached depending on the user.
+        return None
+    key = view.get_cache_key(drf_request, prefix())
+    return view.get_cached_response(drf_request, key)
+
+
+def safe_methods_only(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@safe_methods_only
+async def book_list(request):
+    response = get_cached_on_loop(request, BookViewSet.list_cache_prefix)
+    if response is None:
+        response = await run_in_db_thread(call_view, book_list_view, request)
+    return response
+
+
+@safe_methods_only
+async def book_detail(request, pk):
+    response = get_cached_on_loop(request, functools.partial(BookViewSet.detail_cache_prefix, pk))
+    if response is None:
+        response = await run_in_db_thread(call_view, book_detail_view, request, pk=pk)
+    return response
+
+
+@safe_methods_only
+async def relation_list(request):
+    return await run_in_db_thread(call_view, relation_list_view, request)
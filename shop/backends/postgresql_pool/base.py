@@ -0,0 +1,133 @@
+"""
+PostgreSQL backend drawing its connections from a ``shop.pool.ConnectionPool``.
+
+Use ``'ENGINE': 'shop.backends.postgresql_pool'`` and configure the pool with
+``OPTIONS['pool']``, a dict of ``ConnectionPool`` arguments (``max_size``,
+``timeout``, ``max_lifetime``, ``max_idle``, ``check_interval``). Opening a
+connection takes one from the pool, closing it gives it back after rolling
+back anything left open and resetting the session (``DISCARD ALL``), so
+Django's usual per-request connect/close (``CONN_MAX_AGE = 0``) costs no new
+PostgreSQL session. Keep ``max_size`` at or above the number of threads
+doing database work in a process (WSGI threads, ``ASYNC_DB_THREADS``) and
+the sum over processes below the server's ``max_connections``.
+
+There is one pool per process and set of connection parameters, shared by
+all threads. Under ASGI database code still runs in threads (Django 3.1 has
+no async ORM), so the pool is only ever used from threads.
+"""
+import os
+import threading
+
+import psycopg2.extensions
+import psycopg2.extras
+from django.db.backends.postgresql import base, creation
+
+from shop.pool import ConnectionPool, PoolTimeout
+
+Database = base.Database
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def connect(conn_params, isolation_level):
+    connection = Database.connect(**conn_params)
+    if isolation_level is not None and isolation_level != connection.isolation_level:
+        connection.set_session(isolation_level=isolation_level)
+    # Same as DatabaseWrapper.get_new_connection().
+    psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+    return connection
+
+
+def check(connection):
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Database.Error:
+        return False
+    return True
+
+
+def reset(connection):
+    """
+    Roll back what the last user left open and drop its session state:
+    ``SET`` parameters, temporary tables, prepared statements and the
+    ``WITH HOLD`` cursors of ``.iterator()`` under autocommit. Django sets
+    the time zone again when it takes the connection.
+    """
+    if connection.closed:
+        return False
+    if connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    autocommit = connection.autocommit
+    try:
+        # DISCARD ALL refuses to run inside a transaction block.
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute('DISCARD ALL')
+        connection.autocommit = autocommit
+    except Database.Error:
+        return False
+    return connection.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+def get_pool(conn_params, options):
+    pool_options = dict(options.get('pool') or {})
+    isolation_level = options.get('isolation_level')
+    key = (os.getpid(), tuple(sorted((name, str(value)) for name, value in conn_params.items())),
+           isolation_level, tuple(sorted(pool_options.items())))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(
+                    lambda: connect(conn_params, isolation_level), check=check, reset=reset, **pool_options
+                )
+    return pool
+
+
+def close_pools(database=None):
+    """
+    Close the idle connections of every pool of this process, or of those
+    connecting to ``database``.
+    """
+    with _pools_lock:
+        for key in list(_pools):
+            pid, params, _, _ = key
+            if pid == os.getpid() and (database is None or ('database', database) in params):
+                _pools.pop(key).close()
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # PostgreSQL refuses to drop a database with open sessions.
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        self.pool = get_pool(conn_params, self.settings_dict['OPTIONS'])
+        try:
+            connection = self.pool.acquire()
+        except PoolTimeout as e:
+            raise Database.OperationalError(str(e)) from e
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            # Closed inside atomic() Django keeps a reference to the
+            # connection until the block exits, it must not be handed out.
+            discard = self.in_atomic_block or (self.errors_occurred and not self.is_usable())
+            self.pool.release(self.connection, discard=discard)
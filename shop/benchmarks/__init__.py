@@ -0,0 +1,34 @@
+"""
+Benchmark suites run by ``manage.py bench``.
+
+Each suite is a module in this package exposing ``run(command, options)``.
+Suites run against a throwaway test database that the command creates and
+fills with ``shop.seeding.seed()``, the data ``manage.py seed_books`` writes.
+They write their report to ``command.stdout`` and hand their numbers to
+``command.record()`` for the JSON output.
+"""
+import statistics
+import time
+
+SUITES = ['api', 'serializer', 'formats', 'search', 'filters', 'facets', 'sync', 'asgi', 'pool', 'startup']
+
+
+def best_of(func, repeat):
+    """
+    Call ``func`` ``repeat`` times and return the fastest wall time in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def percentile(values, fraction):
+    """
+    The ``fraction`` (0-1) percentile of ``values``, 0 without values.
+    """
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[round(fraction * 100) - 1]
@@ -0,0 +1,130 @@
+"""
+Latency, throughput and SQL cost of each API endpoint, requested one after
+the other through the test client as a logged-in user.
+
+Every request of an endpoint gets fresh random parameters drawn from the
+seeded data, with a fixed random seed so two runs send the same requests.
+Responses are not cached (the book cache is swapped for a dummy one), except
+for the ``list (cached)`` endpoint, which repeats one URL.
+"""
+import json
+import random
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from shop.benchmarks import percentile
+from shop.models import Book
+from shop.seeding import WORDS
+
+WARMUP = 5
+
+
+class QueryTimer:
+    """
+    ``connection.execute_wrapper()`` counting queries and their time.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def endpoints(rnd, book_ids, prices):
+    """
+    ``{name: request factory}``, each factory returning the ``(method, url,
+    data)`` of one request.
+    """
+    def sample_ids(size):
+        return ','.join(str(book_id) for book_id in rnd.sample(book_ids, size))
+
+    return {
+        'list': lambda: ('get', '/book/', {'page_size': 100}),
+        'list (cached)': lambda: ('get', '/book/', {'page_size': 100}),
+        'filter price': lambda: ('get', '/book/', {'price': rnd.choice(prices)}),
+        'search': lambda: ('get', '/book/', {'search': rnd.choice(WORDS)}),
+        'ordering -price': lambda: ('get', '/book/', {'ordering': '-price'}),
+        'ordering -likes_count': lambda: ('get', '/book/', {'ordering': '-likes_count'}),
+        'ordering -average_rating': lambda: ('get', '/book/', {'ordering': '-average_rating'}),
+        'include my_relation': lambda: ('get', '/book/', {'include': 'my_relation'}),
+        'detail': lambda: ('get', f'/book/{rnd.choice(book_ids)}/', {}),
+        'book_relation list': lambda: ('get', '/book_relation/', {'books': sample_ids(20)}),
+        'book_relation PATCH': lambda: ('patch', f'/book_relation/{rnd.choice(book_ids)}/', {
+            'like': rnd.random() < 0.5, 'rate': rnd.choice([None, 1, 2, 3, 4, 5]),
+        }),
+    }
+
+
+@contextmanager
+def book_cache(enabled):
+    if enabled:
+        caches['default'].clear()
+        yield
+        return
+    dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    with override_settings(CACHES={'default': dummy}):
+        yield
+
+
+def request(client, method, url, data):
+    if method == 'get':
+        return client.get(url, {key: value for key, value in data.items() if value is not None})
+    return client.generic(method.upper(), url, json.dumps(data), content_type='application/json')
+
+
+def measure(client, factory, count):
+    timer = QueryTimer()
+    latencies, errors = [], 0
+    with connection.execute_wrapper(timer):
+        started = time.perf_counter()
+        for _ in range(count):
+            sent = time.perf_counter()
+            response = request(client, *factory())
+            latencies.append(time.perf_counter() - sent)
+            errors += response.status_code >= 400
+        elapsed = time.perf_counter() - started
+    return {
+        'req_per_s': round(count / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+        'p90_ms': round(percentile(latencies, 0.9) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'queries': round(timer.count / count, 2),
+        'sql_ms': round(timer.seconds / count * 1000, 3),
+        'errors': errors,
+    }
+
+
+def run(command, options):
+    rnd = random.Random(2)
+    book_ids = list(Book.objects.values_list('id', flat=True))
+    prices = [str(price) for price in Book.objects.values_list('price', flat=True).distinct()[:1000]]
+    client = Client()
+    client.force_login(User.objects.filter(username__startswith='seed_user_').first())
+
+    count = options['requests']
+    command.stdout.write(f'api: {count} requests per endpoint')
+    command.stdout.write(f'  {"endpoint":<26} {"req/s":>8} {"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8} '
+                         f'{"queries":>8} {"SQL ms":>8} {"errors":>6}')
+    for name, factory in endpoints(rnd, book_ids, prices).items():
+        with book_cache(enabled=name == 'list (cached)'):
+            for _ in range(WARMUP):
+                request(client, *factory())
+            metrics = measure(client, factory, count)
+        command.record('api', name, **metrics)
+        command.stdout.write(
+            f'  {name:<26} {metrics["req_per_s"]:>8,.0f} {metrics["p50_ms"]:>8.2f} {metrics["p90_ms"]:>8.2f} '
+            f'{metrics["p99_ms"]:>8.2f} {metrics["queries"]:>8.2f} {metrics["sql_ms"]:>8.3f} {metrics["errors"]:>6}'
+        )
@@ -0,0 +1,175 @@
+"""
+Load test of the book list served three ways, in process and without
+sockets: the WSGI handler driven by a pool of client threads, and the ASGI
+handler driven by client tasks on one event loop, once through the sync DRF
+routes and once through the async routes of ``shop.async_views``.
+
+Each server is measured at rising concurrency (``CONCURRENCY`` clients
+issuing ``REQUESTS`` requests in total), for a ``cached`` workload hitting
+one list URL over and over and an ``uncached`` one whose query strings never
+repeat. Sync-only middleware (the debug toolbar) is left out of all three:
+under ASGI it would push every request through a single thread.
+"""
+import asyncio
+import io
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+
+from shop.benchmarks import percentile
+
+CONCURRENCY = (1, 8, 32, 64)
+REQUESTS = 400
+PAGE_SIZE = 20
+
+SERVERS = ('wsgi', 'asgi-sync', 'asgi-async')
+PATHS = {
+    'wsgi': '/book/',
+    'asgi-sync': '/book/',
+    'asgi-async': '/async/book/',
+}
+
+
+def query_strings(workload):
+    if workload == 'cached':
+        while True:
+            yield f'page_size={PAGE_SIZE}'
+    for n in count():
+        yield f'page_size={PAGE_SIZE}&ordering=-likes_count&nocache={n}'
+
+
+def wsgi_request(handler, path, query):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'HTTP_HOST': 'testserver',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+    }
+    status = []
+    response = handler(environ, lambda status_line, headers: status.append(int(status_line[:3])))
+    try:
+        b''.join(response)
+    finally:
+        response.close()
+    return status[0]
+
+
+def run_wsgi(path, queries, concurrency):
+    handler = WSGIHandler()
+    lock = threading.Lock()
+    latencies, errors = [], []
+
+    def client():
+        while True:
+            with lock:
+                if len(latencies) + len(errors) >= REQUESTS:
+                    return
+                query = next(queries)
+            started = time.perf_counter()
+            status = wsgi_request(handler, path, query)
+            elapsed = time.perf_counter() - started
+            with lock:
+                (latencies if status == 200 else errors).append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for future in [pool.submit(client) for _ in range(concurrency)]:
+            future.result()
+    return time.perf_counter() - started, latencies, errors
+
+
+async def asgi_request(handler, path, query):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'query_string': query.encode(),
+        'headers': [(b'host', b'testserver')],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 0),
+    }
+    status = []
+    done = asyncio.Event()
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif not message.get('more_body'):
+            done.set()
+
+    await handler(scope, receive, send)
+    await done.wait()
+    return status[0]
+
+
+def run_asgi(path, queries, concurrency):
+    handler = ASGIHandler()
+    latencies, errors = [], []
+
+    async def client():
+        while len(latencies) + len(errors) < REQUESTS:
+            query = next(queries)
+            started = time.perf_counter()
+            status = await asgi_request(handler, path, query)
+            (latencies if status == 200 else errors).append(time.perf_counter() - started)
+
+    async def main():
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    return time.perf_counter() - started, latencies, errors
+
+
+def async_capable_middleware():
+    return [path for path in settings.MIDDLEWARE
+            if getattr(import_string(path), 'async_capable', False)]
+
+
+def run(command, options):
+    middleware = async_capable_middleware()
+    skipped = [path for path in settings.MIDDLEWARE if path not in middleware]
+    command.stdout.write(f'asgi: {REQUESTS} requests per run, GET /book/?page_size={PAGE_SIZE}')
+    if skipped:
+        command.stdout.write(f'  without sync-only middleware: {", ".join(skipped)}')
+    command.stdout.write(f'  {"workload":<9} {"server":<11} {"clients":>7} {"req/s":>9} '
+                         f'{"p50 ms":>8} {"p99 ms":>8} {"errors":>6}')
+
+    with override_settings(MIDDLEWARE=middleware):
+        for workload in ('cached', 'uncached'):
+            for server in SERVERS:
+                for concurrency in CONCURRENCY:
+                    cache.clear()
+                    runner = run_wsgi if server == 'wsgi' else run_asgi
+                    elapsed, latencies, errors = runner(PATHS[server], query_strings(workload), concurrency)
+                    metrics = {
+                        'req_per_s': round((len(latencies) + len(errors)) / elapsed, 1),
+                        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+                        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+                        'errors': len(errors),
+                    }
+                    command.record('asgi', f'{workload} {server} x{concurrency}', **metrics)
+                    command.stdout.write(
+                        f'  {workload:<9} {server:<11} {concurrency:>7} {metrics["req_per_s"]:>9,.0f} '
+                        f'{metrics["p50_ms"]:>8.1f} {metrics["p99_ms"]:>8.1f} {metrics["errors"]:>6}'
+                    )
@@ -0,0 +1,60 @@
+"""
+Author and price bucket facet counts of the whole catalogue: counting every
+book row in Python (what clients did with the full list), the naive one
+GROUP BY per facet over every book, the single GROUP BY of
+``shop.facets.live_counts()`` used for filtered requests, the precomputed
+``BookFacet`` rows and the cached ``/book/facets/`` response. Also reports
+what keeping ``BookFacet`` up to date adds to a book price change.
+"""
+from django.core.cache import caches
+from django.db.models import Count
+from django.test import Client
+
+from shop import facets
+from shop.benchmarks import best_of
+from shop.models import Book, BookFacet
+
+SAVES = 200
+
+
+def run(command, options):
+    books = Book.objects.all()
+    stored = BookFacet.objects.all()
+    client = Client()
+
+    def naive():
+        list(books.order_by().values('author_name').annotate(count=Count('id')))
+        list(books.order_by().values(bucket=facets.price_bucket_expression()).annotate(count=Count('id')))
+
+    def cached():
+        client.get('/book/facets/')
+
+    if facets.live_counts(books) != facets.stored_counts(stored):
+        command.stderr.write('Stored facet counts differ from the live aggregate!')
+    caches['default'].clear()
+    measurements = {
+        'all rows in Python': lambda: facets.facet_response(
+            facets.facet_deltas(added=books.values_list('author_name', 'price').iterator()), 100
+        ),
+        'naive GROUP BY x2': naive,
+        'one GROUP BY': lambda: facets.live_counts(books),
+        'precomputed': lambda: facets.stored_counts(stored),
+        'cached response': cached,
+    }
+    command.stdout.write(f'facets: {books.count()} books, {stored.count()} facet rows')
+    for name, func in measurements.items():
+        elapsed = best_of(func, options['repeat']) * 1000
+        command.record('facets', name, ms=round(elapsed, 3))
+        command.stdout.write(f'  {name:<20} {elapsed:>9.3f} ms')
+
+    sample = list(books.order_by('id')[:SAVES])
+
+    def save():
+        for book in sample:
+            # Alternates between two buckets, every save moves a count.
+            book.price = 5 if book.price >= 10 else 20
+            book.save(update_fields=['price'])
+
+    elapsed = best_of(save, options['repeat']) / SAVES * 1000
+    command.record('facets', 'book save', ms=round(elapsed, 3))
+    command.stdout.write(f'  {"book save":<20} {elapsed:>9.3f} ms (price change, with facet upkeep)')
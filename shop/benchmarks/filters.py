@@ -0,0 +1,106 @@
+"""
+Query plans of the book list filters of ``shop.filters.BookFilter``.
+
+Each supported filter and ordering combination is requested through the
+test client with values drawn from the seeded data. The book query it runs
+is explained and reported with the indexes it reads; a combination falling
+back to a full scan of ``shop_book`` is reported as failing.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from shop.benchmarks import best_of
+from shop.benchmarks.api import book_cache
+from shop.models import Book
+from shop.slowlog import explain
+
+INDEX_PATTERNS = {
+    'postgresql': re.compile(r'(?:Index|Index Only|Bitmap Index) Scan (?:Backward )?using (\w+)'),
+    'sqlite': re.compile(r'USING (?:COVERING INDEX (\w+)|INDEX (\w+)|(INTEGER PRIMARY KEY))'),
+}
+TABLE_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on shop_book\b'),
+    'sqlite': re.compile(r'^SCAN (?:TABLE )?shop_book(?: AS \w+)?$'),
+}
+
+
+def combinations():
+    """
+    ``{name: query parameters}`` of every supported filter and ordering
+    combination, with selective values taken from the database.
+    """
+    prices = sorted(Book.objects.values_list('price', flat=True))
+    low = prices[len(prices) // 2]
+    high = prices[min(len(prices) // 2 + len(prices) // 200, len(prices) - 1)]
+    authors = list(Book.objects.values('author_name').annotate(books=Count('id'))
+                   .order_by('books', 'author_name').values_list('author_name', flat=True)[:2])
+    owner = Book.objects.exclude(owner=None).values_list('owner', flat=True).order_by('id').first()
+    price_range = {'price_min': low, 'price_max': high}
+    return {
+        'price': {'price': low},
+        'price range': price_range,
+        'price range, ordering price': dict(price_range, ordering='price'),
+        'author_name': {'author_name': ','.join(authors)},
+        'author_name, ordering -price': {'author_name': ','.join(authors), 'ordering': '-price'},
+        'author_name + price range': dict(price_range, author_name=','.join(authors)),
+        'owner': {'owner': owner},
+        'owner, ordering -price': {'owner': owner, 'ordering': '-price'},
+        'owner + rating_min': {'owner': owner, 'rating_min': 4},
+        'rating_min, ordering -average_rating': {'rating_min': 4, 'ordering': '-average_rating'},
+    }
+
+
+def book_query(client, params):
+    """
+    SQL of the book query a list request with ``params`` runs.
+    """
+    with book_cache(enabled=False), CaptureQueriesContext(connection) as queries:
+        response = client.get('/book/', params)
+    assert response.status_code == 200, response.content
+    return next(query['sql'] for query in queries if 'FROM "shop_book"' in query['sql'])
+
+
+def plan_indexes(vendor, plan):
+    """
+    Indexes read by ``plan`` (lines of EXPLAIN output) and whether it scans
+    the whole ``shop_book`` table.
+    """
+    indexes = []
+    for line in plan:
+        match = INDEX_PATTERNS[vendor].search(line)
+        if match:
+            indexes.append(next(name for name in match.groups() if name).lower()
+                           if vendor == 'sqlite' else match.group(1))
+    table_scan = any(TABLE_SCAN_PATTERNS[vendor].search(line.strip()) for line in plan)
+    return indexes, table_scan
+
+
+def run(command, options):
+    vendor = connection.vendor
+    if vendor not in INDEX_PATTERNS:
+        command.stdout.write(f'filters: skipped, cannot read {vendor} query plans')
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    client = Client()
+
+    command.stdout.write(f'filters ({vendor}): plan of the book query per combination')
+    command.stdout.write(f'  {"combination":<38} {"ms":>7} {"rows":>6}  indexes')
+    failures = 0
+    for name, params in combinations().items():
+        sql = book_query(client, params)
+        indexes, table_scan = plan_indexes(vendor, explain(connection, sql, None) or [])
+        with book_cache(enabled=False):
+            elapsed = best_of(lambda: client.get('/book/', params), options['repeat']) * 1000
+            rows = len(client.get('/book/', params).json()['results'])
+        uses_index = bool(indexes) and not table_scan
+        failures += not uses_index
+        command.record('filters', name, ms=round(elapsed, 3), rows=rows, uses_index=int(uses_index))
+        line = f'  {name:<38} {elapsed:>7.2f} {rows:>6}  {", ".join(indexes) or "-"}'
+        command.stdout.write(line if uses_index else command.style.ERROR(f'{line}  FULL SCAN'))
+    if failures:
+        command.stdout.write(command.style.ERROR(f'  {failures} combinations scan the whole table'))
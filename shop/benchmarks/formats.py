@@ -0,0 +1,37 @@
+"""
+Payload size and encode/decode throughput of the book list formats: the
+current ``JSONRenderer`` against ``MessagePackRenderer`` and
+``ColumnarRenderer``, over every seeded book as serialized for the API.
+Decoding goes as far as Python values: ``json.loads``, ``msgpack.unpackb``
+and ``read_columns`` for the typed arrays.
+"""
+import gzip
+import json
+
+import msgpack
+from rest_framework.renderers import JSONRenderer
+
+from shop.benchmarks import best_of
+from shop.models import Book
+from shop.renderers import ColumnarRenderer, MessagePackRenderer, read_columns
+from shop.serizalizers import BookSerializer, CompiledSerializer
+
+
+def run(command, options):
+    rows = CompiledSerializer(BookSerializer).serialize(Book.objects.all().with_rating().order_by('id'))
+    formats = {
+        'json': (JSONRenderer(), json.loads),
+        'msgpack': (MessagePackRenderer(), msgpack.unpackb),
+        'columnar': (ColumnarRenderer(), lambda content: read_columns(msgpack.unpackb(content))),
+    }
+
+    command.stdout.write(f'formats: {len(rows)} rows')
+    command.stdout.write(f'  {"format":<9} {"bytes":>11} {"gzipped":>10} {"encode rows/s":>14} {"decode rows/s":>14}')
+    for name, (renderer, decode) in formats.items():
+        content = renderer.render(rows)
+        encode = len(rows) / best_of(lambda: renderer.render(rows), options['repeat'])
+        decoded = len(rows) / best_of(lambda: decode(content), options['repeat'])
+        gzipped = len(gzip.compress(content, 6))
+        command.record('formats', name, bytes=len(content), gzip_bytes=gzipped,
+                       encode_rows_per_s=round(encode), decode_rows_per_s=round(decoded))
+        command.stdout.write(f'  {name:<9} {len(content):>11,} {gzipped:>10,} {encode:>14,.0f} {decoded:>14,.0f}')
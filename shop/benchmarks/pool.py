@@ -0,0 +1,86 @@
+"""
+Cost of a fresh PostgreSQL connection per request against the connection
+pool of ``shop.backends.postgresql_pool``.
+
+Each client thread repeats what Django does for a request with
+``CONN_MAX_AGE = 0``: open the connection, run one primary key lookup and
+close it, through its own ``DatabaseWrapper`` of either backend. The pool is
+sized to the number of clients. Only runs on PostgreSQL.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.db.utils import load_backend
+
+from shop.backends.postgresql_pool.base import close_pools
+from shop.benchmarks import percentile
+
+CONCURRENCY = (1, 8, 32)
+REQUESTS = 1000
+QUERY = 'SELECT id, name FROM shop_book WHERE id = %s'
+
+BACKENDS = {
+    'connect': 'django.db.backends.postgresql',
+    'pool': 'shop.backends.postgresql_pool',
+}
+
+
+def make_wrapper(backend, concurrency):
+    settings_dict = dict(connection.settings_dict)
+    options = {name: value for name, value in settings_dict['OPTIONS'].items() if name != 'pool'}
+    if backend == 'pool':
+        options['pool'] = {'max_size': concurrency, 'timeout': 30}
+    settings_dict['OPTIONS'] = options
+    return load_backend(BACKENDS[backend]).DatabaseWrapper(settings_dict, connection.alias)
+
+
+def run_clients(backend, concurrency, book_ids):
+    lock = threading.Lock()
+    latencies = []
+
+    def client(worker):
+        wrapper = make_wrapper(backend, concurrency)
+        for index in range(worker, REQUESTS, concurrency):
+            started = time.perf_counter()
+            wrapper.ensure_connection()
+            with wrapper.cursor() as cursor:
+                cursor.execute(QUERY, [book_ids[index % len(book_ids)]])
+                cursor.fetchall()
+            wrapper.close()
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for future in [pool.submit(client, worker) for worker in range(concurrency)]:
+            future.result()
+    return time.perf_counter() - started, latencies
+
+
+def run(command, options):
+    if connection.vendor != 'postgresql':
+        command.stdout.write(f'pool: skipped, needs PostgreSQL (not {connection.vendor})')
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT id FROM shop_book ORDER BY id LIMIT 1000')
+        # The seeded rows are not committed, other sessions look up missing ids.
+        book_ids = [row[0] for row in cursor.fetchall()] or [1]
+
+    command.stdout.write(f'pool: {REQUESTS} connect/query/close cycles per run')
+    command.stdout.write(f'  {"backend":<8} {"clients":>7} {"req/s":>9} {"p50 ms":>8} {"p99 ms":>8}')
+    for concurrency in CONCURRENCY:
+        for backend in BACKENDS:
+            elapsed, latencies = run_clients(backend, concurrency, book_ids)
+            close_pools()
+            metrics = {
+                'req_per_s': round(len(latencies) / elapsed, 1),
+                'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+                'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            }
+            command.record('pool', f'{backend} x{concurrency}', **metrics)
+            command.stdout.write(
+                f'  {backend:<8} {concurrency:>7} {metrics["req_per_s"]:>9,.0f} '
+                f'{metrics["p50_ms"]:>8.2f} {metrics["p99_ms"]:>8.2f}'
+            )
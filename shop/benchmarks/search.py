@@ -0,0 +1,49 @@
+"""
+Search latency against catalogue size: the previous ``icontains`` lookup on
+``name``/``author_name`` against the full-text backend of ``shop.search``.
+The catalogue is doubled between measurements.
+"""
+import random
+
+from django.db import connection
+from django.db.models import Q
+
+from shop.benchmarks import best_of
+from shop.models import Book
+from shop.search import clear_inverted_indexes, get_search_backend
+from shop.seeding import seed, WORDS
+
+PAGE = 100
+GROWTH_STEPS = 3
+# Owners of the books added at each step.
+SEARCH_USERS = 10
+
+
+def run(command, options):
+    rnd = random.Random(1)
+    terms = rnd.sample(WORDS, 10)
+    queryset = Book.objects.all().with_rating()
+    backend = get_search_backend(connection)
+
+    def icontains():
+        for term in terms:
+            list(queryset.filter(Q(name__icontains=term) | Q(author_name__icontains=term))
+                 .order_by('id')[:PAGE])
+
+    def fulltext():
+        for term in terms:
+            list(backend.search(queryset, [term])[:PAGE])
+
+    command.stdout.write(f'search ({connection.vendor}): ms per query, first {PAGE} results')
+    command.stdout.write(f'  {"books":>9} {"icontains":>10} {"full-text":>10}')
+    for step in range(GROWTH_STEPS + 1):
+        if step:
+            # Seeding drops the search indexes it made stale.
+            seed(connection, SEARCH_USERS, Book.objects.count(), 0, random_seed=step)
+        fulltext()  # warm up, builds the in-process index on SQLite
+        before = best_of(icontains, options['repeat']) / len(terms) * 1000
+        after = best_of(fulltext, options['repeat']) / len(terms) * 1000
+        books = Book.objects.count()
+        command.record('search', f'{books} books', icontains_ms=round(before, 3), fulltext_ms=round(after, 3))
+        command.stdout.write(f'  {books:>9} {before:>10.2f} {after:>10.2f}')
+    clear_inverted_indexes()
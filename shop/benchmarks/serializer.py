@@ -0,0 +1,34 @@
+"""
+Rows per second of the book list serialization: ``BookSerializer(many=True)``
+over model instances against ``CompiledSerializer`` over ``values_list()``
+rows, both including the query and the final JSON rendering.
+"""
+from rest_framework.renderers import JSONRenderer
+
+from shop.benchmarks import best_of
+from shop.models import Book
+from shop.serizalizers import BookSerializer, CompiledSerializer
+
+
+def run(command, options):
+    queryset = Book.objects.all().with_rating().order_by('id')
+    compiled = CompiledSerializer(BookSerializer)
+    renderer = JSONRenderer()
+    rows = queryset.count()
+
+    def drf():
+        return renderer.render(BookSerializer(queryset.all(), many=True).data)
+
+    def fast():
+        return renderer.render(compiled.serialize(queryset.all()))
+
+    if drf() != fast():
+        command.stderr.write('CompiledSerializer output differs from BookSerializer!')
+
+    before = rows / best_of(drf, options['repeat'])
+    after = rows / best_of(fast, options['repeat'])
+    command.record('serializer', 'BookSerializer', rows_per_s=round(before))
+    command.record('serializer', 'CompiledSerializer', rows_per_s=round(after))
+    command.stdout.write(f'serializer: {rows} rows')
+    command.stdout.write(f'  BookSerializer      {before:12,.0f} rows/s')
+    command.stdout.write(f'  CompiledSerializer  {after:12,.0f} rows/s  ({after / before:.1f}x)')
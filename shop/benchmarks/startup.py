@@ -0,0 +1,113 @@
+"""
+Boot cost of a worker per settings profile: a fresh interpreter loading the
+WSGI application under ``python -X importtime`` and serving its first
+request. Profiles are the development settings, the production settings
+(``books.production_settings``) and those in API-only mode.
+
+Reported per profile, best of ``--repeat`` runs: the wall time of the whole
+process, the time ``get_wsgi_application()`` took, the time to the end of
+the first response, the number of modules loaded, the total import time
+``-X importtime`` saw and the packages that took longest. The first request is
+``/__metrics__/``, which goes through every middleware and loads the whole
+URLconf without touching the database, so connection setup (see the pool
+suite) does not blur the numbers.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+
+PROFILES = {
+    'development': ('books.settings', {}),
+    'production': ('books.production_settings', {}),
+    'api-only': ('books.production_settings', {'BOOKS_API_ONLY': '1'}),
+}
+# Packages whose presence the report calls out. DRF's schema generator
+# imports django.contrib.admin modules regardless, shop.admin only loads
+# with the admin app.
+WATCHED = ('debug_toolbar', 'debug_toolbar_force', 'social_django', 'social_core', 'shop.admin')
+TOP = 5
+
+# Runs in the child: boot, serve one request, report the timings on stdout.
+CHILD = '''
+import io, json, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+ready = time.perf_counter()
+from django.conf import settings
+settings.REQUEST_METRICS_ALLOWED_IPS = ['127.0.0.1']
+statuses = []
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': '/__metrics__/', 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': 'localhost', 'REMOTE_ADDR': '127.0.0.1',
+    'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+    'wsgi.multithread': True, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+}
+b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+served = time.perf_counter()
+print(json.dumps({'status': statuses[0], 'setup': ready - started, 'first_request': served - started,
+                  'modules': sorted(sys.modules)}))
+'''
+
+IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def parse_importtime(lines):
+    """
+    ``(total self time in seconds, {top level package: cumulative seconds})``
+    from the ``-X importtime`` lines of a process. Modules loaded with
+    ``importlib.import_module()``, as Django loads apps, are not timed
+    themselves, only the imports they make.
+    """
+    total, packages = 0, Counter()
+    for line in lines:
+        match = IMPORTTIME.match(line)
+        if not match:
+            continue
+        own, cumulative, indent, name = match.groups()
+        total += int(own)
+        if len(indent) == 1:
+            packages[name.split('.')[0]] += int(cumulative) / 1e6
+    return total / 1e6, packages
+
+
+def boot(module, env):
+    """
+    Boot a worker with the settings ``module`` and ``env``. Returns the
+    timings the child reported, its import times and its wall time.
+    """
+    environ = dict(os.environ, DJANGO_SETTINGS_MODULE=module, DJANGO_SECRET_KEY='startup-bench',
+                   BOOKS_ALLOWED_HOSTS='localhost', **env)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD], env=environ,
+                            cwd=settings.BASE_DIR, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode:
+        raise RuntimeError(f'{module} failed to boot:\n{result.stderr[-2000:]}')
+    return json.loads(result.stdout.splitlines()[-1]), parse_importtime(result.stderr.splitlines()), wall
+
+
+def run(command, options):
+    command.stdout.write('startup: fresh worker per profile, first request /__metrics__/')
+    command.stdout.write(f'  {"profile":<12} {"wall ms":>8} {"setup ms":>9} {"first req ms":>13} '
+                         f'{"modules":>8} {"import ms":>10}')
+    for name, (module, env) in PROFILES.items():
+        runs = [boot(module, env) for _ in range(options['repeat'])]
+        timings, (imports, packages), wall = min(runs, key=lambda run: run[2])
+        modules = timings['modules']
+        command.record('startup', name, wall_ms=round(wall * 1000, 1), setup_ms=round(timings['setup'] * 1000, 1),
+                       first_request_ms=round(timings['first_request'] * 1000, 1), modules=len(modules),
+                       import_ms=round(imports * 1000, 1), status=int(timings['status'].split()[0]))
+        command.stdout.write(f'  {name:<12} {wall * 1000:>8.1f} {timings["setup"] * 1000:>9.1f} '
+                             f'{timings["first_request"] * 1000:>13.1f} {len(modules):>8} {imports * 1000:>10.1f}')
+        top = ', '.join(f'{package} {seconds * 1000:.0f}' for package, seconds in packages.most_common(TOP))
+        command.stdout.write(f'    slowest packages (ms): {top}')
+        loaded = [package for package in WATCHED
+                  if any(module == package or module.startswith(f'{package}.') for module in modules)]
+        command.stdout.write(f'    loaded: {", ".join(loaded) or "none of " + ", ".join(WATCHED)}')
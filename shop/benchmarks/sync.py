@@ -0,0 +1,77 @@
+"""
+What a client keeping a copy of the catalogue transfers to catch up: walking
+every page of ``/book/`` as it did before, against ``/book/?since=<token>``
+after a fraction of the books changed (new prices and likes) or were
+deleted. Reports requests, bytes and wall time per catch-up.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from shop.benchmarks import best_of
+from shop.benchmarks.api import book_cache
+from shop.models import Book, UserBookRelation
+
+PAGE_SIZE = 1000
+CHANGED = (0.001, 0.01, 0.1)
+
+
+def full_refetch(client):
+    requests = size = 0
+    url, params = '/book/', {'page_size': PAGE_SIZE}
+    while url:
+        response = client.get(url, params)
+        requests, size = requests + 1, size + len(response.content)
+        url, params = response.json()['next'], None
+    return requests, size
+
+
+def catch_up(client, token):
+    """
+    Requests and bytes to sync from ``token``, and the token to sync from next.
+    """
+    requests = size = 0
+    while True:
+        response = client.get('/book/', {'since': token, 'page_size': PAGE_SIZE})
+        requests, size = requests + 1, size + len(response.content)
+        data = response.json()
+        token = data['since']
+        if not data['more']:
+            return requests, size, token
+
+
+def run(command, options):
+    client = Client()
+    user_id = UserBookRelation.objects.values_list('user_id', flat=True).first()
+    # Everything settled, as if the catalogue was loaded long ago.
+    Book.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+    total = Book.objects.count()
+    _, _, token = catch_up(client, '')
+
+    command.stdout.write(f'sync: catching up on {total} books, {PAGE_SIZE} per page')
+    command.stdout.write(f'  {"changed":<14} {"requests":>8} {"bytes":>12} {"ms":>9}')
+    # No writer is in flight while catching up, nothing needs to settle.
+    with book_cache(enabled=False), override_settings(BOOK_SYNC_SETTLE_SECONDS=0):
+        requests, size = full_refetch(client)
+        elapsed = best_of(lambda: full_refetch(client), options['repeat']) * 1000
+        command.record('sync', 'full refetch', requests=requests, bytes=size, ms=round(elapsed, 3))
+        command.stdout.write(f'  {"full list":<14} {requests:>8} {size:>12,} {elapsed:>9.2f}')
+
+        for fraction in CHANGED:
+            books = list(Book.objects.order_by('?')[:max(1, round(total * fraction))])
+            # Rolled back, every fraction starts from the same catalogue.
+            with transaction.atomic():
+                for book in books[::3]:
+                    book.delete()
+                for book in books[1::3]:
+                    book.price += 1
+                    book.save(update_fields=['price'])
+                UserBookRelation.objects.bulk_upsert((user_id, book.id, {'like': True}) for book in books[2::3])
+                requests, size, _ = catch_up(client, token)
+                elapsed = best_of(lambda: catch_up(client, token), options['repeat']) * 1000
+                transaction.set_rollback(True)
+            name = f'{fraction:.1%} changed'
+            command.record('sync', name, requests=requests, bytes=size, ms=round(elapsed, 3))
+            command.stdout.write(f'  {name:<14} {requests:>8} {size:>12,} {elapsed:>9.2f}')
@@ -0,0 +1,186 @@
+from django.db import connections, transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from shop.signals import books_changed
+
+
+class BulkMixin:
+    """
+    ``POST``, ``PATCH`` and ``DELETE`` on ``<prefix>/bulk/`` create, partially
+    update or delete a JSON array of objects in one transaction.
+
+    Items are validated one by one with the view's serializer and object
+    permissions are checked against objects fetched in a single query. The
+    response is an array aligned with the request, each entry holding the
+    item's ``status`` and either its ``data`` or its ``errors``. Items that
+    fail do not stop the others (the response is then 207 Multi-Status)
+    unless ``?atomic=1`` is given, in which case nothing is written and the
+    response is 400.
+    """
+    bulk_max_items = 1000
+    bulk_atomic_param = 'atomic'
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk',
+            permission_classes=[IsAuthenticated])
+    def bulk(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of items.']})
+        if len(items) > self.bulk_max_items:
+            raise ValidationError({'non_field_errors': [
+                f'Ensure this list has no more than {self.bulk_max_items} items.'
+            ]})
+
+        handler = {
+            'POST': self.bulk_create,
+            'PATCH': self.bulk_update,
+            'DELETE': self.bulk_destroy,
+        }[request.method]
+        return handler(request, items)
+
+    def is_bulk_atomic(self, request):
+        return request.query_params.get(self.bulk_atomic_param) in ('1', 'true')
+
+    def bulk_response(self, request, results, success_status, write):
+        """
+        Run ``write`` unless the batch is atomic and an item failed, then
+        build the response.
+        """
+        failed = any(result['status'] >= 400 for result in results)
+        if failed and self.is_bulk_atomic(request):
+            for result in results:
+                if result['status'] < 400:
+                    result.clear()
+                    result.update(status=status.HTTP_424_FAILED_DEPENDENCY,
+                                  errors={'detail': 'Not applied because another item failed.'})
+            return Response(results, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic(using=self.get_queryset().db):
+            write()
+        return Response(results, status=status.HTTP_207_MULTI_STATUS if failed else success_status)
+
+    def get_bulk_objects(self, request, items):
+        """
+        Map each item to the object it refers to, fetched in one query, or to
+        an error result when the item has no id, repeats an id, does not
+        exist or may not be written by the user.
+        """
+        ids = [item.get('id') if isinstance(item, dict) else item for item in items]
+        # None for anything but an integer: ids may be unhashable, and
+        # booleans would match the ids 0 and 1.
+        ids = [pk if isinstance(pk, int) and not isinstance(pk, bool) else None for pk in ids]
+        valid_ids = {pk for pk in ids if pk is not None}
+        objects = self.get_bulk_queryset().in_bulk(valid_ids)
+
+        seen = set()
+        for pk in ids:
+            if pk is None:
+                yield None, {'status': status.HTTP_400_BAD_REQUEST,
+                             'errors': {'id': ['A valid integer is required.']}}
+            elif pk in seen:
+                yield None, {'status': status.HTTP_400_BAD_REQUEST,
+                             'errors': {'id': ['Duplicate id in this batch.']}}
+            elif pk not in objects:
+                yield None, {'status': status.HTTP_404_NOT_FOUND, 'errors': {'detail': 'Not found.'}}
+            elif not self.has_bulk_object_permission(request, objects[pk]):
+                yield None, {'status': status.HTTP_403_FORBIDDEN,
+                             'errors': {'detail': 'You do not have permission to perform this action.'}}
+            else:
+                yield objects[pk], None
+            seen.add(pk)
+
+    def get_bulk_queryset(self):
+        """
+        Queryset the objects of a batch are read from. It must load whatever
+        the permission checks look at (``owner_id`` for the book permissions),
+        so checking a batch costs no queries.
+        """
+        return self.get_queryset()
+
+    def has_bulk_object_permission(self, request, obj):
+        # The bulk action itself only requires authentication, objects are
+        # checked against the view's own permission classes.
+        return all(permission().has_object_permission(request, self, obj)
+                   for permission in type(self).permission_classes)
+
+    def bulk_create(self, request, items):
+        model = self.get_queryset().model
+        results, objects = [], []
+        for item in items:
+            serializer = self.get_serializer(data=item)
+            if serializer.is_valid():
+                obj = model(**self.get_bulk_create_kwargs(serializer))
+                objects.append((obj, serializer, len(results)))
+                results.append({'status': status.HTTP_201_CREATED})
+            else:
+                results.append({'status': status.HTTP_400_BAD_REQUEST, 'errors': serializer.errors})
+
+        def write():
+            created = [obj for obj, _, _ in objects]
+            connection = connections[self.get_queryset().db]
+            if connection.features.can_return_rows_from_bulk_insert:
+                model.objects.bulk_create(created)
+                books_changed.send(sender=model, book_ids=[obj.pk for obj in created])
+            else:
+                # Without RETURNING the ids of bulk inserted rows are unknown.
+                for obj in created:
+                    obj.save()
+            for obj, serializer, index in objects:
+                serializer.instance = obj
+                results[index]['data'] = serializer.data
+
+        return self.bulk_response(request, results, status.HTTP_201_CREATED, write)
+
+    def get_bulk_create_kwargs(self, serializer):
+        return dict(serializer.validated_data)
+
+    def bulk_update(self, request, items):
+        results, objects, groups = [], [], {}
+        for item, (obj, error) in zip(items, self.get_bulk_objects(request, items)):
+            if error is not None:
+                results.append(error)
+                continue
+            serializer = self.get_serializer(obj, data=item, partial=True)
+            if not serializer.is_valid():
+                results.append({'status': status.HTTP_400_BAD_REQUEST, 'errors': serializer.errors})
+                continue
+            for field, value in serializer.validated_data.items():
+                setattr(obj, field, value)
+            # Each object only writes the fields its item sent, so columns
+            # it did not touch keep any concurrent change.
+            fields = frozenset(serializer.validated_data)
+            if fields:
+                groups.setdefault(fields, []).append(obj)
+            objects.append((obj, serializer, len(results)))
+            results.append({'status': status.HTTP_200_OK})
+
+        def write():
+            model = self.get_queryset().model
+            for fields, updated in groups.items():
+                model.objects.bulk_update(updated, sorted(fields))
+            if groups:
+                book_ids = [obj.pk for updated in groups.values() for obj in updated]
+                books_changed.send(sender=model, book_ids=book_ids)
+            for obj, serializer, index in objects:
+                results[index]['data'] = serializer.data
+
+        return self.bulk_response(request, results, status.HTTP_200_OK, write)
+
+    def bulk_destroy(self, request, items):
+        results, ids = [], []
+        for obj, error in self.get_bulk_objects(request, items):
+            if error is not None:
+                results.append(error)
+            else:
+                ids.append(obj.pk)
+                results.append({'status': status.HTTP_204_NO_CONTENT})
+
+        def write():
+            if ids:
+                self.get_queryset().model.objects.filter(pk__in=ids).delete()
+
+        return self.bulk_response(request, results, status.HTTP_200_OK, write)
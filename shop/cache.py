@@ -0,0 +1,193 @@
+"""
+Response cache for the book list and detail endpoints.
+
+Rendered responses are stored under keys that embed a version number: one
+for the list endpoint and one per book for its detail endpoint. Writes never
+delete entries, they bump the versions on ``books_changed`` so stale entries
+are simply never read again and expire on their own. Any Django cache
+backend works; ``settings.BOOK_CACHE_ALIAS`` selects which one.
+"""
+import hashlib
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, parse_http_date_safe, urlencode
+
+from shop import coalescing, routers
+from shop.signals import books_changed
+
+LIST_VERSION_KEY = 'shop:books:version'
+# Until when replicas may still return books from before the last change.
+REPLICA_STALE_KEY = 'shop:books:replica_stale_until'
+
+
+def get_cache():
+    return caches[getattr(settings, 'BOOK_CACHE_ALIAS', 'default')]
+
+
+def book_version_key(book_id):
+    return f'shop:book:{book_id}:version'
+
+
+def new_version():
+    # Random rather than counting from 1, so a version key evicted from the
+    # cache can never come back with a value older entries were stored under.
+    return random.getrandbits(48)
+
+
+def get_versions(*keys):
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(keys):
+    cache = get_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, new_version(), None)
+
+
+@receiver(books_changed)
+def invalidate_books(sender, book_ids, **kwargs):
+    keys = [LIST_VERSION_KEY] + [book_version_key(book_id) for book_id in book_ids]
+    bump_versions(keys)
+    if routers.get_replicas():
+        get_cache().set(REPLICA_STALE_KEY, time.time() + routers.lag_window(), None)
+    if connection.in_atomic_block:
+        # Readers may have cached the pre-commit state in the meantime.
+        transaction.on_commit(lambda: bump_versions(keys))
+
+
+class CachedResponseMixin:
+    """
+    Serve book list and detail responses from the response cache, with ETags
+    and the ``Last-Modified`` of responses that set one.
+
+    Only successful, non-streaming responses are cached. The key covers the
+    version, the negotiated media type and the normalized query string.
+    """
+    cache_timeout = None
+
+    def cached_list(self, view_func, request, *args, **kwargs):
+        return self.cached_response(self.list_cache_prefix(), view_func, request, *args, **kwargs)
+
+    def cached_retrieve(self, view_func, request, *args, **kwargs):
+        book_id = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return self.cached_response(self.detail_cache_prefix(book_id), view_func, request, *args,
+                                    coalesce=True, **kwargs)
+
+    @staticmethod
+    def list_cache_prefix():
+        version, = get_versions(LIST_VERSION_KEY)
+        return f'list:{version}'
+
+    @staticmethod
+    def detail_cache_prefix(book_id):
+        version, = get_versions(book_version_key(book_id))
+        return f'detail:{book_id}:{version}'
+
+    def get_cache_key(self, request, prefix):
+        query = urlencode(sorted((key, sorted(values)) for key, values in request.query_params.lists()),
+                          doseq=True)
+        digest = hashlib.md5(f'{request.accepted_media_type}?{query}'.encode()).hexdigest()
+        return f'shop:books:{prefix}:{digest}'
+
+    def get_cached_response(self, request, key):
+        """
+        The response stored under ``key``, or ``None`` on a miss.
+        """
+        entry = get_cache().get(key)
+        if entry is None:
+            return None
+        return self.entry_response(request, entry)
+
+    def entry_response(self, request, entry):
+        # Entries stored before Last-Modified was cached have three items.
+        content, content_type, etag, last_modified = (*entry, None)[:4]
+        return self.conditional_response(request, HttpResponse(content, content_type=content_type),
+                                         etag, last_modified)
+
+    def cached_response(self, prefix, view_func, request, *args, coalesce=False, **kwargs):
+        """
+        The response of ``view_func`` from the cache, or rendered and cached.
+        With ``coalesce``, concurrent misses of the same key in this process
+        share one rendering, see shop.coalescing.
+        """
+        key = self.get_cache_key(request, prefix)
+        response = self.get_cached_response(request, key)
+        if response is not None:
+            return response
+
+        if coalesce and coalescing.enabled():
+            (response, entry), shared = coalescing.responses.run(
+                key, lambda: self.render_response(key, view_func, request, *args, **kwargs),
+                coalescing.get_timeout()
+            )
+            if shared and entry is not None:
+                return self.entry_response(request, entry)
+            if shared:
+                # Not cacheable, e.g. an error: only the leader's own response.
+                response, entry = self.render_response(key, view_func, request, *args, **kwargs)
+        else:
+            response, entry = self.render_response(key, view_func, request, *args, **kwargs)
+        if entry is None:
+            return response
+        _, _, etag, last_modified = entry
+        return self.conditional_response(request, response, etag, last_modified)
+
+    def render_response(self, key, view_func, request, *args, **kwargs):
+        """
+        Run ``view_func`` and cache its response under ``key`` if it can be.
+        Returns the response and its cache entry, ``None`` if not cacheable.
+        """
+        response = view_func(request, *args, **kwargs)
+        if response.status_code != 200 or response.streaming:
+            return response, None
+        response = self.finalize_response(request, response, *args, **kwargs)
+        response.render()
+        entry = (response.content, response['Content-Type'], f'"{hashlib.md5(response.content).hexdigest()}"',
+                 response.get('Last-Modified'))
+        if self.cacheable_read():
+            timeout = self.cache_timeout or getattr(settings, 'BOOK_CACHE_TIMEOUT', 300)
+            get_cache().set(key, entry, timeout)
+        return response, entry
+
+    @staticmethod
+    def cacheable_read():
+        """
+        Whether the books just read can be cached: not if they come from a
+        replica that may not have caught up with the last change yet.
+        """
+        if not routers.reading_from_replica():
+            return True
+        return time.time() >= (get_cache().get(REPLICA_STALE_KEY) or 0)
+
+    def conditional_response(self, request, response, etag, last_modified=None):
+        if 'HTTP_IF_NONE_MATCH' in request.META:
+            etags = parse_etags(request.META['HTTP_IF_NONE_MATCH'])
+            not_modified = etag in etags or '*' in etags
+        else:
+            # If-Modified-Since only counts without If-None-Match (RFC 7232).
+            since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+            not_modified = (since is not None and last_modified is not None and
+                            parse_http_date_safe(last_modified) <= since)
+        if not_modified:
+            response = HttpResponseNotModified()
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = last_modified
+        patch_vary_headers(response, ['Accept'])
+        return response
@@ -0,0 +1,77 @@
+"""
+Single-flight coalescing of identical concurrent reads within a process.
+
+The first request for a key runs the work, requests for the same key
+arriving while it runs wait for its result instead of repeating it. A hot
+book detail response misses the cache every time a like or rating bumps the
+book's version; without coalescing every request in flight at that moment
+runs the same query and serialization.
+
+Followers wait at most ``settings.BOOK_COALESCE_TIMEOUT`` seconds, then do
+the work themselves, as they do if the leader fails.
+"""
+import threading
+
+from django.conf import settings
+
+DEFAULT_TIMEOUT = 10.0
+
+
+class Flight:
+    __slots__ = ('done', 'result', 'failed')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.failed = False
+
+
+class FlightGroup:
+    """
+    Work in flight per key. ``run()`` calls are shared between threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def __len__(self):
+        return len(self.flights)
+
+    def run(self, key, func, timeout=None):
+        """
+        The result of ``func()`` for ``key``, and whether it came from a call
+        made by another thread.
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+        if not leader:
+            if flight.done.wait(timeout) and not flight.failed:
+                return flight.result, True
+            return func(), False
+
+        try:
+            flight.result = func()
+        except BaseException:
+            flight.failed = True
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result, False
+
+
+# Rendered book responses being computed, by response cache key.
+responses = FlightGroup()
+
+
+def enabled():
+    return getattr(settings, 'BOOK_COALESCE_READS', True)
+
+
+def get_timeout():
+    return getattr(settings, 'BOOK_COALESCE_TIMEOUT', DEFAULT_TIMEOUT)
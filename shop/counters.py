@@ -0,0 +1,268 @@
+"""
+Stored like/rating counters on ``Book``.
+
+``Book.likes_count``, ``Book.rating_sum`` and ``Book.rating_count`` are kept in
+sync with ``UserBookRelation`` by database triggers, so every insert, update or
+delete of a relation adjusts the counters of its book inside the same
+statement and transaction, whichever code path performed the write.
+``Book.rating_average`` is maintained alongside as the sort key of the
+"best rated" ordering: the average rate, or 0 for books nobody has rated.
+``Book.updated_at`` is bumped with them, so delta sync (``shop.sync``) picks
+up books whose likes or ratings changed.
+"""
+from contextlib import contextmanager
+
+from django.db import migrations
+from django.db.models import Count, Case, F, FloatField, When, Sum, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Greatest, Now
+
+# Version of the trigger SQL below. Version 2 also maintains
+# ``Book.rating_average`` and version 3 ``Book.updated_at``, migrations that
+# ran before those columns existed pin earlier versions.
+VERSION = 3
+
+
+def _postgresql_set(row, sign, version):
+    columns = [
+        f'likes_count = likes_count {sign} {row}."like"::int',
+        f'rating_sum = rating_sum {sign} COALESCE({row}.rate, 0)',
+        f'rating_count = rating_count {sign} ({row}.rate IS NOT NULL)::int',
+    ]
+    if version >= 2:
+        columns.append(
+            f'rating_average = (rating_sum {sign} COALESCE({row}.rate, 0))::float8 / '
+            f'GREATEST(rating_count {sign} ({row}.rate IS NOT NULL)::int, 1)'
+        )
+    if version >= 3:
+        columns.append('updated_at = clock_timestamp()')
+    return ', '.join(columns)
+
+
+def postgresql_install(version=VERSION):
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION shop_book_counters() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE shop_book SET {_postgresql_set('OLD', '-', version)}
+                WHERE id = OLD.book_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                UPDATE shop_book SET {_postgresql_set('NEW', '+', version)}
+                WHERE id = NEW.book_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """,
+        """
+        CREATE TRIGGER shop_userbookrelation_counters_insert
+        AFTER INSERT ON shop_userbookrelation
+        FOR EACH ROW EXECUTE PROCEDURE shop_book_counters();
+        """,
+        """
+        CREATE TRIGGER shop_userbookrelation_counters_update
+        AFTER UPDATE OF "like", rate, book_id ON shop_userbookrelation
+        FOR EACH ROW
+        WHEN (OLD."like" IS DISTINCT FROM NEW."like" OR
+              OLD.rate IS DISTINCT FROM NEW.rate OR
+              OLD.book_id IS DISTINCT FROM NEW.book_id)
+        EXECUTE PROCEDURE shop_book_counters();
+        """,
+        """
+        CREATE TRIGGER shop_userbookrelation_counters_delete
+        AFTER DELETE ON shop_userbookrelation
+        FOR EACH ROW EXECUTE PROCEDURE shop_book_counters();
+        """,
+    ]
+
+
+POSTGRESQL_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS shop_userbookrelation_counters_insert ON shop_userbookrelation;',
+    'DROP TRIGGER IF EXISTS shop_userbookrelation_counters_update ON shop_userbookrelation;',
+    'DROP TRIGGER IF EXISTS shop_userbookrelation_counters_delete ON shop_userbookrelation;',
+    'DROP FUNCTION IF EXISTS shop_book_counters();',
+]
+
+
+def _sqlite_update(row, sign, version):
+    columns = [
+        f'likes_count = likes_count {sign} {row}."like"',
+        f'rating_sum = rating_sum {sign} COALESCE({row}.rate, 0)',
+        f'rating_count = rating_count {sign} ({row}.rate IS NOT NULL)',
+    ]
+    if version >= 2:
+        columns.append(
+            f'rating_average = CAST(rating_sum {sign} COALESCE({row}.rate, 0) AS REAL) / '
+            f'MAX(rating_count {sign} ({row}.rate IS NOT NULL), 1)'
+        )
+    if version >= 3:
+        # Millisecond precision in the format Django stores datetimes in, so
+        # they compare equal to the values Django reads back and filters on.
+        columns.append("updated_at = replace(strftime('%Y-%m-%d %H:%M:%f000', 'now'), '.000000', '')")
+    return f'UPDATE shop_book SET {", ".join(columns)} WHERE id = {row}.book_id;'
+
+
+def sqlite_install(version=VERSION):
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS shop_userbookrelation_counters_insert
+        AFTER INSERT ON shop_userbookrelation
+        BEGIN {_sqlite_update('NEW', '+', version)} END;
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS shop_userbookrelation_counters_update
+        AFTER UPDATE OF "like", rate, book_id ON shop_userbookrelation
+        WHEN OLD."like" IS NOT NEW."like" OR OLD.rate IS NOT NEW.rate OR OLD.book_id IS NOT NEW.book_id
+        BEGIN {_sqlite_update('OLD', '-', version)} {_sqlite_update('NEW', '+', version)} END;
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS shop_userbookrelation_counters_delete
+        AFTER DELETE ON shop_userbookrelation
+        BEGIN {_sqlite_update('OLD', '-', version)} END;
+        """,
+    ]
+
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS shop_userbookrelation_counters_insert;',
+    'DROP TRIGGER IF EXISTS shop_userbookrelation_counters_update;',
+    'DROP TRIGGER IF EXISTS shop_userbookrelation_counters_delete;',
+]
+
+TRIGGERS = {
+    'postgresql': (postgresql_install, POSTGRESQL_UNINSTALL),
+    'sqlite': (sqlite_install, SQLITE_UNINSTALL),
+}
+
+
+def install_triggers(schema_editor, version=VERSION):
+    """
+    Create the counter triggers.
+    """
+    install, _ = TRIGGERS[schema_editor.connection.vendor]
+    for sql in install(version):
+        schema_editor.execute(sql)
+
+
+def uninstall_triggers(schema_editor):
+    _, uninstall = TRIGGERS[schema_editor.connection.vendor]
+    for sql in uninstall:
+        schema_editor.execute(sql)
+
+
+@contextmanager
+def triggers_paused(connection):
+    """
+    Drop the counter triggers for the duration of the block, for bulk loads
+    that write the counters themselves. Use it inside a transaction so other
+    connections never run without the triggers.
+    """
+    install, uninstall = TRIGGERS[connection.vendor]
+    with connection.cursor() as cursor:
+        for sql in uninstall:
+            cursor.execute(sql)
+    yield
+    with connection.cursor() as cursor:
+        for sql in install(VERSION):
+            cursor.execute(sql)
+
+
+def without_sqlite_triggers(*operations, version=VERSION, previous=None):
+    """
+    Wrap migration operations that make Django remake ``shop_book`` or
+    ``shop_userbookrelation`` on SQLite. SQLite refuses to rename a table
+    while a trigger references a missing one and drops the triggers of a
+    table together with it, so the triggers are removed and recreated around
+    the operations. ``version`` is the trigger version current after the
+    operations, ``previous`` the one before them if they change it: that is
+    the version reinstalled when the migration is reversed.
+    """
+    def installer(version):
+        def install(apps, schema_editor):
+            if schema_editor.connection.vendor == 'sqlite':
+                install_triggers(schema_editor, version)
+        return install
+
+    def uninstall(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            uninstall_triggers(schema_editor)
+
+    return [
+        migrations.RunPython(uninstall, installer(version if previous is None else previous)),
+        *operations,
+        migrations.RunPython(installer(version), uninstall),
+    ]
+
+
+def live_counters(relations):
+    """
+    Aggregate the counters of each book straight from the relation table.
+    Returns a values queryset of ``book``, ``likes_count``, ``rating_sum``
+    and ``rating_count``.
+    """
+    return relations.values('book').annotate(
+        likes_count=Count(Case(When(like=True, then=1))),
+        rating_sum=Coalesce(Sum('rate'), 0),
+        rating_count=Count('rate'),
+    ).order_by()
+
+
+def rebuild_counters(books, relations):
+    """
+    Recompute the stored counters of ``books`` from scratch in one UPDATE.
+    Books whose counters were off get ``updated_at`` bumped first, for delta
+    sync. Returns the number of books updated.
+    """
+    live = live_counters(relations.filter(book=OuterRef('pk')))
+
+    def column(name):
+        return Coalesce(Subquery(live.values(name), output_field=IntegerField()), Value(0))
+
+    fields = {field.name for field in books.model._meta.fields}
+    if 'updated_at' in fields:
+        books.annotate(
+            live_likes_count=column('likes_count'),
+            live_rating_sum=column('rating_sum'),
+            live_rating_count=column('rating_count'),
+        ).exclude(
+            likes_count=F('live_likes_count'),
+            rating_sum=F('live_rating_sum'),
+            rating_count=F('live_rating_count'),
+        ).update(updated_at=Now())
+    updated = books.update(
+        likes_count=column('likes_count'),
+        rating_sum=column('rating_sum'),
+        rating_count=column('rating_count'),
+    )
+    if 'rating_average' in fields:
+        books.update(rating_average=rating_average())
+    return updated
+
+
+def rating_average():
+    """
+    ``Book.rating_average`` computed from the other counters, 0 for books
+    nobody has rated.
+    """
+    return Cast(F('rating_sum'), FloatField()) / Cast(Greatest(F('rating_count'), 1), FloatField())
+
+
+def check_counters(books, relations):
+    """
+    Compare the stored counters of ``books`` against the live aggregate.
+    Returns a list of ``(book_id, stored, live)`` tuples for every mismatch,
+    where ``stored`` and ``live`` are ``(likes_count, rating_sum, rating_count)``.
+    """
+    live = {
+        row['book']: (row['likes_count'], row['rating_sum'], row['rating_count'])
+        for row in live_counters(relations.filter(book__in=books))
+    }
+    mismatches = []
+    stored = books.values_list('id', 'likes_count', 'rating_sum', 'rating_count').order_by('id')
+    for book_id, *counters in stored.iterator():
+        counters = tuple(counters)
+        expected = live.get(book_id, (0, 0, 0))
+        if counters != expected:
+            mismatches.append((book_id, counters, expected))
+    return mismatches
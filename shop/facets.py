@@ -0,0 +1,155 @@
+"""
+Facet counts of the book list: books per author and per price bucket.
+
+``BookFacet`` stores the counts over the whole catalogue, one row per
+``(facet, value)``. They are adjusted in the transaction of every book write
+going through ``Model.save()``/``delete()`` or ``Book.objects``'
+``bulk_create()``/``bulk_update()``, so an unfiltered facet request reads a
+handful of rows instead of grouping every book. Updates count down the
+values the rows hold, read under a row lock, rather than those the instances
+were loaded with: overlapping saves of a book do not drift. Filtered
+requests count the filtered queryset with a single GROUP BY author and price
+bucket, folded into both facets in Python.
+
+Price buckets are bounded by ``settings.BOOK_PRICE_BUCKETS``, ascending upper
+bounds; run ``manage.py rebuild_book_facets`` after changing them or after
+writing books with raw SQL or ``QuerySet.update()``.
+"""
+import contextvars
+from bisect import bisect_right
+from collections import Counter
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Case, CharField, Count, Value, When
+
+AUTHOR = 'author_name'
+PRICE = 'price'
+DEFAULT_PRICE_BUCKETS = (10, 25, 50, 100, 250, 500)
+
+# Books deleted by the current QuerySet.delete(), counted down (and given
+# their tombstones, see shop.sync) in one go.
+_deleted = contextvars.ContextVar('facets_deleted', default=None)
+
+
+def price_bounds():
+    return tuple(Decimal(str(bound)) for bound in getattr(settings, 'BOOK_PRICE_BUCKETS', DEFAULT_PRICE_BUCKETS))
+
+
+def price_labels(bounds):
+    lows = ('0',) + tuple(f'{bound:g}' for bound in bounds)
+    return [f'{low}-{high:g}' for low, high in zip(lows, bounds)] + [f'{bounds[-1]:g}+']
+
+
+def price_bucket(price, bounds=None):
+    """
+    Label of the bucket of ``price``, buckets include their lower bound.
+    """
+    bounds = price_bounds() if bounds is None else bounds
+    return price_labels(bounds)[bisect_right(bounds, Decimal(str(price)))]
+
+
+def price_bucket_expression(bounds=None):
+    bounds = price_bounds() if bounds is None else bounds
+    labels = price_labels(bounds)
+    return Case(
+        *(When(price__lt=bound, then=Value(label)) for bound, label in zip(bounds, labels)),
+        default=Value(labels[-1]),
+        output_field=CharField(),
+    )
+
+
+def facet_deltas(removed=(), added=()):
+    """
+    ``{(facet, value): change}`` of the stored counts when books with the
+    ``(author_name, price)`` of ``removed`` go and those of ``added`` come.
+    """
+    bounds = price_bounds()
+    deltas = Counter()
+    for values, sign in ((removed, -1), (added, 1)):
+        for author_name, price in values:
+            deltas[AUTHOR, author_name] += sign
+            deltas[PRICE, price_bucket(price, bounds)] += sign
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+@contextmanager
+def collect_deleted():
+    """
+    Collect the ``(book_id, (author_name, price))`` of the books deleted in
+    the block instead of adjusting the counts for each one.
+    """
+    deleted = []
+    token = _deleted.set(deleted)
+    try:
+        yield deleted
+    finally:
+        _deleted.reset(token)
+
+
+def defer_deleted(book_id, values):
+    """
+    Add the book to those collected by ``collect_deleted()``. Returns
+    ``False`` outside of it.
+    """
+    deleted = _deleted.get()
+    if deleted is None:
+        return False
+    deleted.append((book_id, values))
+    return True
+
+
+def live_counts(books):
+    """
+    ``Counter`` of ``(facet, value)`` over ``books``, in one aggregate query.
+    """
+    counts = Counter()
+    rows = books.order_by().values_list(AUTHOR, price_bucket_expression()).annotate(count=Count('pk'))
+    for author_name, bucket, count in rows:
+        counts[AUTHOR, author_name] += count
+        counts[PRICE, bucket] += count
+    return counts
+
+
+def stored_counts(facets):
+    return Counter({(facet, value): count for facet, value, count in
+                    facets.filter(count__gt=0).values_list('facet', 'value', 'count')})
+
+
+def facet_response(counts, limit):
+    """
+    The API representation of ``counts``: the number of books, the ``limit``
+    authors with the most books and every price bucket in price order.
+    """
+    labels = price_labels(price_bounds())
+    authors = sorted(((value, count) for (facet, value), count in counts.items() if facet == AUTHOR),
+                     key=lambda item: (-item[1], item[0]))
+    prices = {value: count for (facet, value), count in counts.items() if facet == PRICE}
+    return {
+        'count': sum(prices.values()),
+        AUTHOR: [{'value': value, 'count': count} for value, count in authors[:limit]],
+        PRICE: [{'value': label, 'count': prices.get(label, 0)} for label in labels],
+    }
+
+
+def rebuild(books, facets):
+    """
+    Replace the stored counts in ``facets`` with the live counts of
+    ``books``. Returns the number of facet rows.
+    """
+    counts = live_counts(books)
+    facets.all().delete()
+    facets.bulk_create([facets.model(facet=facet, value=value, count=count)
+                        for (facet, value), count in counts.items()], batch_size=500)
+    return len(counts)
+
+
+def check(books, facets):
+    """
+    ``[(facet, value, stored, live)]`` of every stored count that differs
+    from the live count of ``books``.
+    """
+    live, stored = live_counts(books), stored_counts(facets)
+    return sorted((facet, value, stored[facet, value], live[facet, value])
+                  for facet, value in set(live) | set(stored) if stored[facet, value] != live[facet, value])
@@ -0,0 +1,106 @@
+import json
+import platform
+from datetime import datetime, timezone
+from importlib import import_module
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import (setup_databases, teardown_databases,
+                               setup_test_environment, teardown_test_environment)
+
+from shop.benchmarks import SUITES
+from shop.seeding import seed
+
+
+class Command(BaseCommand):
+    help = 'Run benchmark suites against a throwaway test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('suites', nargs='*', metavar='suite',
+                            help=f'Suites to run (default: all). One of: {", ".join(SUITES)}.')
+        parser.add_argument('--books', type=int, default=5000,
+                            help='Number of synthetic books to seed.')
+        parser.add_argument('--users', type=int, default=50,
+                            help='Number of synthetic users to seed.')
+        parser.add_argument('--relations', type=int, default=None,
+                            help='Number of likes/ratings to seed (default: two per book).')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Repetitions per measurement, the best one is reported.')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per endpoint in the api suite.')
+        parser.add_argument('--output', metavar='FILE',
+                            help='Save the results as JSON.')
+        parser.add_argument('--compare', metavar='FILE',
+                            help='Compare the results with a JSON file saved by an earlier run.')
+
+    def handle(self, *args, **options):
+        suites = options['suites'] or SUITES
+        unknown = set(suites) - set(SUITES)
+        if unknown:
+            raise CommandError(f'Unknown suites: {", ".join(sorted(unknown))}')
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as file:
+                baseline = json.load(file)
+
+        self.results = {}
+        setup_test_environment(debug=False)
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            relations = options['relations']
+            seed(connection, options['users'], options['books'],
+                 options['books'] * 2 if relations is None else relations)
+            for suite in suites:
+                # Suites may write, give each one the same seeded data.
+                with transaction.atomic():
+                    import_module(f'shop.benchmarks.{suite}').run(self, options)
+                    transaction.set_rollback(True)
+            vendor = connection.vendor
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': vendor,
+            },
+            'options': {name: options[name] for name in ('books', 'users', 'relations', 'repeat', 'requests')},
+            'results': self.results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2, sort_keys=True)
+            self.stdout.write(f'Saved results to {options["output"]}.')
+        if baseline is not None:
+            self.compare(baseline, report)
+
+    def record(self, suite, name, **metrics):
+        """
+        Keep ``metrics`` (numbers) of measurement ``name`` for the JSON report.
+        """
+        self.results.setdefault(suite, {})[name] = metrics
+
+    def compare(self, baseline, report):
+        self.stdout.write(f'Compared with the run of {baseline.get("created", "?")}:')
+        if baseline.get('options') != report['options']:
+            self.stdout.write(self.style.WARNING(f'  options differ: {baseline.get("options")}'))
+        for suite, measurements in report['results'].items():
+            for name, metrics in measurements.items():
+                before = baseline.get('results', {}).get(suite, {}).get(name)
+                if before is None:
+                    continue
+                changes = []
+                for metric, value in metrics.items():
+                    old = before.get(metric)
+                    if not isinstance(old, (int, float)) or not isinstance(value, (int, float)):
+                        continue
+                    if old:
+                        changes.append(f'{metric} {old:g} -> {value:g} ({(value - old) / old * 100:+.0f}%)')
+                    else:
+                        changes.append(f'{metric} {old:g} -> {value:g}')
+                if changes:
+                    self.stdout.write(f'  {suite} {name}: {", ".join(changes)}')
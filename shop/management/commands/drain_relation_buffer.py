@@ -0,0 +1,51 @@
+import glob
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.writebehind import FLUSHING_SUFFIX, LOG_PREFIX, LOG_SUFFIX, RelationBuffer, log_path
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Command(BaseCommand):
+    help = ('Write the book relation changes left in the write-behind logs of '
+            'processes that are no longer running to the database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=getattr(settings, 'RELATION_WRITE_BEHIND_DIR', None),
+                            help='Log directory (default: settings.RELATION_WRITE_BEHIND_DIR).')
+        parser.add_argument('--force', action='store_true',
+                            help='Also drain the logs of running processes. Only safe once they are stopped.')
+
+    def handle(self, *args, **options):
+        directory = options['dir']
+        if not directory:
+            raise CommandError('No log directory, set RELATION_WRITE_BEHIND_DIR or pass --dir.')
+
+        pids = set()
+        for suffix in (LOG_SUFFIX, LOG_SUFFIX + FLUSHING_SUFFIX):
+            for path in glob.glob(os.path.join(directory, f'{LOG_PREFIX}*{suffix}')):
+                pid = os.path.basename(path)[len(LOG_PREFIX):-len(suffix)]
+                if pid.isdigit():
+                    pids.add(int(pid))
+
+        drained = written = 0
+        for pid in sorted(pids):
+            if is_running(pid) and not options['force']:
+                self.stdout.write(f'Skipping the log of running process {pid}.')
+                continue
+            buffer = RelationBuffer(path=log_path(directory, pid), interval=None)
+            written += buffer.flush()
+            buffer.close()
+            drained += 1
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} relation changes from {drained} logs.'))
@@ -0,0 +1,69 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from shop.models import Book
+from shop.renderers import ColumnarRenderer, MessagePackRenderer, NDJSONRenderer, stream_json_array
+from shop.serizalizers import BookSerializer, CompiledSerializer
+
+RENDERERS = {
+    'json': JSONRenderer,
+    'ndjson': NDJSONRenderer,
+    'msgpack': MessagePackRenderer,
+    'columnar': ColumnarRenderer,
+}
+
+
+class Command(BaseCommand):
+    help = ('Export every book as the book list API serializes it, streamed to a file in chunks '
+            'without loading the catalogue in memory.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to write, "-" for standard output.')
+        parser.add_argument('--format', choices=sorted(RENDERERS), default=None,
+                            help='Output format (default: from the file extension, else json).')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched per round trip, and per columnar batch.')
+        parser.add_argument('--database', default='default',
+                            help='Database to export from.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        output_format = options['format'] or self.guess_format(path)
+        renderer = RENDERERS[output_format]()
+        if isinstance(renderer, ColumnarRenderer):
+            renderer.batch_size = options['chunk_size']
+
+        serializer = CompiledSerializer(BookSerializer)
+        queryset = Book.objects.using(options['database']).with_rating().order_by('id')
+        rows = serializer.to_representation(serializer.values(queryset).iterator(chunk_size=options['chunk_size']))
+        counted = self.count(rows)
+        chunks = renderer.stream(counted) if hasattr(renderer, 'stream') else stream_json_array(renderer, counted)
+
+        started = time.perf_counter()
+        size = 0
+        file = sys.stdout.buffer if path == '-' else open(path, 'wb')
+        try:
+            for chunk in chunks:
+                file.write(chunk)
+                size += len(chunk)
+        finally:
+            if file is not sys.stdout.buffer:
+                file.close()
+        elapsed = time.perf_counter() - started
+        if path != '-':
+            self.stdout.write(f'Exported {self.rows} books as {output_format} to {path}: '
+                              f'{size:,} bytes in {elapsed:.1f}s.')
+
+    @staticmethod
+    def guess_format(path):
+        extension = path.rsplit('.', 1)[-1].lower() if '.' in path else ''
+        return extension if extension in RENDERERS else 'json'
+
+    def count(self, rows):
+        self.rows = 0
+        for row in rows:
+            self.rows += 1
+            yield row
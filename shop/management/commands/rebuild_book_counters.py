@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from shop.counters import rebuild_counters, check_counters
+from shop.models import Book, UserBookRelation
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored like/rating counters of books and check them against the live aggregate.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('book_ids', nargs='*', type=int,
+                            help='Only rebuild these books (default: all books).')
+        parser.add_argument('--check', action='store_true',
+                            help='Only compare the stored counters with the live aggregate, do not rebuild.')
+
+    def handle(self, *args, **options):
+        books = Book.objects.all()
+        if options['book_ids']:
+            books = books.filter(id__in=options['book_ids'])
+        relations = UserBookRelation.objects.all()
+
+        if not options['check']:
+            with transaction.atomic():
+                updated = rebuild_counters(books, relations)
+            self.stdout.write(f'Rebuilt counters of {updated} books.')
+
+        mismatches = check_counters(books, relations)
+        for book_id, stored, live in mismatches:
+            self.stderr.write(f'Book {book_id}: stored {stored} != live {live} '
+                              f'(likes_count, rating_sum, rating_count)')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} books have stale counters.')
+        self.stdout.write(self.style.SUCCESS('All counters match the live aggregate.'))
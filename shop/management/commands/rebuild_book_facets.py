@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from shop import facets
+from shop.models import Book, BookFacet
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored author and price bucket facet counts and check them against the live aggregate.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only compare the stored counts with the live aggregate, do not rebuild.')
+
+    def handle(self, *args, **options):
+        books, stored = Book.objects.all(), BookFacet.objects.all()
+
+        if not options['check']:
+            with transaction.atomic():
+                rows = facets.rebuild(books, stored)
+            self.stdout.write(f'Rebuilt {rows} facet counts.')
+
+        mismatches = facets.check(books, stored)
+        for facet, value, count, live in mismatches:
+            self.stderr.write(f'{facet}={value!r}: stored {count} != live {live}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} facet counts are stale.')
+        self.stdout.write(self.style.SUCCESS('All facet counts match the live aggregate.'))
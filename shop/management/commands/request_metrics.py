@@ -0,0 +1,42 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.metrics import TIMINGS, bucket_percentile, load_dumps
+
+
+def format_bound(bound):
+    return '>5000' if bound is None else f'{bound}'
+
+
+class Command(BaseCommand):
+    help = ('Print the per-endpoint request timings sampled by RequestMetricsMiddleware, merged from the '
+            'dumps of every process.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=getattr(settings, 'REQUEST_METRICS_DIR', None),
+                            help='Dump directory (default: settings.REQUEST_METRICS_DIR).')
+        parser.add_argument('--json', action='store_true', help='Print the merged histograms as JSON.')
+
+    def handle(self, *args, **options):
+        directory = options['dir']
+        if not directory:
+            raise CommandError('No dump directory, set REQUEST_METRICS_DIR or pass --dir.')
+        endpoints = load_dumps(directory)
+        if options['json']:
+            self.stdout.write(json.dumps(endpoints, indent=2, sort_keys=True))
+            return
+        if not endpoints:
+            self.stdout.write('No sampled requests.')
+            return
+
+        self.stdout.write('Percentiles are bucket upper bounds, times in ms.')
+        self.stdout.write(f'{"endpoint":<40} {"count":>7} {"p50":>6} {"p90":>6} {"p99":>6} {"queries":>8} '
+                          + ' '.join(f'{timing:>10}' for timing in TIMINGS[1:]))
+        for endpoint, stats in sorted(endpoints.items(), key=lambda item: -item[1]['total']['sum']):
+            count = stats['count']
+            percentiles = ' '.join(f'{format_bound(bucket_percentile(stats["total"]["buckets"], p)):>6}'
+                                   for p in (0.5, 0.9, 0.99))
+            averages = ' '.join(f'{stats[timing]["sum"] / count:>10.2f}' for timing in TIMINGS[1:])
+            self.stdout.write(f'{endpoint:<40} {count:>7} {percentiles} {stats["queries"] / count:>8.1f} {averages}')
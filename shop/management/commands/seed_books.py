@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, DEFAULT_DB_ALIAS
+
+from shop.seeding import LOADERS, default_method, seed
+
+
+class Command(BaseCommand):
+    help = ('Add synthetic users, books and likes/ratings to the database, generated from a fixed '
+            'random seed and bulk loaded in chunks.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=10000, help='Number of books (default: 10000).')
+        parser.add_argument('--users', type=int, default=1000, help='Number of users (default: 1000).')
+        parser.add_argument('--relations', type=int,
+                            help='Number of likes/ratings, at most one per user and book '
+                                 '(default: ten per book).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0).')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Books generated and written at a time (default: 10000).')
+        parser.add_argument('--method', choices=sorted(LOADERS),
+                            help='How rows are written (default: copy on PostgreSQL, sqlite on SQLite, '
+                                 'orm elsewhere).')
+        indexes = parser.add_mutually_exclusive_group()
+        indexes.add_argument('--defer-indexes', action='store_true', default=None,
+                             help='Drop secondary indexes during the load and recreate them after it '
+                                  '(default: when the tables hold fewer rows than are loaded).')
+        indexes.add_argument('--keep-indexes', action='store_false', dest='defer_indexes',
+                             help='Keep the indexes during the load.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Database to seed (default: "default").')
+
+    def handle(self, *args, **options):
+        if options['books'] < 1 or options['users'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--books, --users and --chunk-size must be positive.')
+        connection = connections[options['database']]
+        method = options['method'] or default_method(connection)
+        if method == 'copy' and connection.vendor != 'postgresql':
+            raise CommandError('--method copy needs PostgreSQL.')
+        if method == 'sqlite' and connection.vendor != 'sqlite':
+            raise CommandError('--method sqlite needs SQLite.')
+        relations = options['relations']
+        if relations is None:
+            relations = options['books'] * 10
+
+        started = time.perf_counter()
+
+        def progress(books):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {books:,} books ({time.perf_counter() - started:.1f}s)')
+
+        users, books, relations = seed(
+            connection, options['users'], options['books'], relations,
+            random_seed=options['seed'], chunk_size=options['chunk_size'], method=method,
+            defer_indexes=options['defer_indexes'], progress=progress,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Added {users:,} users, {books:,} books and {relations:,} relations with {method} '
+            f'in {elapsed:.1f}s ({(users + books + relations) / elapsed:,.0f} rows/s).'
+        ))
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.slowlog import read_entries
+
+SORT_KEYS = {
+    'total': lambda group: -group['total_ms'],
+    'count': lambda group: -group['count'],
+    'max': lambda group: -group['max_ms'],
+}
+
+
+class Command(BaseCommand):
+    help = 'Group the slow query log by query fingerprint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=getattr(settings, 'SLOW_QUERY_LOG', None),
+                            help='Slow query log (default: settings.SLOW_QUERY_LOG).')
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='total',
+                            help='Order fingerprints by total time (default), count or slowest run.')
+        parser.add_argument('--limit', type=int, default=20, help='Fingerprints shown (default: 20).')
+        parser.add_argument('--plans', action='store_true', help='Also print the latest plan of each fingerprint.')
+
+    def handle(self, *args, **options):
+        if not options['file']:
+            raise CommandError('No slow query log, set SLOW_QUERY_LOG or pass --file.')
+
+        groups = {}
+        for entry in read_entries(options['file']):
+            group = groups.setdefault(entry['fingerprint'], {
+                'fingerprint': entry['fingerprint'], 'sql': entry['sql'], 'count': 0,
+                'total_ms': 0.0, 'max_ms': 0.0, 'endpoints': {}, 'stack': None, 'plan': None,
+            })
+            group['count'] += 1
+            group['total_ms'] += entry['duration_ms']
+            if entry['duration_ms'] >= group['max_ms']:
+                group['max_ms'] = entry['duration_ms']
+                group['stack'] = entry['stack']
+            endpoint = entry['endpoint'] or '-'
+            group['endpoints'][endpoint] = group['endpoints'].get(endpoint, 0) + 1
+            if entry['plan']:
+                group['plan'] = entry['plan']
+
+        if not groups:
+            self.stdout.write('No slow queries.')
+            return
+        ordered = sorted(groups.values(), key=SORT_KEYS[options['sort']])[:options['limit']]
+        for group in ordered:
+            endpoints = ', '.join(f'{endpoint} ({count})' for endpoint, count in
+                                  sorted(group['endpoints'].items(), key=lambda item: -item[1]))
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{group["fingerprint"]}  {group["count"]} queries, {group["total_ms"]:.1f} ms total, '
+                f'{group["total_ms"] / group["count"]:.1f} ms mean, {group["max_ms"]:.1f} ms max'
+            ))
+            self.stdout.write(f'  {group["sql"]}')
+            self.stdout.write(f'  endpoints: {endpoints}')
+            if group['stack']:
+                self.stdout.write(f'  slowest from: {" > ".join(group["stack"])}')
+            if options['plans'] and group['plan']:
+                for line in group['plan']:
+                    self.stdout.write(f'    {line}')
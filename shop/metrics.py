@@ -0,0 +1,334 @@
+"""
+Lightweight per-request timings, safe to keep on in production.
+
+``RequestMetricsMiddleware`` samples ``settings.REQUEST_METRICS_SAMPLE_RATE``
+of the requests. For a sampled request it records:
+
+* ``db``: the number of queries and their total time, counted by an execute
+  wrapper installed on every database connection (it does nothing outside
+  sampled requests),
+* ``serializer``: time spent in the ``timed('serializer')`` blocks of the
+  views, minus the queries run inside them,
+* ``render``: time spent rendering the DRF response,
+* ``total``: the time spent in the middleware.
+
+They are sent back in a ``Server-Timing`` header and added to per-endpoint
+histograms, keyed by method and URL name. Streamed responses are rendered
+after the middleware returns, their ``render`` time is not known.
+
+Each process keeps its own histograms. Staff users and the clients in
+``settings.REQUEST_METRICS_ALLOWED_IPS`` (none by default) can read them at
+``/__metrics__/``. With ``settings.REQUEST_METRICS_DIR`` set,
+every process also dumps them to ``requests-<pid>.json`` in that directory
+at most every ``REQUEST_METRICS_FLUSH_INTERVAL`` seconds and at exit, and
+``manage.py request_metrics`` merges the dumps of all processes.
+"""
+import asyncio
+import atexit
+import bisect
+import contextvars
+import glob
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, JsonResponse
+
+# Upper bounds of the histogram buckets, in milliseconds. The last bucket
+# holds everything slower.
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+TIMINGS = ('total', 'db', 'serializer', 'render')
+
+DUMP_PREFIX = 'requests-'
+DUMP_SUFFIX = '.json'
+
+current = contextvars.ContextVar('request_metrics', default=None)
+# The request being handled, sampled or not.
+current_request = contextvars.ContextVar('request', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db', 'serializer', 'render')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = self.serializer = self.render = 0.0
+
+    def server_timing(self, total):
+        timings = [f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries"']
+        if self.serializer:
+            timings.append(f'serializer;dur={self.serializer * 1000:.2f}')
+        if self.render:
+            timings.append(f'render;dur={self.render * 1000:.2f}')
+        timings.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(timings)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db += time.perf_counter() - started
+        metrics.queries += 1
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed(name):
+    """
+    Add the time spent in the block, less its queries, to the ``name``
+    timing of the current request, if it is sampled.
+    """
+    metrics = current.get()
+    if metrics is None:
+        yield
+        return
+    started, db = time.perf_counter(), metrics.db
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started - (metrics.db - db)
+        setattr(metrics, name, getattr(metrics, name) + elapsed)
+
+
+def time_render(response):
+    """
+    Add the time until ``response`` is rendered to the ``render`` timing.
+    Call it when the view returns, rendering follows right after.
+    """
+    metrics = current.get()
+    if metrics is None or not hasattr(response, 'add_post_render_callback') or response.is_rendered:
+        return
+    started = time.perf_counter()
+
+    def rendered(response):
+        metrics.render += time.perf_counter() - started
+
+    response.add_post_render_callback(rendered)
+
+
+class TimedRenderMixin:
+    """
+    Views mixin timing the rendering of their responses.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        time_render(response)
+        return response
+
+
+class Histograms:
+    """
+    ``{endpoint: {'count', 'queries', timing: {'sum', 'buckets'}}}`` with
+    times in milliseconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    @staticmethod
+    def empty():
+        return {'count': 0, 'queries': 0,
+                **{timing: {'sum': 0.0, 'buckets': [0] * (len(BUCKETS) + 1)} for timing in TIMINGS}}
+
+    def add(self, endpoint, metrics, total):
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = self.empty()
+            stats['count'] += 1
+            stats['queries'] += metrics.queries
+            for timing, seconds in zip(TIMINGS, (total, metrics.db, metrics.serializer, metrics.render)):
+                ms = seconds * 1000
+                stats[timing]['sum'] += ms
+                stats[timing]['buckets'][bisect.bisect_left(BUCKETS, ms)] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.endpoints))
+
+    def merge(self, endpoints):
+        with self.lock:
+            for endpoint, other in endpoints.items():
+                stats = self.endpoints.setdefault(endpoint, self.empty())
+                stats['count'] += other['count']
+                stats['queries'] += other['queries']
+                for timing in TIMINGS:
+                    stats[timing]['sum'] += other[timing]['sum']
+                    stats[timing]['buckets'] = [
+                        mine + theirs for mine, theirs in zip(stats[timing]['buckets'], other[timing]['buckets'])
+                    ]
+
+    def clear(self):
+        with self.lock:
+            self.endpoints = {}
+
+
+def bucket_percentile(buckets, fraction):
+    """
+    Upper bound in milliseconds of the bucket holding the ``fraction``
+    percentile, ``None`` if it is the open-ended last bucket.
+    """
+    rank = fraction * sum(buckets)
+    seen = 0
+    for bound, count in zip(BUCKETS + (None,), buckets):
+        seen += count
+        if count and seen >= rank:
+            return bound
+    return 0
+
+
+histograms = Histograms()
+_last_dump = 0.0
+_dump_lock = threading.Lock()
+
+
+def dump_path(directory, pid=None):
+    return os.path.join(directory, f'{DUMP_PREFIX}{os.getpid() if pid is None else pid}{DUMP_SUFFIX}')
+
+
+def dump(force=False):
+    """
+    Write this process' histograms to ``REQUEST_METRICS_DIR``, if set and
+    the last dump is older than ``REQUEST_METRICS_FLUSH_INTERVAL``.
+    """
+    global _last_dump
+    directory = getattr(settings, 'REQUEST_METRICS_DIR', None)
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - _last_dump < getattr(settings, 'REQUEST_METRICS_FLUSH_INTERVAL', 10.0):
+        return
+    if not _dump_lock.acquire(blocking=force):
+        return
+    try:
+        _last_dump = now
+        path = dump_path(directory)
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(histograms.snapshot(), file)
+        os.replace(path + '.tmp', path)
+    finally:
+        _dump_lock.release()
+
+
+def load_dumps(directory):
+    merged = Histograms()
+    for path in glob.glob(os.path.join(directory, f'{DUMP_PREFIX}*{DUMP_SUFFIX}')):
+        with open(path, encoding='utf-8') as file:
+            merged.merge(json.load(file))
+    return merged.snapshot()
+
+
+@atexit.register
+def shutdown():
+    if histograms.endpoints:
+        dump(force=True)
+
+
+@receiver(setting_changed)
+def reset_histograms(setting, **kwargs):
+    if setting.startswith('REQUEST_METRICS'):
+        histograms.clear()
+
+
+def endpoint_name(request):
+    """
+    ``<method> <URL name>`` of ``request``, once its URL is resolved.
+    """
+    match = request.resolver_match
+    return f'{request.method} {match.view_name if match is not None else "unresolved"}'
+
+
+class RequestMetricsMiddleware:
+    """
+    Record the timings of a sample of the requests, see the module docstring,
+    and keep every request in ``current_request`` for the slow query log.
+    Put it first so ``total`` covers the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function for the handler.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request_token = current_request.set(request)
+        try:
+            if not self.sampled():
+                return self.get_response(request)
+            metrics, token, started = self.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                current.reset(token)
+            return self.finish(request, response, metrics, started)
+        finally:
+            current_request.reset(request_token)
+
+    async def __acall__(self, request):
+        request_token = current_request.set(request)
+        try:
+            if not self.sampled():
+                return await self.get_response(request)
+            metrics, token, started = self.start()
+            try:
+                response = await self.get_response(request)
+            finally:
+                current.reset(token)
+            return self.finish(request, response, metrics, started)
+        finally:
+            current_request.reset(request_token)
+
+    @staticmethod
+    def sampled():
+        rate = getattr(settings, 'REQUEST_METRICS_SAMPLE_RATE', 0)
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    @staticmethod
+    def start():
+        metrics = RequestMetrics()
+        return metrics, current.set(metrics), time.perf_counter()
+
+    @staticmethod
+    def finish(request, response, metrics, started):
+        total = time.perf_counter() - started
+        response['Server-Timing'] = metrics.server_timing(total)
+        histograms.add(endpoint_name(request), metrics, total)
+        dump()
+        return response
+
+
+def metrics_view(request):
+    """
+    This process' histograms, for staff users and
+    ``REQUEST_METRICS_ALLOWED_IPS`` only. Not ``INTERNAL_IPS``: behind a
+    proxy on the same host every request comes from 127.0.0.1.
+    """
+    allowed_ips = getattr(settings, 'REQUEST_METRICS_ALLOWED_IPS', [])
+    if not (request.user.is_staff or request.META.get('REMOTE_ADDR') in allowed_ips):
+        raise Http404
+    return JsonResponse({'pid': os.getpid(), 'buckets_ms': BUCKETS, 'endpoints': histograms.snapshot()})
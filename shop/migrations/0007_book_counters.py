@@ -0,0 +1,44 @@
+from django.db import migrations, models
+
+from shop import counters
+
+
+def install_triggers(apps, schema_editor):
+    counters.install_triggers(schema_editor, version=1)
+
+
+def uninstall_triggers(apps, schema_editor):
+    counters.uninstall_triggers(schema_editor)
+
+
+def rebuild_counters(apps, schema_editor):
+    Book = apps.get_model('shop', 'Book')
+    UserBookRelation = apps.get_model('shop', 'UserBookRelation')
+    counters.rebuild_counters(Book.objects.all(), UserBookRelation.objects.all())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_auto_20201130_0804'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(install_triggers, uninstall_triggers),
+        migrations.RunPython(rebuild_counters, migrations.RunPython.noop),
+    ]
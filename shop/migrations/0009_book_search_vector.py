@@ -0,0 +1,53 @@
+# Generated by Django 3.1.3 on 2026-10-18 02:39
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from shop.counters import without_sqlite_triggers
+
+INSTALL = [
+    """
+    CREATE TRIGGER shop_book_search_vector_update
+    BEFORE INSERT OR UPDATE OF name, author_name ON shop_book
+    FOR EACH ROW EXECUTE PROCEDURE
+    tsvector_update_trigger(search_vector, 'pg_catalog.simple', name, author_name);
+    """,
+    "UPDATE shop_book SET search_vector = to_tsvector('pg_catalog.simple', name || ' ' || author_name);",
+    'CREATE INDEX shop_book_search_vector ON shop_book USING gin (search_vector);',
+]
+
+UNINSTALL = [
+    'DROP INDEX IF EXISTS shop_book_search_vector;',
+    'DROP TRIGGER IF EXISTS shop_book_search_vector_update ON shop_book;',
+]
+
+
+def install_search(apps, schema_editor):
+    # Other databases search through the in-process index in shop.search.
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in INSTALL:
+            schema_editor.execute(sql)
+
+
+def uninstall_search(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in UNINSTALL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0008_book_keyset_indexes'),
+    ]
+
+    operations = without_sqlite_triggers(
+        migrations.AddField(
+            model_name='book',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        version=1,
+    ) + [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.1.3 on 2026-10-18 03:05
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+from shop.counters import without_sqlite_triggers
+
+
+def remove_duplicates(apps, schema_editor):
+    # Keep the most recent relation of each user and book, the counter
+    # triggers take the deleted ones off the books.
+    UserBookRelation = apps.get_model('shop', 'UserBookRelation')
+    latest = UserBookRelation.objects.values('user', 'book').annotate(latest=Max('id')).values('latest')
+    UserBookRelation.objects.exclude(id__in=latest).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('shop', '0009_book_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        *without_sqlite_triggers(
+            migrations.AddConstraint(
+                model_name='userbookrelation',
+                constraint=models.UniqueConstraint(fields=('user', 'book'), name='shop_userbookrelation_user_book'),
+            ),
+            version=1,
+        ),
+    ]
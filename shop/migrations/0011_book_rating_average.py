@@ -0,0 +1,47 @@
+# Generated by Django 3.1.3 on 2026-10-18 03:30
+
+from django.db import migrations, models
+
+from shop import counters
+
+
+def upgrade_triggers(apps, schema_editor):
+    # SQLite got the new triggers back from without_sqlite_triggers().
+    if schema_editor.connection.vendor == 'postgresql':
+        counters.uninstall_triggers(schema_editor)
+        counters.install_triggers(schema_editor, version=2)
+    Book = apps.get_model('shop', 'Book')
+    Book.objects.update(rating_average=counters.rating_average())
+
+
+def downgrade_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        counters.uninstall_triggers(schema_editor)
+        counters.install_triggers(schema_editor, version=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0010_userbookrelation_unique'),
+    ]
+
+    operations = counters.without_sqlite_triggers(
+        migrations.AddField(
+            model_name='book',
+            name='rating_average',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['likes_count', 'id'], name='shop_book_likes_count_id'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['rating_average', 'id'], name='shop_book_rating_average_id'),
+        ),
+        version=2,
+        previous=1,
+    ) + [
+        migrations.RunPython(upgrade_triggers, downgrade_triggers),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.1.3 on 2026-10-18 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0011_book_rating_average'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['author_name', 'price', 'id'], name='shop_book_author_price_id'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['owner', 'id'], name='shop_book_owner_id'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.1.3 on 2026-10-18 04:40
+
+from django.db import migrations, models
+
+from shop import facets
+
+
+def rebuild_facets(apps, schema_editor):
+    Book = apps.get_model('shop', 'Book')
+    BookFacet = apps.get_model('shop', 'BookFacet')
+    db = schema_editor.connection.alias
+    facets.rebuild(Book.objects.using(db), BookFacet.objects.using(db))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0012_book_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookFacet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=32)),
+                ('value', models.CharField(max_length=255)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='bookfacet',
+            constraint=models.UniqueConstraint(fields=('facet', 'value'), name='shop_bookfacet_facet_value'),
+        ),
+        migrations.RunPython(rebuild_facets, migrations.RunPython.noop),
+    ]
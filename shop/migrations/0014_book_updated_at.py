@@ -0,0 +1,53 @@
+# Generated by Django 3.1.3 on 2026-10-18 05:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+from shop import counters
+
+
+def upgrade_triggers(apps, schema_editor):
+    # SQLite got the new triggers back from without_sqlite_triggers().
+    if schema_editor.connection.vendor == 'postgresql':
+        counters.uninstall_triggers(schema_editor)
+        counters.install_triggers(schema_editor, version=3)
+
+
+def downgrade_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        counters.uninstall_triggers(schema_editor)
+        counters.install_triggers(schema_editor, version=2)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0013_book_facets'),
+    ]
+
+    operations = counters.without_sqlite_triggers(
+        migrations.AddField(
+            model_name='book',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['updated_at', 'id'], name='shop_book_updated_at_id'),
+        ),
+        version=3,
+        previous=2,
+    ) + [
+        migrations.CreateModel(
+            name='BookTombstone',
+            fields=[
+                ('book_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['deleted_at', 'book_id'], name='shop_booktombstone_deleted_at')],
+            },
+        ),
+        migrations.RunPython(upgrade_triggers, downgrade_triggers),
+    ]
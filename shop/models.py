@@ -1,5 +1,231 @@
 from django.contrib.auth.models import User
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connections, models, router, transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast, NullIf
+from django.utils import timezone
+
+from shop import facets
+from shop.signals import books_changed
+
+
+class BookQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # Facets of books skipped by ignore_conflicts=True would be counted,
+        # rebuild them after such loads.
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self.adjust_facets(added=[book.facet_values() for book in objs])
+        # Only the ids known here, SQLite does not return generated ones.
+        self.books_created([book.pk for book in objs if book.pk is not None])
+        for book in objs:
+            book._loaded_facets = book.facet_values()
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        self._for_write = True
+        if not {'author_name', 'price'} & set(fields):
+            return self._bulk_update(objs, fields, *args, **kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            # Count down what the rows hold, not what the instances were
+            # loaded with: concurrent writes may have changed them since.
+            loaded = {pk: (author_name, price) for pk, author_name, price in self.select_for_update().filter(
+                pk__in=[book.pk for book in objs]
+            ).order_by('pk').values_list('pk', 'author_name', 'price')}
+            removed = [loaded[book.pk] for book in objs if book.pk in loaded]
+            updated = self._bulk_update(objs, fields, *args, **kwargs)
+            self.adjust_facets(removed=removed, added=[book.facet_values() for book in objs if book.pk in loaded])
+        for book in objs:
+            book._loaded_facets = book.facet_values()
+        return updated
+
+    def _bulk_update(self, objs, fields, *args, **kwargs):
+        # bulk_update() does not run auto_now.
+        now = timezone.now()
+        for book in objs:
+            book.updated_at = now
+        return super().bulk_update(objs, [*fields, 'updated_at'], *args, **kwargs)
+
+    def delete(self):
+        # One facet update and tombstone insert for all the deleted books
+        # rather than one each.
+        self._for_write = True
+        with transaction.atomic(using=self.db, savepoint=False), facets.collect_deleted() as deleted:
+            result = super().delete()
+            self.books_deleted(deleted)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def books_deleted(self, deleted):
+        """
+        Count down the facets of the ``(book_id, (author_name, price))`` of
+        ``deleted`` and leave their tombstones.
+        """
+        self.adjust_facets(removed=[values for _, values in deleted])
+        BookTombstone.objects.using(self.db).record([book_id for book_id, _ in deleted])
+
+    def books_created(self, book_ids):
+        """
+        Drop the tombstones of ``book_ids``, ids of deleted books may be
+        given to new ones.
+        """
+        if book_ids:
+            BookTombstone.objects.using(self.db).filter(book_id__in=book_ids).delete()
+
+    def adjust_facets(self, removed=(), added=()):
+        """
+        Update the stored facet counts for books with the ``(author_name,
+        price)`` of ``removed`` going away and those of ``added`` appearing.
+        """
+        BookFacet.objects.using(self.db).apply(facets.facet_deltas(removed, added))
+
+    def with_rating(self):
+        """
+        Annotate ``average_rating`` from the stored counters, ``None`` for
+        books nobody has rated yet.
+        """
+        return self.annotate(
+            average_rating=Cast('rating_sum', FloatField()) /
+            Cast(NullIf('rating_count', 0), FloatField())
+        )
+
+
+def supports_upsert(connection, returning=False):
+    """
+    Whether ``connection`` runs ``INSERT ... ON CONFLICT DO UPDATE``, and
+    ``RETURNING`` on top of it if asked.
+    """
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= ((3, 35, 0) if returning else (3, 24, 0))
+    return False
+
+
+class UserBookRelationQuerySet(models.QuerySet):
+    # Rows per INSERT of bulk_upsert(), 5 parameters each stays below
+    # SQLite's default limit of 999.
+    upsert_batch_size = 150
+
+    def upsert(self, user, book_id, **values):
+        """
+        Create the relation of ``user`` to ``book_id`` with ``values``, or set
+        ``values`` on the existing one, and return it. Returns ``None`` if the
+        book does not exist.
+
+        On PostgreSQL and SQLite this is a single ``INSERT ... ON CONFLICT DO
+        UPDATE ... RETURNING`` statement, so concurrent calls for the same
+        pair cannot create duplicates or lose each other's fields.
+        """
+        connection = connections[self.db]
+        if supports_upsert(connection, returning=True):
+            return self._upsert_returning(connection, user, book_id, values)
+        return self._upsert_fallback(user, book_id, values)
+
+    def _upsert_returning(self, connection, user, book_id, values):
+        meta = self.model._meta
+        qn = connection.ops.quote_name
+        fields = [field for field in meta.concrete_fields if not field.primary_key]
+        row = {'user': user.pk, 'book': book_id}
+        row.update((field.name, values.get(field.name, field.get_default()))
+                   for field in fields if field.name not in row)
+
+        columns = ', '.join(qn(field.column) for field in fields)
+        # Typed placeholders, PostgreSQL cannot infer the type of a NULL in a
+        # SELECT list.
+        placeholders = ', '.join(f'CAST(%s AS {field.cast_db_type(connection)})' for field in fields)
+        updated = [qn(meta.get_field(name).column) for name in values] or [qn('user_id')]
+        returning = ', '.join(qn(field.column) for field in meta.concrete_fields)
+        book = Book._meta
+        sql = (
+            f'INSERT INTO {qn(meta.db_table)} ({columns}) '
+            f'SELECT {placeholders} WHERE EXISTS '
+            f'(SELECT 1 FROM {qn(book.db_table)} WHERE {qn(book.pk.column)} = %s) '
+            f'ON CONFLICT ({qn("user_id")}, {qn("book_id")}) DO UPDATE SET '
+            f'{", ".join(f"{column} = EXCLUDED.{column}" for column in updated)} '
+            f'RETURNING {returning}'
+        )
+        params = [field.get_db_prep_save(row[field.name], connection) for field in fields] + [book_id]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            result = cursor.fetchone()
+        if result is None:
+            return None
+        # No post_save is sent for the raw statement.
+        if 'like' in values or 'rate' in values:
+            books_changed.send(sender=self.model, book_ids=[book_id])
+        return self.model.from_db(self.db, [field.attname for field in meta.concrete_fields], [
+            field.to_python(value) for field, value in zip(meta.concrete_fields, result)
+        ])
+
+    def bulk_upsert(self, rows):
+        """
+        Apply ``(user_id, book_id, values)`` rows as ``upsert()`` does, with
+        one multi-row ``INSERT ... ON CONFLICT DO UPDATE`` per batch of rows
+        setting the same fields. Each ``(user_id, book_id)`` pair may appear
+        once. Rows of books that no longer exist are skipped. Returns the
+        number of rows written.
+        """
+        rows = list(rows)
+        existing = set(Book.objects.using(self.db).filter(
+            pk__in={book_id for _, book_id, _ in rows}
+        ).values_list('pk', flat=True))
+        rows = [row for row in rows if row[1] in existing]
+
+        connection = connections[self.db]
+        if not supports_upsert(connection):
+            users = {user.pk: user for user in User.objects.using(self.db).filter(
+                pk__in={user_id for user_id, _, _ in rows}
+            )}
+            for user_id, book_id, values in rows:
+                self._upsert_fallback(users[user_id], book_id, values)
+            return len(rows)
+
+        groups = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row[2])), []).append(row)
+        meta = self.model._meta
+        qn = connection.ops.quote_name
+        fields = [field for field in meta.concrete_fields if not field.primary_key]
+        columns = ', '.join(qn(field.column) for field in fields)
+        placeholders = '(' + ', '.join(['%s'] * len(fields)) + ')'
+        with connection.cursor() as cursor:
+            for names, group in groups.items():
+                updated = [qn(meta.get_field(name).column) for name in names] or [qn('user_id')]
+                update = ', '.join(f'{column} = EXCLUDED.{column}' for column in updated)
+                for start in range(0, len(group), self.upsert_batch_size):
+                    batch = group[start:start + self.upsert_batch_size]
+                    params = []
+                    for user_id, book_id, values in batch:
+                        row = dict(values, user=user_id, book=book_id)
+                        params.extend(field.get_db_prep_save(row.get(field.name, field.get_default()), connection)
+                                      for field in fields)
+                    cursor.execute(
+                        f'INSERT INTO {qn(meta.db_table)} ({columns}) '
+                        f'VALUES {", ".join([placeholders] * len(batch))} '
+                        f'ON CONFLICT ({qn("user_id")}, {qn("book_id")}) DO UPDATE SET {update}',
+                        params
+                    )
+
+        book_ids = {book_id for _, book_id, values in rows if 'like' in values or 'rate' in values}
+        if book_ids:
+            books_changed.send(sender=self.model, book_ids=list(book_ids))
+        return len(rows)
+
+    def _upsert_fallback(self, user, book_id, values):
+        if not Book.objects.using(self.db).filter(pk=book_id).exists():
+            return None
+        with transaction.atomic(using=self.db):
+            relation, created = self.select_for_update().get_or_create(
+                user=user, book_id=book_id, defaults=values
+            )
+            if not created and values:
+                for name, value in values.items():
+                    setattr(relation, name, value)
+                relation.save(update_fields=list(values))
+        return relation
 
 
 class Book(models.Model):
@@ -10,10 +236,73 @@ class Book(models.Model):
                               null=True, related_name='my_books')
     readers = models.ManyToManyField(User, through='UserBookRelation',
                                      related_name='books')
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    # Sort key of the best rated books, 0 when unrated, see shop.counters.
+    rating_average = models.FloatField(default=0, editable=False)
+    # Only populated on PostgreSQL, see shop.search.
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Also bumped by the counter triggers, see shop.sync.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BookQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination seeks on (ordering field, id).
+            models.Index(fields=['price', 'id'], name='shop_book_price_id'),
+            models.Index(fields=['author_name', 'id'], name='shop_book_author_name_id'),
+            models.Index(fields=['likes_count', 'id'], name='shop_book_likes_count_id'),
+            models.Index(fields=['rating_average', 'id'], name='shop_book_rating_average_id'),
+            # Filters of shop.filters.BookFilter combined with an ordering.
+            models.Index(fields=['author_name', 'price', 'id'], name='shop_book_author_price_id'),
+            models.Index(fields=['owner', 'id'], name='shop_book_owner_id'),
+            # Delta sync reads changes in (updated_at, id) order.
+            models.Index(fields=['updated_at', 'id'], name='shop_book_updated_at_id'),
+        ]
+
+    # Columns maintained by database triggers (shop.counters, shop.search).
+    TRIGGER_FIELDS = ('likes_count', 'rating_sum', 'rating_count', 'rating_average', 'search_vector')
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'author_name' in field_names and 'price' in field_names:
+            # What the facet counts hold for this book, see shop.facets.
+            instance._loaded_facets = instance.facet_values()
+        return instance
+
+    def facet_values(self):
+        return self.author_name, self.price
+
+    def save(self, *args, **kwargs):
+        # Never write back the possibly stale values of trigger maintained
+        # columns loaded with this instance.
+        if not self._state.adding and not args and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.TRIGGER_FIELDS
+            ]
+        elif kwargs.get('update_fields'):
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'updated_at'}
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding or (update_fields is not None and not {'author_name', 'price'} & set(update_fields)):
+            super().save(*args, **kwargs)
+            return
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            # The facets to count down are those of the row as it is now, not
+            # as this instance was loaded: a concurrent save may have moved
+            # the book to other buckets since. The lock holds off the next.
+            self._loaded_facets = type(self).objects.using(using).select_for_update().filter(
+                pk=self.pk
+            ).values_list('author_name', 'price').first()
+            super().save(*args, **kwargs)
+
 
 class UserBookRelation(models.Model):
     RATE_CHOICES = (
@@ -30,5 +319,149 @@ class UserBookRelation(models.Model):
     in_bookmarks = models.BooleanField(default=False)
     rate = models.PositiveSmallIntegerField(choices=RATE_CHOICES, null=True)
 
+    objects = UserBookRelationQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'book'], name='shop_userbookrelation_user_book'),
+        ]
+
     def __str__(self):
         return f'{self.user.username}: {self.book.name}, {self.rate}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {field.attname: getattr(self, field.attname)
+                               for field in self._meta.concrete_fields}
+
+    def changed_book_ids(self):
+        """
+        Ids of the books whose like/rating counters differ between the values
+        this relation was loaded with and its current values.
+        """
+        def counted(book_id, like, rate):
+            return (book_id, like, rate) if like or rate is not None else None
+
+        loaded = getattr(self, '_loaded_values', {})
+        old = counted(loaded.get('book_id'), loaded.get('like', False), loaded.get('rate'))
+        new = counted(self.book_id, self.like, self.rate)
+        if old == new:
+            return set()
+        return {state[0] for state in (old, new) if state is not None}
+
+
+class BookFacetQuerySet(models.QuerySet):
+    # Rows per INSERT of apply(), 3 parameters each.
+    apply_batch_size = 300
+
+    def apply(self, deltas):
+        """
+        Add the ``{(facet, value): change}`` of ``deltas`` to the stored
+        counts, creating missing rows, with one ``INSERT ... ON CONFLICT DO
+        UPDATE`` per batch of rows where supported. Rows left at 0 stay until
+        the next rebuild, readers skip them.
+        """
+        if not deltas:
+            return
+        connection = connections[self.db]
+        if supports_upsert(connection):
+            qn = connection.ops.quote_name
+            table, count = qn(self.model._meta.db_table), qn('count')
+            # Sorted, so concurrent writers lock the rows in the same order.
+            deltas = sorted(deltas.items())
+            with connection.cursor() as cursor:
+                for start in range(0, len(deltas), self.apply_batch_size):
+                    batch = deltas[start:start + self.apply_batch_size]
+                    cursor.execute(
+                        f'INSERT INTO {table} ({qn("facet")}, {qn("value")}, {count}) '
+                        f'VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                        f'ON CONFLICT ({qn("facet")}, {qn("value")}) '
+                        f'DO UPDATE SET {count} = {table}.{count} + EXCLUDED.{count}',
+                        [param for (facet, value), delta in batch for param in (facet, value, delta)]
+                    )
+        else:
+            with transaction.atomic(using=self.db):
+                for (facet, value), delta in deltas.items():
+                    row, created = self.select_for_update().get_or_create(
+                        facet=facet, value=value, defaults={'count': delta}
+                    )
+                    if not created:
+                        self.filter(pk=row.pk).update(count=F('count') + delta)
+
+
+class BookFacet(models.Model):
+    """
+    Number of books per value of a facet of the book list, see shop.facets.
+    """
+    facet = models.CharField(max_length=32)
+    value = models.CharField(max_length=255)
+    count = models.IntegerField(default=0)
+
+    objects = BookFacetQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='shop_bookfacet_facet_value'),
+        ]
+
+    def __str__(self):
+        return f'{self.facet}={self.value}: {self.count}'
+
+
+class BookTombstoneQuerySet(models.QuerySet):
+    # Rows per INSERT of record(), 2 parameters each.
+    record_batch_size = 450
+
+    def record(self, book_ids):
+        """
+        Note the deletion of the books of ``book_ids`` now. A tombstone left
+        by an earlier deletion of the same id is moved to now, so clients
+        that synced since then learn about this one.
+        """
+        if not book_ids:
+            return
+        now = timezone.now()
+        connection = connections[self.db]
+        if not supports_upsert(connection):
+            with transaction.atomic(using=self.db, savepoint=False):
+                self.filter(book_id__in=book_ids).delete()
+                self.bulk_create([self.model(book_id=book_id, deleted_at=now) for book_id in book_ids])
+            return
+
+        meta = self.model._meta
+        qn = connection.ops.quote_name
+        id_column, deleted_column = qn(meta.get_field('book_id').column), qn(meta.get_field('deleted_at').column)
+        now = meta.get_field('deleted_at').get_db_prep_save(now, connection)
+        with connection.cursor() as cursor:
+            for start in range(0, len(book_ids), self.record_batch_size):
+                batch = book_ids[start:start + self.record_batch_size]
+                cursor.execute(
+                    f'INSERT INTO {qn(meta.db_table)} ({id_column}, {deleted_column}) '
+                    f'VALUES {", ".join(["(%s, %s)"] * len(batch))} '
+                    f'ON CONFLICT ({id_column}) DO UPDATE SET {deleted_column} = EXCLUDED.{deleted_column}',
+                    [param for book_id in batch for param in (book_id, now)]
+                )
+
+
+class BookTombstone(models.Model):
+    """
+    A deleted book, so delta sync can tell clients to drop it, see shop.sync.
+    """
+    book_id = models.IntegerField(primary_key=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    objects = BookTombstoneQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'book_id'], name='shop_booktombstone_deleted_at'),
+        ]
+
+    def __str__(self):
+        return f'{self.book_id} deleted at {self.deleted_at}'
@@ -0,0 +1,134 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+Cursor = namedtuple('Cursor', ['ordering', 'position', 'reverse'])
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination that seeks on the full ordering tuple.
+
+    The ordering is taken from the queryset as left by the filter backends
+    (so ``OrderingFilter`` and the view's default ordering both apply) and the
+    primary key is appended as a tiebreaker. Each page seeks past the
+    ``(a, pk)`` tuple of the last row seen and reads ``page_size + 1`` rows,
+    which an index on ``(a, pk)`` answers in the same time for the first and
+    the thousandth page. Cursors are opaque base64 encoded JSON.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_keyset_ordering(queryset)
+        self.cursor = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if self.cursor is not None:
+            if self.cursor.ordering != ordering:
+                raise NotFound(self.invalid_cursor_message)
+            if self.cursor.reverse:
+                ordering = [self.reverse_field(field) for field in ordering]
+            try:
+                queryset = queryset.filter(self.keyset_filter(ordering, self.cursor.position))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.cursor is not None and self.cursor.reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return self.page
+
+    def get_keyset_ordering(self, queryset):
+        pk_name = queryset.model._meta.pk.name
+        ordering = [
+            {'pk': pk_name, '-pk': f'-{pk_name}'}.get(field, field)
+            for field in queryset.query.order_by if isinstance(field, str)
+        ]
+        if pk_name not in {field.lstrip('-') for field in ordering}:
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append(f'-{pk_name}' if descending else pk_name)
+        return ordering
+
+    @staticmethod
+    def reverse_field(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def keyset_filter(ordering, position):
+        """
+        Rows strictly after ``position`` in ``ordering``, written as
+        ``a >= x AND (a > x OR (a = x AND <rest>))`` so the leading column
+        stays usable as an index range condition.
+        """
+        condition = None
+        for field, value in reversed(list(zip(ordering, position))):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            after = Q(**{f'{name}__{lookup}': value})
+            if condition is None:
+                condition = after
+            else:
+                condition = Q(**{f'{name}__{lookup}e': value}) & (after | Q(**{name: value}) & condition)
+        return condition
+
+    def get_position(self, item):
+        return [
+            item[field.lstrip('-')] if isinstance(item, dict) else getattr(item, field.lstrip('-'))
+            for field in self.ordering
+        ]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return self.encode_cursor(self.cursor._replace(reverse=False))
+        return self.encode_cursor(Cursor(self.ordering, self.get_position(self.page[-1]), False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return self.encode_cursor(self.cursor._replace(reverse=True))
+        return self.encode_cursor(Cursor(self.ordering, self.get_position(self.page[0]), True))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            cursor = Cursor(list(data['o']), list(data['p']), bool(data['r']))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if len(cursor.position) != len(cursor.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, cursor):
+        data = {'o': cursor.ordering, 'p': cursor.position, 'r': int(cursor.reverse)}
+        encoded = urlsafe_b64encode(json.dumps(data, cls=DjangoJSONEncoder).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
@@ -0,0 +1,167 @@
+"""
+In-process database connection pool.
+
+``ConnectionPool`` hands out at most ``max_size`` DB-API connections made by
+``connect()``, to any thread. A connection is reused after being released
+unless it is broken, older than ``max_lifetime`` seconds, or has been idle for
+``max_idle`` seconds; one idle for more than ``check_interval`` seconds is
+health-checked before it is handed out again. ``acquire()`` waits at most
+``timeout`` seconds for a connection when all of them are in use and raises
+``PoolTimeout`` after that.
+
+The pool knows nothing about Django. The ``shop.backends.postgresql_pool``
+database backend plugs it into psycopg2 connections.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, max_size=10, timeout=5.0, max_lifetime=1800.0, max_idle=600.0,
+                 check_interval=30.0, check=None, reset=None):
+        """
+        ``check(connection)`` returns whether an idle connection still works,
+        ``reset(connection)`` prepares a released one for its next user and
+        returns ``False`` if it cannot be reused.
+        """
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+        self.check = check
+        self.reset = reset
+        self.pid = os.getpid()
+        self.condition = threading.Condition()
+        # Most recently released last: (connection, released at).
+        self.idle = deque()
+        self.created_at = {}
+        self.size = 0
+        self.closed = False
+        self.stats = {'connects': 0, 'acquires': 0, 'waits': 0, 'timeouts': 0, 'discards': 0}
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self.condition:
+            self.stats['acquires'] += 1
+        waited = False
+        while True:
+            with self.condition:
+                while True:
+                    if self.closed:
+                        raise PoolTimeout('The connection pool is closed.')
+                    if self.idle:
+                        connection, released_at = self.idle.pop()
+                        break
+                    if self.size < self.max_size:
+                        self.size += 1
+                        connection = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f'No connection available within {self.timeout}s, all {self.max_size} are in use.'
+                        )
+                    if not waited:
+                        self.stats['waits'] += 1
+                        waited = True
+                    self.condition.wait(remaining)
+            if connection is None:
+                break
+            # Health check outside the lock: the connection is out of the
+            # idle list, no other thread can take it meanwhile.
+            if self.usable(connection, released_at):
+                return connection
+            with self.condition:
+                self.discard(connection)
+                self.condition.notify()
+
+        # Connect outside the lock, other threads can use the pool meanwhile.
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.stats['connects'] += 1
+            self.created_at[id(connection)] = time.monotonic()
+        return connection
+
+    def usable(self, connection, released_at):
+        """
+        Whether an idle connection taken out of the pool can be handed out.
+        Called without the lock, a slow health check only holds up the
+        thread that acquires.
+        """
+        now = time.monotonic()
+        if self.expired(connection, now) or now - released_at > self.max_idle:
+            return False
+        if self.check is not None and now - released_at > self.check_interval:
+            try:
+                return self.check(connection)
+            except Exception:
+                return False
+        return True
+
+    def expired(self, connection, now):
+        return now - self.created_at.get(id(connection), now) > self.max_lifetime
+
+    def release(self, connection, discard=False):
+        """
+        Give ``connection`` back to the pool, or close it if ``discard`` is
+        true, the pool is closed or it cannot be reused.
+        """
+        if os.getpid() != self.pid:
+            # Inherited from the parent process, closing it would end the
+            # parent's session too.
+            return
+        reusable = not discard
+        if reusable and self.reset is not None:
+            try:
+                reusable = self.reset(connection)
+            except Exception:
+                reusable = False
+        with self.condition:
+            if reusable and not self.closed and not self.expired(connection, time.monotonic()):
+                self.idle.append((connection, time.monotonic()))
+            else:
+                self.discard(connection)
+            self.condition.notify()
+
+    def discard(self, connection):
+        """
+        Close a connection taken out of the pool for good. Called with the
+        lock held.
+        """
+        self.size -= 1
+        self.stats['discards'] += 1
+        self.created_at.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """
+        Close the idle connections, those in use are closed on release.
+        """
+        with self.condition:
+            self.closed = True
+            while self.idle:
+                connection, _ = self.idle.pop()
+                self.discard(connection)
+            self.condition.notify_all()
+
+    def status(self):
+        with self.condition:
+            return dict(self.stats, size=self.size, idle=len(self.idle), in_use=self.size - len(self.idle))
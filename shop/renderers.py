@@ -0,0 +1,171 @@
+import array
+import math
+import sys
+from decimal import Decimal
+from itertools import islice
+
+import msgpack
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class NDJSONRenderer(JSONRenderer):
+    """
+    Renderer which serializes to newline delimited JSON, one document per line.
+    Lists are rendered as one line per item.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, list):
+            return b''.join(self.stream(data))
+        return super().render(data) + b'\n'
+
+    def stream(self, rows):
+        """
+        Lazily render an iterable of rows, yielding one line per row.
+        """
+        render = super().render
+        for row in rows:
+            yield render(row) + b'\n'
+
+
+def stream_json_array(renderer, rows):
+    """
+    Lazily render an iterable of rows as a single JSON array with ``renderer``,
+    yielding one chunk per row.
+    """
+    yield b'['
+    separator = b''
+    for row in rows:
+        yield separator + renderer.render(row)
+        separator = b','
+    yield b']'
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renderer which serializes to MessagePack, the same documents as JSON in
+    a compact binary encoding. Decimals and dates become strings as in JSON.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=DjangoJSONEncoder().default, use_bin_type=True)
+
+    def stream(self, rows):
+        """
+        Lazily render an iterable of rows as a sequence of MessagePack
+        documents, one per row (read back with ``msgpack.Unpacker``).
+        """
+        packer = msgpack.Packer(default=DjangoJSONEncoder().default, use_bin_type=True)
+        for row in rows:
+            yield packer.pack(row)
+
+
+class ColumnarRenderer(MessagePackRenderer):
+    """
+    Renderer for bulk consumers: a list of books becomes one MessagePack map
+    per batch of rows, ``{'rows': n, 'columns': {name: column}}``.
+
+    The numeric columns of ``typed_columns`` are little-endian typed arrays,
+    ``{'type': 'int64', 'data': <bytes>}``, ready for ``numpy.frombuffer()``
+    or ``array.frombytes()``; decimals are scaled to integers (``'scale': 2``
+    for cents) and a missing ``average_rating`` is NaN. Other columns are
+    plain MessagePack arrays, ``{'type': 'object', 'data': [...]}``.
+    Paginated responses keep their links with the batch as ``results``, and
+    delta sync responses (shop.sync) theirs as ``changed``; anything else is
+    rendered as by ``MessagePackRenderer``.
+    """
+    media_type = 'application/vnd.books.columnar+msgpack'
+    format = 'columnar'
+    # Column name: (type, array typecode, decimal scale)
+    typed_columns = {
+        'id': ('int64', 'q', None),
+        'price': ('int64', 'q', 2),
+        'likes_count': ('uint32', 'I', None),
+        'average_rating': ('float64', 'd', None),
+    }
+    batch_size = 10000
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, list):
+            data = self.batch(data)
+        elif isinstance(data, dict) and isinstance(data.get('results'), list):
+            data = dict(data, results=self.batch(data['results']))
+        elif isinstance(data, dict) and isinstance(data.get('changed'), list):
+            data = dict(data, changed=self.batch(data['changed']))
+        return super().render(data, accepted_media_type, renderer_context)
+
+    def stream(self, rows):
+        """
+        Lazily render an iterable of rows, one map per ``batch_size`` rows.
+        """
+        packer = msgpack.Packer(default=DjangoJSONEncoder().default, use_bin_type=True)
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return
+            yield packer.pack(self.batch(batch))
+
+    def batch(self, rows):
+        names = list(rows[0]) if rows else list(self.typed_columns)
+        columns = {}
+        for name in names:
+            values = [row.get(name) for row in rows]
+            if name in self.typed_columns:
+                columns[name] = self.typed_column(name, values)
+            else:
+                columns[name] = {'type': 'object', 'data': values}
+        return {'rows': len(rows), 'columns': columns}
+
+    def typed_column(self, name, values):
+        type_name, typecode, scale = self.typed_columns[name]
+        if scale is not None:
+            # Exact for the at most 15 significant digits a double holds.
+            factor = 10 ** scale
+            values = [round(float(value) * factor) for value in values]
+        elif typecode == 'd':
+            values = [math.nan if value is None else float(value) for value in values]
+        data = array.array(typecode, values)
+        if sys.byteorder == 'big':
+            data.byteswap()
+        column = {'type': type_name, 'data': data.tobytes()}
+        if scale is not None:
+            column['scale'] = scale
+        return column
+
+
+TYPECODES = {'int64': 'q', 'uint32': 'I', 'float64': 'd'}
+
+
+def read_columns(batch):
+    """
+    ``{name: list of values}`` of a batch rendered by ``ColumnarRenderer``,
+    with scaled columns as ``Decimal`` and NaN as ``None``.
+    """
+    columns = {}
+    for name, column in batch['columns'].items():
+        if column['type'] == 'object':
+            columns[name] = column['data']
+            continue
+        data = array.array(TYPECODES[column['type']])
+        data.frombytes(column['data'])
+        if sys.byteorder == 'big':
+            data.byteswap()
+        if 'scale' in column:
+            columns[name] = [Decimal(value).scaleb(-column['scale']) for value in data]
+        elif column['type'] == 'float64':
+            columns[name] = [None if math.isnan(value) else value for value in data]
+        else:
+            columns[name] = data.tolist()
+    return columns
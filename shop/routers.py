@@ -0,0 +1,124 @@
+"""
+Read replica routing.
+
+``ReplicaMiddleware`` lets the reads of ``GET``/``HEAD``/``OPTIONS`` requests
+go to one of ``settings.DATABASE_REPLICAS``, picked at random per request,
+and ``ReplicaRouter`` sends them there. Everything else stays on the primary
+(``default``):
+
+* writes, and reads of requests with any other method,
+* reads inside a transaction on the primary,
+* models of other apps than ``shop`` (sessions, users, admin log...), whose
+  rows are often read right after being written,
+* reads outside of requests (commands, the write-behind thread).
+
+Read-your-writes: a successful unsafe request sets a cookie pinning the
+client to the primary for ``REPLICA_LAG_SECONDS``, so a like a user just
+made shows up in their next reads even if the replica has not caught up.
+Set it above the replica lag you expect.
+
+Responses read from a replica within ``REPLICA_LAG_SECONDS`` of a book
+change are not stored in the response cache (see ``shop.cache``), so a
+lagging replica cannot put a stale page back under the new version.
+"""
+import asyncio
+import contextvars
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICATED_APPS = {'shop'}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'primary_until'
+
+# Replica alias the reads of the current request may use, None for the primary.
+current_replica = contextvars.ContextVar('current_replica', default=None)
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def lag_window():
+    return getattr(settings, 'REPLICA_LAG_SECONDS', 5.0)
+
+
+def reading_from_replica():
+    return current_replica.get() is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = current_replica.get()
+        if replica is None or model._meta.app_label not in REPLICATED_APPS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        # Also for instances read from a replica. Other apps keep Django's
+        # default, writing where the hinted instance lives (migrate on a
+        # replica alias creates its content types and permissions there).
+        if model._meta.app_label in REPLICATED_APPS:
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function for the handler.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = current_replica.set(self.pick_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            current_replica.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = current_replica.set(self.pick_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_replica.reset(token)
+        return self.pin(request, response)
+
+    @staticmethod
+    def pick_replica(request):
+        replicas = get_replicas()
+        if not replicas or request.method not in SAFE_METHODS:
+            return None
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        if pinned_until > time.time():
+            return None
+        return random.choice(replicas)
+
+    @staticmethod
+    def pin(request, response):
+        if get_replicas() and request.method not in SAFE_METHODS and response.status_code < 400:
+            window = lag_window()
+            response.set_cookie(PIN_COOKIE, f'{time.time() + window:.3f}', max_age=max(1, round(window)),
+                                httponly=True, samesite='Lax')
+        return response
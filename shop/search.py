@@ -0,0 +1,213 @@
+"""
+Full-text search over book names and authors.
+
+On PostgreSQL ``Book.search_vector`` holds ``to_tsvector('simple', name || ' '
+|| author_name)``, maintained by a trigger and indexed with GIN (see migration
+0009). Other databases, i.e. the SQLite test setup, use ``InvertedIndex``, an
+in-process fallback with the same matching rules: every search term must be a
+whole word of the name or the author, and ``rank`` is the number of matching
+words divided by the document length.
+
+Both backends expose ``search(queryset, terms)``, which filters the queryset
+and annotates and orders it by ``rank``. ``InvertedIndex`` passes the ranks
+of a few matches to the query as parameters; more, which would go over
+SQLite's limit of parameters per statement (999, 32766 since SQLite 3.32),
+are written to a temporary table of the connection that the query joins.
+"""
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+from django.dispatch import receiver
+from rest_framework.filters import SearchFilter
+
+from shop.signals import books_changed
+
+SEARCH_CONFIG = 'simple'
+
+# ts_rank() normalization: divide the rank by the document length.
+RANK_NORMALIZATION = 2
+
+
+class PostgresSearchBackend:
+    def search(self, queryset, terms):
+        query = SearchQuery(' '.join(terms), config=SEARCH_CONFIG)
+        rank = SearchRank(F('search_vector'), query, normalization=RANK_NORMALIZATION)
+        # ts_rank() returns a float4, cast it so cursors round trip exactly.
+        return queryset.filter(search_vector=query).annotate(
+            rank=Cast(rank, FloatField())
+        ).order_by('-rank', 'id')
+
+
+class InvertedIndex:
+    """
+    Term -> {book id: term frequency} postings of every book of the database
+    ``using``, built from it on first use. ``books_changed`` marks books
+    dirty and they are reloaded in one query before the next search, so the
+    index follows writes made by this process only.
+    """
+    word_re = re.compile(r'\w+')
+    # Matches whose ranks go into the query as parameters, two each.
+    max_inline_matches = 400
+    # Temporary table of the ranks of larger match sets, rows of the last
+    # ``kept_searches`` searches of a connection are kept.
+    ranks_table = 'shop_search_rank'
+    kept_searches = 8
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self.lock = threading.Lock()
+        self.postings = None
+        self.documents = {}
+        self.dirty = set()
+
+    def tokenize(self, text):
+        return self.word_re.findall(text.lower())
+
+    def clear(self):
+        """
+        Forget everything, the index is rebuilt on the next search.
+        """
+        with self.lock:
+            self.postings = None
+            self.documents = {}
+            self.dirty = set()
+
+    def mark_dirty(self, book_ids):
+        with self.lock:
+            self.dirty.update(book_ids)
+
+    def refresh(self, model):
+        if self.postings is None:
+            self.postings = defaultdict(dict)
+            books = model.objects.using(self.using).all()
+        elif self.dirty:
+            books = model.objects.using(self.using).filter(id__in=self.dirty)
+            for book_id in self.dirty:
+                self.remove(book_id)
+        else:
+            return
+        self.dirty = set()
+        for book_id, name, author_name in books.values_list('id', 'name', 'author_name').iterator():
+            self.add(book_id, f'{name} {author_name}')
+
+    def add(self, book_id, text):
+        words = self.tokenize(text)
+        counts = Counter(words)
+        self.documents[book_id] = (len(words), list(counts))
+        for word, count in counts.items():
+            self.postings[word][book_id] = count
+
+    def remove(self, book_id):
+        _, words = self.documents.pop(book_id, (0, []))
+        for word in words:
+            postings = self.postings[word]
+            del postings[book_id]
+            if not postings:
+                del self.postings[word]
+
+    def ranks(self, model, terms):
+        """
+        Return {book id: rank} for books containing every word of ``terms``.
+        """
+        words = self.tokenize(' '.join(terms))
+        if not words:
+            return {}
+        with self.lock:
+            self.refresh(model)
+            matches = [self.postings.get(word, {}) for word in words]
+            book_ids = set.intersection(*(set(postings) for postings in matches))
+            return {
+                book_id: sum(postings[book_id] for postings in matches) / self.documents[book_id][0]
+                for book_id in book_ids
+            }
+
+    def search(self, queryset, terms):
+        ranks = self.ranks(queryset.model, terms)
+        if len(ranks) <= self.max_inline_matches:
+            rank = Case(
+                *(When(id=book_id, then=Value(value)) for book_id, value in ranks.items()),
+                default=Value(0.0), output_field=FloatField()
+            )
+            return queryset.filter(id__in=list(ranks)).annotate(rank=rank).order_by('-rank', 'id')
+
+        connection = connections[queryset.db]
+        search = self.store_ranks(connection, ranks)
+        qn = connection.ops.quote_name
+        table, book_id = qn(self.ranks_table), f'{qn(queryset.model._meta.db_table)}.{qn("id")}'
+        rank = RawSQL(f'SELECT {qn("rank")} FROM {table} WHERE {qn("search")} = %s AND {qn("book_id")} = {book_id}',
+                      [search], output_field=FloatField())
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT {qn("book_id")} FROM {table} WHERE {qn("search")} = %s', [search])
+        ).annotate(rank=rank).order_by('-rank', 'id')
+
+    def store_ranks(self, connection, ranks):
+        """
+        Write ``ranks`` to the temporary table of ``connection`` and return
+        the number of the search they belong to there.
+        """
+        search = connection.search_ranks_count = getattr(connection, 'search_ranks_count', 0) + 1
+        qn = connection.ops.quote_name
+        table = qn(self.ranks_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE IF NOT EXISTS {table} ({qn("search")} integer, {qn("book_id")} integer, '
+                f'{qn("rank")} real, PRIMARY KEY ({qn("search")}, {qn("book_id")}))'
+            )
+            cursor.execute(f'DELETE FROM {table} WHERE {qn("search")} <= %s', [search - self.kept_searches])
+            cursor.executemany(f'INSERT INTO {table} VALUES (%s, %s, %s)',
+                               [(search, book_id, rank) for book_id, rank in ranks.items()])
+        return search
+
+
+postgres_backend = PostgresSearchBackend()
+# By database alias, each follows the books of its own database.
+inverted_indexes = {}
+_inverted_indexes_lock = threading.Lock()
+
+
+def get_inverted_index(alias):
+    index = inverted_indexes.get(alias)
+    if index is None:
+        with _inverted_indexes_lock:
+            index = inverted_indexes.setdefault(alias, InvertedIndex(alias))
+    return index
+
+
+def clear_inverted_indexes():
+    for index in list(inverted_indexes.values()):
+        index.clear()
+
+
+@receiver(books_changed)
+def update_inverted_index(sender, book_ids, **kwargs):
+    # Writes reach every database reading from the one written, replicas
+    # included: mark the books dirty everywhere.
+    for index in list(inverted_indexes.values()):
+        if index.postings is not None:
+            index.mark_dirty(book_ids)
+
+
+def get_search_backend(connection):
+    if connection.vendor == 'postgresql':
+        return postgres_backend
+    return get_inverted_index(connection.alias)
+
+
+class BookSearchFilter(SearchFilter):
+    """
+    ``SearchFilter`` backed by the full-text search backend of the database
+    the queryset reads from. Results are ordered by rank unless an explicit
+    ordering is requested.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+        return get_search_backend(connections[queryset.db]).search(queryset, search_terms)
@@ -0,0 +1,293 @@
+"""
+Synthetic users, books and book relations for benchmarks, capacity planning
+and reproducing slow queries locally (``manage.py seed_books``).
+
+Data is generated from a fixed random seed in chunks, so a run needs memory
+for one chunk only and the same seed always produces the same data. Rows are
+written with explicit book and user ids, which lets the relations of a chunk
+be generated together with its books. The stored counters of each book are
+computed from its relations on the way, so the counter triggers are paused
+during the load instead of updating a book row for every relation. The facet
+counts of ``shop.facets`` are rebuilt in one pass at the end.
+
+Three loaders write the chunks:
+
+* ``copy``: PostgreSQL ``COPY ... FROM STDIN``.
+* ``sqlite``: ``executemany()`` on the raw sqlite3 connection.
+* ``orm``: ``bulk_create()``, for every database.
+
+Secondary indexes of the seeded tables can be dropped before the load and
+recreated after it, which is cheaper than maintaining them row by row as long
+as the load is at least as big as what the tables already hold.
+"""
+import csv
+import io
+import random
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from shop import facets
+from shop.counters import triggers_paused
+from shop.models import Book, BookFacet, UserBookRelation
+from shop.search import clear_inverted_indexes
+from shop.signals import books_changed
+
+USER_FIELDS = ('id', 'username', 'password', 'first_name', 'last_name', 'email',
+               'is_superuser', 'is_staff', 'is_active', 'date_joined')
+BOOK_FIELDS = ('id', 'name', 'author_name', 'price', 'owner_id',
+               'likes_count', 'rating_sum', 'rating_count', 'rating_average', 'updated_at')
+RELATION_FIELDS = ('user_id', 'book_id', 'like', 'in_bookmarks', 'rate')
+
+RATES = (None, 1, 2, 3, 4, 5)
+
+# Vocabulary of the generated names, also used by the benchmarks.
+WORDS = (
+    'art', 'beyond', 'blue', 'city', 'code', 'cold', 'dark', 'dawn', 'deep', 'design', 'dream',
+    'empire', 'end', 'fire', 'first', 'forest', 'garden', 'ghost', 'glass', 'gold', 'guide',
+    'heart', 'history', 'home', 'house', 'iron', 'island', 'journey', 'king', 'last', 'light',
+    'lost', 'machine', 'memory', 'midnight', 'mind', 'moon', 'mountain', 'night', 'ocean',
+    'old', 'paper', 'python', 'queen', 'rain', 'red', 'river', 'road', 'salt', 'science',
+    'sea', 'secret', 'shadow', 'silent', 'silver', 'sky', 'song', 'star', 'stone', 'storm',
+    'story', 'summer', 'sun', 'time', 'tower', 'war', 'water', 'white', 'wild', 'wind',
+    'winter', 'wolf', 'world', 'young',
+)
+FIRST_NAMES = ('Anna', 'Boris', 'Clara', 'David', 'Elena', 'Frank', 'Greta', 'Hugo', 'Ivan',
+               'Julia', 'Karl', 'Lena', 'Mark', 'Nina', 'Oleg', 'Paula', 'Ralf', 'Sara')
+LAST_NAMES = ('Adams', 'Berg', 'Costa', 'Dahl', 'Evans', 'Fischer', 'Garcia', 'Hansen', 'Ito',
+              'Jensen', 'Kuznetsov', 'Lopez', 'Moreau', 'Novak', 'Olsen', 'Petrov', 'Quinn',
+              'Rossi', 'Smith', 'Tanaka')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Generator:
+    """
+    Rows of ``users`` users, ``books`` books and ``relations`` relations
+    (at most one per user and book) spread evenly over the books. Ids start
+    after ``first_user_id`` and ``first_book_id``.
+    """
+
+    def __init__(self, users, books, relations, first_user_id, first_book_id, random_seed=0):
+        self.users = users
+        self.books = books
+        self.relations = min(relations, books * users)
+        self.first_user_id = first_user_id
+        self.first_book_id = first_book_id
+        self.rnd = random.Random(random_seed)
+
+    def user_rows(self):
+        date_joined = timezone.now()
+        for user_id in range(self.first_user_id, self.first_user_id + self.users):
+            first_name, last_name = self.rnd.choice(FIRST_NAMES), self.rnd.choice(LAST_NAMES)
+            yield (user_id, f'seed_user_{user_id}', '!', first_name, last_name, '',
+                   False, False, True, date_joined)
+
+    def book_rows(self, start, count):
+        """
+        Rows of ``count`` books from the ``start``-th one, with the rows of
+        their relations: ``(book_rows, relation_rows)``.
+        """
+        rnd = self.rnd
+        per_book, remainder = divmod(self.relations, self.books)
+        updated_at = timezone.now()
+        books, relations = [], []
+        for index in range(start, start + count):
+            book_id = self.first_book_id + index
+            likes_count = rating_sum = rating_count = 0
+            readers = rnd.sample(range(self.users), per_book + (index < remainder))
+            for reader in sorted(readers):
+                like, rate = rnd.random() < 0.5, rnd.choice(RATES)
+                likes_count += like
+                if rate is not None:
+                    rating_sum += rate
+                    rating_count += 1
+                relations.append((self.first_user_id + reader, book_id, like, rnd.random() < 0.1, rate))
+            books.append((
+                book_id,
+                ' '.join(rnd.sample(WORDS, rnd.randint(1, 4))).capitalize(),
+                f'{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}',
+                Decimal(rnd.randrange(100, 100000)) / 100,
+                self.first_user_id + rnd.randrange(self.users),
+                likes_count, rating_sum, rating_count, rating_sum / max(rating_count, 1), updated_at,
+            ))
+        return books, relations
+
+
+class Loader:
+    """
+    Writes rows of ``fields`` of a model. Values are Python values, those of
+    the few columns the database driver cannot take as is are adapted first.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def adapters(self, model, fields):
+        adapters = []
+        for index, name in enumerate(fields):
+            field = model._meta.get_field(name)
+            if field.get_internal_type() in ('DateTimeField', 'DecimalField'):
+                adapters.append((index, field))
+        return adapters
+
+    def adapt(self, model, fields, rows):
+        adapters = self.adapters(model, fields)
+        if not adapters:
+            return rows
+        adapted = []
+        for row in rows:
+            row = list(row)
+            for index, field in adapters:
+                row[index] = field.get_db_prep_save(row[index], self.connection)
+            adapted.append(row)
+        return adapted
+
+    def columns(self, model, fields):
+        quote = self.connection.ops.quote_name
+        return ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+
+    def load(self, model, fields, rows):
+        raise NotImplementedError
+
+
+class OrmLoader(Loader):
+    def load(self, model, fields, rows):
+        model.objects.bulk_create([model(**dict(zip(fields, row))) for row in rows], batch_size=1000)
+
+
+class CopyLoader(Loader):
+    def load(self, model, fields, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows(self.adapt(model, fields, rows))
+        buffer.seek(0)
+        sql = (f'COPY {self.connection.ops.quote_name(model._meta.db_table)} '
+               f'({self.columns(model, fields)}) FROM STDIN WITH (FORMAT csv)')
+        with self.connection.cursor() as cursor:
+            cursor.copy_expert(sql, buffer)
+
+
+class SQLiteLoader(Loader):
+    def load(self, model, fields, rows):
+        sql = (f'INSERT INTO {self.connection.ops.quote_name(model._meta.db_table)} '
+               f'({self.columns(model, fields)}) VALUES ({", ".join("?" * len(fields))})')
+        self.connection.ensure_connection()
+        cursor = self.connection.connection.cursor()
+        try:
+            cursor.executemany(sql, self.adapt(model, fields, rows))
+        finally:
+            cursor.close()
+
+
+LOADERS = {
+    'copy': CopyLoader,
+    'sqlite': SQLiteLoader,
+    'orm': OrmLoader,
+}
+
+
+def default_method(connection):
+    return {'postgresql': 'copy', 'sqlite': 'sqlite'}.get(connection.vendor, 'orm')
+
+
+def secondary_indexes(connection, table):
+    """
+    ``[(name, create statement)]`` of the indexes of ``table`` that do not
+    back a primary key or unique constraint.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                """
+                SELECT indexname, indexdef FROM pg_indexes
+                WHERE schemaname = current_schema() AND tablename = %s AND indexname NOT IN (
+                    SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass
+                )
+                """, [table, connection.ops.quote_name(table)]
+            )
+        elif connection.vendor == 'sqlite':
+            # Indexes of constraints are created with the table and have no SQL.
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+                [table]
+            )
+        else:
+            return []
+        return cursor.fetchall()
+
+
+def drop_indexes(connection, indexes):
+    with connection.cursor() as cursor:
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+
+
+def create_indexes(connection, indexes):
+    with connection.cursor() as cursor:
+        for _, sql in indexes:
+            cursor.execute(sql)
+
+
+def seed(connection, users, books, relations, random_seed=0, chunk_size=10000, method=None,
+         defer_indexes=None, progress=None):
+    """
+    Add ``users`` users, ``books`` books and ``relations`` relations in one
+    transaction. ``defer_indexes`` defaults to deferring when the tables hold
+    fewer rows than are loaded. ``progress(books_loaded)`` is called after
+    every chunk. Returns the number of each written: ``(users, books,
+    relations)``.
+    """
+    method = method or default_method(connection)
+    loader = LOADERS[method](connection)
+    tables = [model._meta.db_table for model in (Book, UserBookRelation)]
+
+    with transaction.atomic(using=connection.alias):
+        existing_users = User.objects.using(connection.alias).aggregate(id=Max('id'))['id'] or 0
+        existing_books = Book.objects.using(connection.alias).aggregate(id=Max('id'))['id'] or 0
+        generator = Generator(users, books, relations, existing_users + 1, existing_books + 1, random_seed)
+
+        if defer_indexes is None:
+            defer_indexes = (Book.objects.using(connection.alias).count() <= books and
+                             UserBookRelation.objects.using(connection.alias).count() <= generator.relations)
+        indexes = [index for table in tables for index in secondary_indexes(connection, table)] \
+            if defer_indexes else []
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL synchronous_commit = off')
+        drop_indexes(connection, indexes)
+        with triggers_paused(connection):
+            for rows in chunked(generator.user_rows(), chunk_size):
+                loader.load(User, USER_FIELDS, rows)
+            for start in range(0, books, chunk_size):
+                book_rows, relation_rows = generator.book_rows(start, min(chunk_size, books - start))
+                loader.load(Book, BOOK_FIELDS, book_rows)
+                loader.load(UserBookRelation, RELATION_FIELDS, relation_rows)
+                if progress is not None:
+                    progress(start + len(book_rows))
+        create_indexes(connection, indexes)
+        facets.rebuild(Book.objects.using(connection.alias), BookFacet.objects.using(connection.alias))
+
+        with connection.cursor() as cursor:
+            # Ids were given explicitly, move the sequences past them.
+            for sql in connection.ops.sequence_reset_sql(no_style(), [User, Book]):
+                cursor.execute(sql)
+            for table in [User._meta.db_table] + tables:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(table)}')
+        # The new books are in no cached detail response, only lists change.
+        books_changed.send(sender=Book, book_ids=[])
+        clear_inverted_indexes()
+    return users, books, generator.relations
@@ -1,5 +1,11 @@
+import decimal
+
 from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db import models
+from django.utils.functional import cached_property
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
 from shop.models import Book, UserBookRelation
 
@@ -17,3 +23,117 @@ class UserBookRelationSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserBookRelation
         fields = ('book', 'like', 'in_bookmarks', 'rate')
+        # The book comes from the URL.
+        read_only_fields = ('book',)
+
+
+INTEGER_FIELDS = ('AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField', 'BigIntegerField',
+                  'SmallIntegerField', 'PositiveIntegerField', 'PositiveBigIntegerField',
+                  'PositiveSmallIntegerField')
+
+
+def compile_decimal(field, model_field):
+    """
+    Equivalent of ``DecimalField.to_representation`` with the quantize
+    context built once instead of on every call.
+    """
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if field.decimal_places is None or not coerce_to_string or field.localize:
+        return field.to_representation
+
+    if (isinstance(model_field, models.DecimalField) and
+            model_field.decimal_places == field.decimal_places and
+            (field.max_digits is None or model_field.max_digits <= field.max_digits)):
+        # The database already returns these with exactly decimal_places digits.
+        return str
+
+    quantum = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    if field.rounding is not None:
+        context.rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(quantum, context=context))
+
+    return convert
+
+
+class CompiledSerializer:
+    """
+    Read-only fast path producing the same output as a ``ModelSerializer``.
+
+    Rows are fetched with ``values_list()`` on the serializer's field sources
+    and turned into dicts by per-field converters chosen once, up front:
+    values the database already returns in their final form are passed
+    through, model-backed decimals are formatted with ``str()``, and anything
+    else goes through the field's own ``to_representation()``. Only plain
+    attribute fields are supported.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def compiled(self):
+        model = self.serializer_class.Meta.model
+        fields = [field for field in self.serializer_class().fields.values() if not field.write_only]
+        for field in fields:
+            if isinstance(field, (serializers.RelatedField, serializers.ManyRelatedField,
+                                  serializers.BaseSerializer)) or '.' in field.source or field.source == '*':
+                raise ImproperlyConfigured(
+                    f'{self.serializer_class.__name__}.{field.field_name} cannot be compiled.'
+                )
+        names = tuple(field.field_name for field in fields)
+        sources = tuple(field.source for field in fields)
+        converters = tuple(self.compile_field(model, field) for field in fields)
+        return names, sources, converters
+
+    @staticmethod
+    def compile_field(model, field):
+        """
+        Return a function converting a raw database value into the field's
+        representation, or ``None`` when the value can be used as is.
+        """
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            model_field = None
+        internal_type = model_field.get_internal_type() if model_field is not None else None
+
+        if isinstance(field, serializers.IntegerField) and internal_type in INTEGER_FIELDS:
+            return None
+        if isinstance(field, serializers.CharField) and internal_type in ('CharField', 'TextField'):
+            return None
+        if isinstance(field, serializers.DecimalField):
+            return compile_decimal(field, model_field)
+        return field.to_representation
+
+    def values(self, queryset):
+        """
+        Restrict ``queryset`` to the rows needed by ``to_representation()``.
+        Rows are named tuples that also carry the ordering columns, so the
+        paginator can read cursor positions from them.
+        """
+        _, sources, _ = self.compiled
+        ordering = [field.lstrip('-') for field in queryset.query.order_by if isinstance(field, str)]
+        extra = [name for name in dict.fromkeys(ordering) if name not in sources]
+        return queryset.values_list(*sources, *extra, named=True)
+
+    def to_representation(self, rows):
+        """
+        Lazily convert rows from ``values()`` into dicts.
+        """
+        names, _, converters = self.compiled
+        fields = tuple(zip(names, converters))
+        for row in rows:
+            yield {
+                name: value if convert is None or value is None else convert(value)
+                for (name, convert), value in zip(fields, row)
+            }
+
+    def serialize(self, queryset):
+        return list(self.to_representation(self.values(queryset)))
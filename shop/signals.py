@@ -0,0 +1,66 @@
+"""
+``books_changed`` is sent with the ids of books whose API representation may
+have changed: a book was created, updated or deleted, or a relation changed
+its like or rate. Code writing books without ``Model.save()``/``delete()``
+(bulk operations, raw SQL) sends it explicitly.
+
+The receivers of ``Book`` writes also keep the facet counts of
+``shop.facets`` up to date and keep the tombstones of deleted books for
+``shop.sync``.
+"""
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from shop import facets
+
+books_changed = Signal()
+
+
+@receiver(post_save, sender='shop.Book')
+@receiver(post_delete, sender='shop.Book')
+def book_saved_or_deleted(sender, instance, **kwargs):
+    books_changed.send(sender=sender, book_ids=[instance.pk])
+
+
+@receiver(post_save, sender='shop.Book')
+def book_created(sender, instance, created, using, **kwargs):
+    if created:
+        sender.objects.using(using).books_created([instance.pk])
+
+
+@receiver(pre_save, sender='shop.Book')
+def book_saving(sender, instance, **kwargs):
+    if not instance._state.adding and not hasattr(instance, '_loaded_facets'):
+        # Loaded without its author or price.
+        instance._loaded_facets = sender.objects.using(instance._state.db).filter(
+            pk=instance.pk
+        ).values_list('author_name', 'price').first()
+
+
+@receiver(post_save, sender='shop.Book')
+def book_saved(sender, instance, created, using, update_fields, **kwargs):
+    if update_fields is not None and not {'author_name', 'price'} & set(update_fields):
+        return
+    loaded = None if created else getattr(instance, '_loaded_facets', None)
+    instance._loaded_facets = instance.facet_values()
+    sender.objects.using(using).adjust_facets(removed=[loaded] if loaded else [], added=[instance.facet_values()])
+
+
+@receiver(post_delete, sender='shop.Book')
+def book_deleted(sender, instance, using, **kwargs):
+    loaded = getattr(instance, '_loaded_facets', None) or instance.facet_values()
+    if not facets.defer_deleted(instance.pk, loaded):
+        sender.objects.using(using).books_deleted([(instance.pk, loaded)])
+
+
+@receiver(post_save, sender='shop.UserBookRelation')
+def relation_saved(sender, instance, **kwargs):
+    book_ids = instance.changed_book_ids()
+    if book_ids:
+        books_changed.send(sender=sender, book_ids=list(book_ids))
+
+
+@receiver(post_delete, sender='shop.UserBookRelation')
+def relation_deleted(sender, instance, **kwargs):
+    if instance.like or instance.rate is not None:
+        books_changed.send(sender=sender, book_ids=[instance.book_id])
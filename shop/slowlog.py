@@ -0,0 +1,214 @@
+"""
+Slow query log.
+
+With ``settings.SLOW_QUERY_LOG`` set to a file path, every query slower than
+``SLOW_QUERY_THRESHOLD_MS`` is written to that file as one JSON line with its
+normalized SQL and fingerprint, parameters, duration, the endpoint of the
+request that ran it and the last few frames of the project's code on the
+stack. The file is rotated at ``SLOW_QUERY_LOG_MAX_BYTES`` keeping
+``SLOW_QUERY_LOG_BACKUPS`` old files.
+
+``SLOW_QUERY_EXPLAIN_RATE`` of the slow ``SELECT`` queries are explained
+again right away, with ``EXPLAIN (ANALYZE, BUFFERS)`` on PostgreSQL and
+``EXPLAIN QUERY PLAN`` on SQLite, and the plan is logged along. ``ANALYZE``
+runs the query a second time, keep the rate low. ``manage.py slow_queries``
+groups the log by fingerprint.
+
+Several processes appending to the same file is fine, but only one of them
+should rotate it: give each its own file, or set
+``SLOW_QUERY_LOG_MAX_BYTES`` to 0 and rotate with an external tool.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from shop.metrics import current_request, endpoint_name
+
+logger = logging.getLogger(__name__)
+
+STACK_FRAMES = 5
+MAX_PARAMS_LENGTH = 500
+
+_explaining = contextvars.ContextVar('explaining_slow_query', default=False)
+_handler = None
+_handler_lock = threading.Lock()
+
+_string_re = re.compile(r"'(?:[^']|'')*'")
+_number_re = re.compile(r'\b\d+(?:\.\d+)?\b')
+_in_list_re = re.compile(r'\bIN \((?:\s*\?\s*,)*\s*\?\s*\)', re.IGNORECASE)
+_values_re = re.compile(r'VALUES \([^()]*\)(?:\s*,\s*\([^()]*\))+', re.IGNORECASE)
+# SQLite bulk inserts: INSERT ... SELECT ?, ? UNION ALL SELECT ?, ? ...
+_union_re = re.compile(r'(?:\s+UNION ALL SELECT \?(?:\s*,\s*\?)*)+', re.IGNORECASE)
+# CASE expressions with one branch per value, like the search rank.
+_when_re = re.compile(r'(?:\s+WHEN \S+ = \? THEN \?)+', re.IGNORECASE)
+_space_re = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """
+    ``sql`` with literals, ``IN`` lists and multi-row ``VALUES`` collapsed,
+    so queries differing only in their values normalize the same.
+    """
+    sql = _string_re.sub('?', sql)
+    sql = _number_re.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _in_list_re.sub('IN (...)', sql)
+    sql = _values_re.sub('VALUES (...), ...', sql)
+    sql = _union_re.sub(' UNION ALL ...', sql)
+    sql = _when_re.sub(' WHEN ...', sql)
+    return _space_re.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def stack_summary():
+    """
+    The innermost project frames on the stack, outermost first.
+    """
+    root = str(settings.BASE_DIR)
+    wrappers = (os.path.join('shop', 'slowlog.py'), os.path.join('shop', 'metrics.py'))
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(root) and 'site-packages' not in frame.filename
+        and not frame.filename.endswith(wrappers)
+    ]
+    return [f'{os.path.relpath(frame.filename, root)}:{frame.lineno} in {frame.name}'
+            for frame in frames[-STACK_FRAMES:]]
+
+
+def explain(connection, sql, params):
+    """
+    The plan of ``sql`` as a list of lines, ``None`` if it cannot be
+    explained. Runs in a savepoint so a failure leaves the transaction
+    of the caller untouched.
+    """
+    if connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) '
+    elif connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        return None
+    token = _explaining.set(True)
+    try:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+    except DatabaseError:
+        logger.exception('Could not explain a slow query.')
+        return None
+    finally:
+        _explaining.reset(token)
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+
+def get_handler():
+    global _handler
+    if _handler is None:
+        with _handler_lock:
+            if _handler is None:
+                _handler = RotatingFileHandler(
+                    settings.SLOW_QUERY_LOG,
+                    maxBytes=getattr(settings, 'SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024),
+                    backupCount=getattr(settings, 'SLOW_QUERY_LOG_BACKUPS', 5),
+                    encoding='utf-8',
+                )
+    return _handler
+
+
+def write(entry):
+    handler = get_handler()
+    handler.handle(logging.makeLogRecord({'msg': json.dumps(entry, default=str), 'levelno': logging.INFO}))
+
+
+def capture_slow_query(execute, sql, params, many, context):
+    path = getattr(settings, 'SLOW_QUERY_LOG', None)
+    if not path or _explaining.get():
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = (time.perf_counter() - started) * 1000
+        if duration >= getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100):
+            log_slow_query(context['connection'], sql, params, many, duration)
+
+
+def log_slow_query(connection, sql, params, many, duration):
+    request = current_request.get()
+    normalized = normalize(sql)
+    entry = {
+        'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+        'fingerprint': fingerprint(normalized),
+        'duration_ms': round(duration, 3),
+        'database': connection.alias,
+        'sql': normalized,
+        'params': repr(params)[:MAX_PARAMS_LENGTH],
+        'endpoint': endpoint_name(request) if request is not None else None,
+        'path': request.get_full_path() if request is not None else None,
+        'stack': stack_summary(),
+        'plan': None,
+    }
+    rate = getattr(settings, 'SLOW_QUERY_EXPLAIN_RATE', 0)
+    if not many and sql.lstrip()[:6].upper() == 'SELECT' and random.random() < rate:
+        entry['plan'] = explain(connection, sql, params)
+    write(entry)
+
+
+@receiver(connection_created)
+def install_slow_query_capture(sender, connection, **kwargs):
+    if capture_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(capture_slow_query)
+
+
+@receiver(setting_changed)
+def reset_handler(setting, **kwargs):
+    global _handler
+    if setting.startswith('SLOW_QUERY_LOG') and _handler is not None:
+        _handler.close()
+        _handler = None
+
+
+def log_files(path):
+    """
+    The slow query log at ``path`` and its rotated backups, oldest first.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    backups = sorted(
+        (int(suffix), os.path.join(directory, other)) for other in os.listdir(directory)
+        for prefix, _, suffix in [other.rpartition('.')] if prefix == name and suffix.isdigit()
+    )
+    files = [backup for _, backup in reversed(backups)]
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_entries(path):
+    for file_path in log_files(path):
+        with open(file_path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash or a rotation.
+                    continue
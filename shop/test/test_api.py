@@ -1,7 +1,7 @@
 import json
 
 from django.contrib.auth.models import User
-from django.db.models import Count, Case, When, Avg
+from django.db import IntegrityError, transaction
 from django.urls import reverse
 from rest_framework.exceptions import ErrorDetail
 from rest_framework.test import APITestCase
@@ -22,20 +22,14 @@ class BooksApiTestCase(APITestCase):
         self.url = reverse('book-list')
 
     def test_get(self):
-        books = Book.objects.all().annotate(
-            likes_count=Count(Case(When(userbookrelation__like=True, then=1))),
-            average_rating=Avg('userbookrelation__rate')
-        ).order_by('id')
+        books = Book.objects.all().with_rating().order_by('id')
         response = self.client.get(self.url)
         serializer_data = BookSerializer(books, many=True).data
-        self.assertEqual(serializer_data, response.data)
+        self.assertEqual(serializer_data, response.data['results'])
         self.assertEqual(response.status_code, 200)
 
     def test_get_search(self):
-        books = Book.objects.filter(id__in=[self.book_2.id, self.book_3.id]).annotate(
-            likes_count=Count(Case(When(userbookrelation__like=True, then=1))),
-            average_rating=Avg('userbookrelation__rate')
-        )
+        books = Book.objects.filter(id__in=[self.book_2.id, self.book_3.id]).with_rating()
         serializer_data = BookSerializer(books, many=True).data
         response = self.client.get(
             self.url,
@@ -44,13 +38,10 @@ class BooksApiTestCase(APITestCase):
             }
         )
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data, serializer_data)
+        self.assertEqual(response.data['results'], serializer_data)
 
     def test_get_filter(self):
-        books = Book.objects.filter(id__in=[self.book_1.id, self.book_2.id]).annotate(
-            likes_count=Count(Case(When(userbookrelation__like=True, then=1))),
-            average_rating=Avg('userbookrelation__rate')
-        )
+        books = Book.objects.filter(id__in=[self.book_1.id, self.book_2.id]).with_rating()
         serializer_data = BookSerializer(books, many=True).data
         response = self.client.get(
             self.url,
@@ -59,13 +50,10 @@ class BooksApiTestCase(APITestCase):
             }
         )
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data, serializer_data)
+        self.assertEqual(response.data['results'], serializer_data)
 
     def test_get_order_by_price(self):
-        books = Book.objects.all().annotate(
-            likes_count=Count(Case(When(userbookrelation__like=True, then=1))),
-            average_rating=Avg('userbookrelation__rate')
-        )
+        books = Book.objects.all().with_rating().order_by('-price', '-id')
         serializer_data = BookSerializer(books, many=True).data
         response = self.client.get(
             self.url,
@@ -74,13 +62,10 @@ class BooksApiTestCase(APITestCase):
             }
         )
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data, serializer_data)
+        self.assertEqual(response.data['results'], serializer_data)
 
     def test_order_by_author_name(self):
-        books = Book.objects.all().annotate(
-            likes_count=Count(Case(When(userbookrelation__like=True, then=1))),
-            average_rating=Avg('userbookrelation__rate')
-        ).order_by('-author_name')
+        books = Book.objects.all().with_rating().order_by('-author_name')
         serializer_data = BookSerializer(books, many=True).data
         response = self.client.get(
             self.url,
@@ -89,7 +74,7 @@ class BooksApiTestCase(APITestCase):
             }
         )
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data, serializer_data)
+        self.assertEqual(response.data['results'], serializer_data)
 
     def test_create(self):
         self.assertEqual(Book.objects.count(), 3)
@@ -211,6 +196,7 @@ class BooksRelationTestCase(APITestCase):
                                                 book=self.book_1)
         self.book_1.refresh_from_db()
         self.assertTrue(relation.like)
+        self.assertEqual(1, self.book_1.likes_count)
 
     def test_rate(self):
         url = reverse('userbookrelation-detail', args=(self.book_1.id,))
@@ -227,6 +213,8 @@ class BooksRelationTestCase(APITestCase):
                                                 book=self.book_1)
         self.book_1.refresh_from_db()
         self.assertEqual(3, relation.rate)
+        self.assertEqual(3, self.book_1.rating_sum)
+        self.assertEqual(1, self.book_1.rating_count)
 
     def test_rate_wrong(self):
         url = reverse('userbookrelation-detail', args=(self.book_1.id,))
@@ -239,3 +227,31 @@ class BooksRelationTestCase(APITestCase):
         response = self.client.patch(url, json_data,
                                      content_type='application/json')
         self.assertEqual(response.status_code, 400)
+
+    def test_upsert_keeps_other_fields(self):
+        url = reverse('userbookrelation-detail', args=(self.book_1.id,))
+        self.client.force_login(self.user2)
+        self.client.patch(url, json.dumps({'like': True}), content_type='application/json')
+        response = self.client.patch(url, json.dumps({'rate': 4, 'book': self.book_2.id}),
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({'book': self.book_1.id, 'like': True, 'in_bookmarks': False, 'rate': 4},
+                         response.data)
+        self.assertEqual(1, UserBookRelation.objects.filter(user=self.user2).count())
+
+        self.client.patch(url, json.dumps({'like': False, 'rate': 2}), content_type='application/json')
+        self.book_1.refresh_from_db()
+        self.assertEqual((0, 2, 1), (self.book_1.likes_count, self.book_1.rating_sum,
+                                     self.book_1.rating_count))
+
+    def test_missing_book(self):
+        url = reverse('userbookrelation-detail', args=(self.book_2.id + 100,))
+        self.client.force_login(self.user2)
+        response = self.client.patch(url, json.dumps({'like': True}), content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(UserBookRelation.objects.exists())
+
+    def test_unique(self):
+        UserBookRelation.objects.create(user=self.user2, book=self.book_1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            UserBookRelation.objects.create(user=self.user2, book=self.book_1)
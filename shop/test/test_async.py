@@ -0,0 +1,66 @@
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from shop.models import Book, UserBookRelation
+
+
+class AsyncViewsTestCase(TransactionTestCase):
+    # The async views query from their own threads, which only see
+    # committed data.
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create(username='test_username')
+        self.book_1 = Book.objects.create(name='Book1', author_name='Author1', price='100.00', owner=self.user)
+        self.book_2 = Book.objects.create(name='Book2', author_name='Author2', price='200.00', owner=self.user)
+        UserBookRelation.objects.create(user=self.user, book=self.book_1, like=True, in_bookmarks=True)
+
+    # Query strings go in the URL, AsyncClient.get() drops ``data`` on
+    # this Django version.
+
+    async def test_book_list(self):
+        sync_response = await sync_to_async(self.client.get)(reverse('book-list'), data={'ordering': '-price'})
+        with mock.patch('shop.async_views.run_in_db_thread') as run_in_db_thread:
+            # Cached by the sync request, served on the event loop.
+            response = await self.async_client.get(reverse('async-book-list') + '?ordering=-price')
+        run_in_db_thread.assert_not_called()
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(sync_response.content, response.content)
+        self.assertEqual(sync_response['ETag'], response['ETag'])
+
+        await sync_to_async(cache.clear)()
+        response = await self.async_client.get(reverse('async-book-list') + '?ordering=-price')
+        self.assertEqual(sync_response.content, response.content)
+        response = await self.async_client.get(reverse('async-book-list') + '?stream=1')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, len(response.json()))
+
+    async def test_book_detail(self):
+        url = reverse('async-book-detail', args=(self.book_1.id,))
+        response = await self.async_client.get(url)
+        self.assertEqual('Book1', response.json()['name'])
+        cached = await self.async_client.get(url, headers=[
+            (b'host', b'testserver'), (b'if-none-match', response['ETag'].encode()),
+        ])
+        self.assertEqual(304, cached.status_code)
+        response = await self.async_client.get(reverse('async-book-detail', args=(self.book_2.id + 10,)))
+        self.assertEqual(404, response.status_code)
+
+    async def test_relation_list(self):
+        url = reverse('async-userbookrelation-list')
+        response = await self.async_client.get(url + '?bookmarks=1')
+        self.assertEqual(403, response.status_code)
+
+        await sync_to_async(self.client.force_login)(self.user)
+        self.async_client.cookies = self.client.cookies
+        response = await self.async_client.get(url + '?bookmarks=1')
+        self.assertEqual([self.book_1.id], [relation['book'] for relation in response.json()])
+
+    async def test_read_only(self):
+        response = await self.async_client.post(reverse('async-book-list'))
+        self.assertEqual(405, response.status_code)
@@ -0,0 +1,139 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from shop.bulk import BulkMixin
+from shop.models import Book
+
+
+class BooksBulkTestCase(APITestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create(username='test_username')
+        self.user2 = User.objects.create(username='test_username2')
+        self.book_1 = Book.objects.create(name='Book1', author_name='Author1',
+                                          price='100.00', owner=self.user)
+        self.book_2 = Book.objects.create(name='Book2', author_name='Author2',
+                                          price='200.00', owner=self.user2)
+        self.url = reverse('book-bulk')
+        self.client.force_login(self.user)
+
+    def request(self, method, data, **params):
+        url = self.url
+        if params:
+            url += '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+        return getattr(self.client, method)(url, json.dumps(data), content_type='application/json')
+
+    def test_create(self):
+        data = [
+            {'name': 'Book3', 'author_name': 'Author3', 'price': '300.00'},
+            {'name': 'Book4', 'author_name': 'Author4', 'price': '400.00'},
+        ]
+        response = self.request('post', data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(4, Book.objects.count())
+        self.assertEqual(2, Book.objects.filter(owner=self.user, name__in=['Book3', 'Book4']).count())
+        self.assertEqual([201, 201], [result['status'] for result in response.data])
+        self.assertEqual('Book3', response.data[0]['data']['name'])
+        self.assertIsNotNone(response.data[0]['data']['id'])
+
+    def test_create_partial_failure(self):
+        data = [
+            {'name': 'Book3', 'author_name': 'Author3', 'price': '300.00'},
+            {'name': 'Book4', 'author_name': 'Author4', 'price': 'abc'},
+        ]
+        response = self.request('post', data)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([201, 400], [result['status'] for result in response.data])
+        self.assertIn('price', response.data[1]['errors'])
+        self.assertTrue(Book.objects.filter(name='Book3').exists())
+
+    def test_create_atomic(self):
+        data = [
+            {'name': 'Book3', 'author_name': 'Author3', 'price': '300.00'},
+            {'name': 'Book4', 'author_name': 'Author4', 'price': 'abc'},
+        ]
+        response = self.request('post', data, atomic=1)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([424, 400], [result['status'] for result in response.data])
+        self.assertEqual(2, Book.objects.count())
+
+    def test_update(self):
+        data = [
+            {'id': self.book_1.id, 'price': '150.00'},
+            {'id': self.book_2.id, 'price': '250.00'},
+            {'id': 999999, 'price': '1.00'},
+            {'price': '1.00'},
+        ]
+        with self.assertNumQueries(7):
+            # session, user, books with owners, savepoint, locked rows, update, release
+            response = self.request('patch', data)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([200, 403, 404, 400], [result['status'] for result in response.data])
+        self.assertEqual('150.00', response.data[0]['data']['price'])
+        self.book_1.refresh_from_db()
+        self.book_2.refresh_from_db()
+        self.assertEqual(150, self.book_1.price)
+        self.assertEqual(200, self.book_2.price)
+
+    def test_update_own_fields(self):
+        book_3 = Book.objects.create(name='Book3', author_name='Author3', price='300.00', owner=self.user)
+        bulk_response = BulkMixin.bulk_response
+
+        def concurrent(view, *args):
+            # Another request changes the columns these items did not send.
+            Book.objects.filter(pk=self.book_1.pk).update(name='Concurrent')
+            Book.objects.filter(pk=book_3.pk).update(price='1.00')
+            return bulk_response(view, *args)
+
+        data = [{'id': self.book_1.id, 'price': '150.00'}, {'id': book_3.id, 'name': 'Renamed'}]
+        with mock.patch.object(BulkMixin, 'bulk_response', concurrent):
+            response = self.request('patch', data)
+        self.assertEqual(response.status_code, 200)
+        self.book_1.refresh_from_db()
+        book_3.refresh_from_db()
+        self.assertEqual(('Concurrent', 150), (self.book_1.name, self.book_1.price))
+        self.assertEqual(('Renamed', 1), (book_3.name, book_3.price))
+
+    def test_update_staff(self):
+        self.user.is_staff = True
+        self.user.save()
+        response = self.request('patch', [{'id': self.book_2.id, 'name': 'Renamed'}])
+        self.assertEqual(response.status_code, 200)
+        self.book_2.refresh_from_db()
+        self.assertEqual('Renamed', self.book_2.name)
+
+    def test_delete(self):
+        book_3 = Book.objects.create(name='Book3', author_name='Author3', price='300.00', owner=self.user)
+        response = self.request('delete', [self.book_1.id, {'id': book_3.id}, self.book_2.id])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([204, 204, 403], [result['status'] for result in response.data])
+        self.assertEqual([self.book_2.id], list(Book.objects.values_list('id', flat=True)))
+
+    def test_invalid_ids(self):
+        response = self.request('delete', [True, [self.book_1.id], {'id': {}}, str(self.book_1.id), self.book_1.id])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([400, 400, 400, 400, 204], [result['status'] for result in response.data])
+
+    def test_delete_atomic(self):
+        response = self.request('delete', [self.book_1.id, self.book_2.id], atomic='true')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(2, Book.objects.count())
+
+    def test_not_a_list(self):
+        response = self.request('post', {'name': 'Book3'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_anonymous(self):
+        self.client.logout()
+        response = self.request('delete', [self.book_1.id])
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(2, Book.objects.count())
+
+    def test_invalidates_cache(self):
+        detail_url = reverse('book-detail', args=(self.book_1.id,))
+        self.client.get(detail_url)
+        self.request('patch', [{'id': self.book_1.id, 'price': '150.00'}])
+        self.assertEqual('150.00', self.client.get(detail_url).data['price'])
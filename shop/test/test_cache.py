@@ -0,0 +1,79 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from shop.models import Book, UserBookRelation
+
+
+class BooksCacheTestCase(APITestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create(username='test_username')
+        self.book_1 = Book.objects.create(name='Book1', author_name='Author1',
+                                          price='100.00', owner=self.user)
+        self.book_2 = Book.objects.create(name='Book2', author_name='Author2',
+                                          price='200.00', owner=self.user)
+        self.list_url = reverse('book-list')
+        self.detail_url = reverse('book-detail', args=(self.book_1.id,))
+
+    def test_list_cached(self):
+        response = self.client.get(self.list_url, data={'ordering': '-price'})
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.list_url, data={'ordering': '-price'})
+        self.assertEqual(response.content, cached.content)
+        self.assertEqual(response['ETag'], cached['ETag'])
+
+        response = self.client.get(self.list_url, data={'ordering': 'price'})
+        self.assertNotEqual(cached.content, response.content)
+
+    def test_not_modified(self):
+        response = self.client.get(self.detail_url)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(b'', response.content)
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_update_invalidates(self):
+        detail_2_url = reverse('book-detail', args=(self.book_2.id,))
+        self.client.get(self.list_url)
+        self.client.get(self.detail_url)
+        self.client.get(detail_2_url)
+
+        self.client.force_login(self.user)
+        data = {'name': 'Book1', 'author_name': 'Author1', 'price': '150.00'}
+        self.client.put(self.detail_url, json.dumps(data), content_type='application/json')
+        self.client.logout()
+
+        self.assertEqual('150.00', self.client.get(self.detail_url).data['price'])
+        self.assertEqual('150.00', self.client.get(self.list_url).data['results'][0]['price'])
+        with self.assertNumQueries(0):
+            self.client.get(detail_2_url)
+
+    def test_delete_invalidates(self):
+        self.client.get(self.detail_url)
+        self.book_1.delete()
+        self.assertEqual(404, self.client.get(self.detail_url).status_code)
+
+    def test_relation_invalidates(self):
+        self.client.get(self.detail_url)
+        user2 = User.objects.create(username='test_username2')
+        relation = UserBookRelation.objects.create(user=user2, book=self.book_1, in_bookmarks=True)
+        with self.assertNumQueries(0):
+            self.client.get(self.detail_url)
+
+        self.client.force_login(user2)
+        url = reverse('userbookrelation-detail', args=(self.book_1.id,))
+        self.client.patch(url, json.dumps({'like': True}), content_type='application/json')
+        self.assertEqual(1, self.client.get(self.detail_url).data['likes_count'])
+
+        relation.refresh_from_db()
+        relation.delete()
+        self.assertEqual(0, self.client.get(self.detail_url).data['likes_count'])
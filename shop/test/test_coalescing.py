@@ -0,0 +1,91 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient, APITransactionTestCase
+
+from shop import coalescing
+from shop.models import Book
+
+
+class FlightGroupTestCase(SimpleTestCase):
+    def test_followers_share_result(self):
+        group = coalescing.FlightGroup()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return len(calls)
+
+        with ThreadPoolExecutor(4) as executor:
+            leader = executor.submit(group.run, 'key', work)
+            started.wait(5)
+            followers = [executor.submit(group.run, 'key', work) for _ in range(3)]
+            while not all(f.running() for f in followers):
+                time.sleep(0.001)
+            time.sleep(0.05)
+            release.set()
+            self.assertEqual((1, False), leader.result())
+            self.assertEqual([(1, True)] * 3, [f.result() for f in followers])
+        self.assertEqual(0, len(group))
+
+    def test_leader_failure(self):
+        group = coalescing.FlightGroup()
+        with self.assertRaises(ZeroDivisionError):
+            group.run('key', lambda: 1 / 0)
+        self.assertEqual((2, False), group.run('key', lambda: 2))
+
+
+class CoalescedRetrieveTestCase(APITransactionTestCase):
+    THREADS = 8
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.book = Book.objects.create(name='Book1', author_name='Author1', price='10.00')
+        self.url = reverse('book-detail', args=(self.book.id,))
+
+    def get_concurrently(self):
+        """
+        Send ``THREADS`` identical detail requests at once, the book query
+        held up long enough for all of them to miss the cache. Returns the
+        responses and the number of book queries run.
+        """
+        barrier = threading.Barrier(self.THREADS)
+        queries = []
+
+        def slow_book_query(execute, sql, params, many, context):
+            if 'FROM "shop_book"' in sql:
+                queries.append(sql)
+                time.sleep(0.3)
+            return execute(sql, params, many, context)
+
+        def get():
+            try:
+                with connection.execute_wrapper(slow_book_query):
+                    barrier.wait(5)
+                    return APIClient().get(self.url)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.THREADS) as executor:
+            responses = list(executor.map(lambda _: get(), range(self.THREADS)))
+        return responses, len(queries)
+
+    def test_one_query(self):
+        responses, queries = self.get_concurrently()
+        self.assertEqual(1, queries)
+        self.assertEqual([200] * self.THREADS, [response.status_code for response in responses])
+        self.assertEqual(1, len({(response.content, response['ETag']) for response in responses}))
+        self.assertEqual(0, len(coalescing.responses))
+
+    @override_settings(BOOK_COALESCE_READS=False)
+    def test_disabled(self):
+        _, queries = self.get_concurrently()
+        self.assertEqual(self.THREADS, queries)
@@ -0,0 +1,89 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from shop.counters import check_counters
+from shop.models import Book, UserBookRelation
+
+
+class BookCountersTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user1 = User.objects.create(username='user1')
+        self.user2 = User.objects.create(username='user2')
+        self.book_1 = Book.objects.create(name='Book1', author_name='Author1', price='100.00')
+        self.book_2 = Book.objects.create(name='Book2', author_name='Author2', price='200.00')
+
+    def assertCounters(self, book, likes_count, rating_sum, rating_count):
+        book.refresh_from_db()
+        self.assertEqual((likes_count, rating_sum, rating_count),
+                         (book.likes_count, book.rating_sum, book.rating_count))
+
+    def test_create_update_delete(self):
+        relation = UserBookRelation.objects.create(user=self.user1, book=self.book_1, like=True, rate=4)
+        UserBookRelation.objects.create(user=self.user2, book=self.book_1, like=True, rate=5)
+        self.assertCounters(self.book_1, 2, 9, 2)
+
+        relation.like = False
+        relation.rate = None
+        relation.save()
+        self.assertCounters(self.book_1, 1, 5, 1)
+
+        relation.book = self.book_2
+        relation.rate = 2
+        relation.save()
+        self.assertCounters(self.book_1, 1, 5, 1)
+        self.assertCounters(self.book_2, 0, 2, 1)
+
+        relation.delete()
+        self.assertCounters(self.book_2, 0, 0, 0)
+        self.assertEqual([], check_counters(Book.objects.all(), UserBookRelation.objects.all()))
+
+    def test_book_save_keeps_counters(self):
+        book = Book.objects.get(id=self.book_1.id)
+        UserBookRelation.objects.create(user=self.user1, book=self.book_1, like=True, rate=4)
+        book.price = '150.00'
+        book.save()
+        self.assertCounters(self.book_1, 1, 4, 1)
+
+    def test_average_rating(self):
+        UserBookRelation.objects.create(user=self.user1, book=self.book_1, rate=4)
+        UserBookRelation.objects.create(user=self.user2, book=self.book_1, rate=5)
+        books = Book.objects.with_rating().order_by('id')
+        self.assertEqual([4.5, None], [book.average_rating for book in books])
+
+    def test_rating_average(self):
+        relation = UserBookRelation.objects.create(user=self.user1, book=self.book_1, rate=4)
+        UserBookRelation.objects.create(user=self.user2, book=self.book_1, rate=5)
+        self.book_1.refresh_from_db()
+        self.assertEqual(4.5, self.book_1.rating_average)
+
+        relation.delete()
+        UserBookRelation.objects.filter(book=self.book_1).update(rate=None)
+        self.book_1.refresh_from_db()
+        self.assertEqual(0, self.book_1.rating_average)
+
+        Book.objects.update(rating_average=3)
+        call_command('rebuild_book_counters', stdout=StringIO())
+        self.assertEqual([0, 0], list(Book.objects.values_list('rating_average', flat=True)))
+
+    def test_command(self):
+        UserBookRelation.objects.create(user=self.user1, book=self.book_1, like=True, rate=4)
+        past = timezone.now() - timedelta(minutes=5)
+        Book.objects.update(updated_at=past)
+        Book.objects.filter(id=self.book_1.id).update(likes_count=7)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_book_counters', '--check', stdout=StringIO(), stderr=StringIO())
+
+        out = StringIO()
+        call_command('rebuild_book_counters', stdout=out)
+        self.assertIn('Rebuilt counters of 2 books.', out.getvalue())
+        self.assertCounters(self.book_1, 1, 4, 1)
+        self.assertCounters(self.book_2, 0, 0, 0)
+        # Only the book whose counters were off shows up in delta sync.
+        self.assertGreater(self.book_1.updated_at, past)
+        self.assertEqual(past, self.book_2.updated_at)
@@ -0,0 +1,131 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import override_settings, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from shop import facets
+from shop.models import Book, BookFacet, supports_upsert
+
+
+class FacetsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.book = Book.objects.create(name='Book1', author_name='Author1', price='9.99')
+        Book.objects.create(name='Book2', author_name='Author1', price='10.00')
+        Book.objects.create(name='Book3', author_name='Author2', price='600.00')
+
+    def stored(self):
+        return dict(facets.stored_counts(BookFacet.objects.all()))
+
+    def assertCountsLive(self):
+        self.assertEqual([], facets.check(Book.objects.all(), BookFacet.objects.all()))
+
+    def test_price_bucket(self):
+        self.assertEqual('0-10', facets.price_bucket('9.99'))
+        self.assertEqual('10-25', facets.price_bucket('10.00'))
+        self.assertEqual('500+', facets.price_bucket(500))
+        with override_settings(BOOK_PRICE_BUCKETS=[12.5]):
+            self.assertEqual(['0-12.5', '12.5+'], facets.price_labels(facets.price_bounds()))
+
+    def test_save_and_delete(self):
+        self.assertEqual({('author_name', 'Author1'): 2, ('author_name', 'Author2'): 1,
+                          ('price', '0-10'): 1, ('price', '10-25'): 1, ('price', '500+'): 1}, self.stored())
+
+        self.book.author_name = 'Author3'
+        self.book.price = '700.00'
+        self.book.save()
+        book = Book.objects.only('name').get(author_name='Author2')
+        book.price = '20.00'
+        book.save()
+        self.assertEqual({('author_name', 'Author1'): 1, ('author_name', 'Author2'): 1,
+                          ('author_name', 'Author3'): 1, ('price', '10-25'): 2, ('price', '500+'): 1},
+                         self.stored())
+
+        self.book.delete()
+        Book.objects.filter(author_name='Author1').delete()
+        self.assertEqual({('author_name', 'Author2'): 1, ('price', '10-25'): 1}, self.stored())
+        self.assertCountsLive()
+
+    def test_overlapping_saves(self):
+        # Two requests loaded the book before either saved it.
+        first, second = Book.objects.get(pk=self.book.pk), Book.objects.get(pk=self.book.pk)
+        first.author_name, first.price = 'Author3', '700.00'
+        first.save()
+        second.price = '20.00'
+        second.save()
+        stale = Book.objects.get(pk=self.book.pk)
+        Book.objects.filter(pk=self.book.pk).update(author_name='Author1')
+        stale.price = '5.00'
+        Book.objects.bulk_update([stale], ['price'])
+        self.assertCountsLive()
+
+    def test_many_deltas(self):
+        # 701 deltas, 700 authors and a price bucket: three batches.
+        Book.objects.bulk_create([Book(name=f'Bulk{i}', author_name=f'Bulk{i}', price='30.00') for i in range(700)])
+        table = connection.ops.quote_name(BookFacet._meta.db_table)
+        with CaptureQueriesContext(connection) as queries:
+            Book.objects.filter(name__startswith='Bulk').delete()
+        if supports_upsert(connection):
+            self.assertEqual(3, sum(query['sql'].startswith(f'INSERT INTO {table}') for query in queries))
+        self.assertCountsLive()
+
+    def test_bulk(self):
+        Book.objects.bulk_create([Book(name=f'Bulk{i}', author_name='Bulk', price='30.00') for i in range(3)])
+        books = list(Book.objects.filter(author_name='Bulk'))
+        for book in books:
+            book.price = '5.00'
+        Book.objects.bulk_update(books, ['price'])
+        Book.objects.bulk_update([Book(id=self.book.id, name='Book1', author_name='Bulk', price='5.00')],
+                                 ['author_name', 'price'])
+        self.assertEqual(4, self.stored()['author_name', 'Bulk'])
+        self.assertEqual(4, self.stored()['price', '0-10'])
+        self.assertCountsLive()
+
+    def test_rebuild_command(self):
+        Book.objects.filter(pk=self.book.pk).update(price='100.00')
+        with self.assertRaises(CommandError):
+            call_command('rebuild_book_facets', check=True, stdout=StringIO(), stderr=StringIO())
+        call_command('rebuild_book_facets', stdout=StringIO())
+        self.assertCountsLive()
+
+
+class FacetsApiTestCase(APITestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create(username='test_username')
+        for i, (author_name, price) in enumerate([('Author1', '5.00'), ('Author1', '30.00'),
+                                                   ('Author2', '30.00'), ('Author3', '300.00')]):
+            Book.objects.create(name=f'Book{i}', author_name=author_name, price=price, owner=self.user)
+        self.url = reverse('book-facets')
+
+    def test_unfiltered(self):
+        response = self.client.get(self.url, data={'limit': 2})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(4, response.data['count'])
+        self.assertEqual([{'value': 'Author1', 'count': 2}, {'value': 'Author2', 'count': 1}],
+                         response.data['author_name'])
+        self.assertEqual([1, 0, 2, 0, 0, 1, 0], [bucket['count'] for bucket in response.data['price']])
+        self.assertEqual('0-10', response.data['price'][0]['value'])
+
+    def test_filtered(self):
+        response = self.client.get(self.url, data={'price_min': '10', 'search': 'Book1 Author1'})
+        self.assertEqual(1, response.data['count'])
+        self.assertEqual([{'value': 'Author1', 'count': 1}], response.data['author_name'])
+
+        response = self.client.get(self.url, data={'author_name': 'Author2,Author3'})
+        self.assertEqual(2, response.data['count'])
+        self.assertEqual(['Author2', 'Author3'], [author['value'] for author in response.data['author_name']])
+
+    def test_cache(self):
+        self.assertEqual(4, self.client.get(self.url).data['count'])
+        Book.objects.create(name='Book5', author_name='Author5', price='1.00')
+        self.assertEqual(5, self.client.get(self.url).json()['count'])
+
+    def test_invalid_limit(self):
+        self.assertEqual(400, self.client.get(self.url, data={'limit': 'all'}).status_code)
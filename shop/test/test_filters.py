@@ -0,0 +1,79 @@
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from shop.benchmarks.filters import book_query, combinations, plan_indexes
+from shop.models import Book, UserBookRelation
+from shop.seeding import seed
+from shop.slowlog import explain
+
+
+class BookFilterTestCase(APITestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create(username='test_username')
+        self.other = User.objects.create(username='other_username')
+        self.book_1 = Book.objects.create(name='Book1', author_name='Author1', price='100.00', owner=self.user)
+        self.book_2 = Book.objects.create(name='Book2', author_name='Author2', price='250.00', owner=self.other)
+        self.book_3 = Book.objects.create(name='Book3', author_name='Author3', price='300.00', owner=self.user)
+        UserBookRelation.objects.create(user=self.user, book=self.book_1, rate=5)
+        UserBookRelation.objects.create(user=self.other, book=self.book_1, rate=4)
+        UserBookRelation.objects.create(user=self.user, book=self.book_2, rate=3)
+
+    def ids(self, **params):
+        response = self.client.get(reverse('book-list'), data=params)
+        self.assertEqual(200, response.status_code, response.data)
+        return [book['id'] for book in response.data['results']]
+
+    def test_price(self):
+        self.assertEqual([self.book_2.id], self.ids(price='250.00'))
+        self.assertEqual([self.book_2.id, self.book_3.id], self.ids(price_min='250'))
+        self.assertEqual([self.book_1.id, self.book_2.id], self.ids(price_max='250'))
+        self.assertEqual([self.book_2.id], self.ids(price_min='200', price_max='299.99'))
+        self.assertEqual([], self.ids(price_min='300.01'))
+
+    def test_author_name(self):
+        self.assertEqual([self.book_1.id, self.book_3.id], self.ids(author_name='Author3,Author1,Nobody'))
+        self.assertEqual([self.book_2.id], self.ids(author_name='Author2'))
+        self.assertEqual([self.book_3.id, self.book_1.id],
+                         self.ids(author_name='Author1,Author3', ordering='-price'))
+
+    def test_owner(self):
+        self.assertEqual([self.book_1.id, self.book_3.id], self.ids(owner=self.user.id))
+        self.assertEqual([self.book_3.id], self.ids(owner=self.user.id, price_min='200'))
+
+    def test_rating_min(self):
+        self.assertEqual([self.book_1.id], self.ids(rating_min='4.5'))
+        self.assertEqual([self.book_1.id, self.book_2.id], self.ids(rating_min='3', ordering='-average_rating'))
+        # Unrated books have no rating to be at least 0.
+        self.assertEqual([self.book_1.id, self.book_2.id], self.ids(rating_min='0'))
+
+    def test_invalid(self):
+        for params in ({'price_min': 'cheap'}, {'owner': 'me'}, {'rating_min': 'high'}):
+            response = self.client.get(reverse('book-list'), data=params)
+            self.assertEqual(400, response.status_code, params)
+
+
+@skipUnless(connection.vendor in ('postgresql', 'sqlite'), 'Reads PostgreSQL or SQLite query plans.')
+class BookFilterPlanTestCase(APITestCase):
+    """
+    Every combination of ``manage.py bench filters`` is answered from an
+    index rather than a scan of the whole table.
+    """
+
+    def test_index_scans(self):
+        seed(connection, 50, 2000, 4000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        client = Client()
+        for name, params in combinations().items():
+            with self.subTest(name):
+                plan = explain(connection, book_query(client, params), None)
+                indexes, table_scan = plan_indexes(connection.vendor, plan)
+                self.assertTrue(indexes)
+                self.assertFalse(table_scan)
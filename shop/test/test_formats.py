@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+import msgpack
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from shop.models import Book, UserBookRelation
+from shop.renderers import ColumnarRenderer, MessagePackRenderer, read_columns
+
+
+class BookFormatsTestCase(APITestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        user = User.objects.create(username='test_username')
+        self.books = [
+            Book.objects.create(name=f'Book{i}', author_name=f'Author{i}', price=f'{i}99.50', owner=user)
+            for i in range(1, 4)
+        ]
+        UserBookRelation.objects.create(user=user, book=self.books[0], like=True, rate=4)
+        self.url = reverse('book-list')
+        self.expected = self.client.get(self.url).data['results']
+
+    def rows(self, columns):
+        """
+        The rows of ``read_columns()`` output, formatted as in JSON.
+        """
+        columns['price'] = [f'{price:.2f}' for price in columns['price']]
+        columns['average_rating'] = [None if rating is None else f'{rating:.2f}'
+                                     for rating in columns['average_rating']]
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    def test_msgpack(self):
+        response = self.client.get(self.url, HTTP_ACCEPT=MessagePackRenderer.media_type)
+        self.assertEqual(MessagePackRenderer.media_type, response['Content-Type'])
+        data = msgpack.unpackb(response.content)
+        self.assertEqual(json.loads(json.dumps(self.expected)), data['results'])
+        self.assertIn('next', data)
+
+        response = self.client.get(self.url, data={'format': 'msgpack', 'stream': '1'})
+        self.assertTrue(response.streaming)
+        unpacker = msgpack.Unpacker()
+        unpacker.feed(b''.join(response.streaming_content))
+        self.assertEqual(data['results'], list(unpacker))
+
+    def test_columnar(self):
+        response = self.client.get(self.url, data={'page_size': 2}, HTTP_ACCEPT=ColumnarRenderer.media_type)
+        self.assertEqual(ColumnarRenderer.media_type, response['Content-Type'])
+        data = msgpack.unpackb(response.content)
+        self.assertIsNotNone(data['next'])
+        batch = data['results']
+        self.assertEqual(2, batch['rows'])
+        self.assertEqual({'type': 'int64', 'scale': 2}, {key: batch['columns']['price'][key]
+                                                        for key in ('type', 'scale')})
+        self.assertEqual(self.expected[:2], self.rows(read_columns(batch)))
+
+        response = self.client.get(self.url, data={'format': 'columnar', 'stream': '1'})
+        unpacker = msgpack.Unpacker()
+        unpacker.feed(b''.join(response.streaming_content))
+        batch, = unpacker
+        self.assertEqual(3, batch['rows'])
+        self.assertEqual([Decimal('199.50'), Decimal('299.50'), Decimal('399.50')],
+                         read_columns(batch)['price'])
+
+    def test_columnar_empty(self):
+        content = ColumnarRenderer().render([])
+        self.assertEqual({'id': [], 'price': [], 'likes_count': [], 'average_rating': []},
+                         read_columns(msgpack.unpackb(content)))
+
+    def test_detail(self):
+        response = self.client.get(reverse('book-detail', args=(self.books[0].id,)), data={'format': 'msgpack'})
+        self.assertEqual('4.00', msgpack.unpackb(response.content)['average_rating'])
+
+    def test_export_books(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for output_format in ('json', 'ndjson', 'msgpack', 'columnar'):
+                path = os.path.join(directory, f'books.{output_format}')
+                call_command('export_books', path, chunk_size=2, stdout=StringIO())
+                with open(path, 'rb') as file:
+                    content = file.read()
+                if output_format == 'json':
+                    rows = json.loads(content)
+                elif output_format == 'ndjson':
+                    rows = [json.loads(line) for line in content.splitlines()]
+                else:
+                    unpacker = msgpack.Unpacker()
+                    unpacker.feed(content)
+                    rows = list(unpacker)
+                    if output_format == 'columnar':
+                        self.assertEqual([2, 1], [batch['rows'] for batch in rows])
+                        rows = [row for batch in rows for row in self.rows(read_columns(batch))]
+                self.assertEqual(json.loads(json.dumps(self.expected)), rows, output_format)
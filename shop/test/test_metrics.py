@@ -0,0 +1,84 @@
+import json
+import os
+import re
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from shop import metrics
+from shop.models import Book
+
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=1)
+class RequestMetricsTestCase(APITestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create(username='test_username')
+        self.book = Book.objects.create(name='Book1', author_name='Author1', price='100.00')
+        self.client.force_login(self.user)
+        metrics.histograms.clear()
+
+    def timings(self, response):
+        return {
+            name: float(duration)
+            for name, duration in re.findall(r'(\w+);dur=([\d.]+)', response['Server-Timing'])
+        }
+
+    def test_server_timing(self):
+        response = self.client.get(reverse('book-list'), data={'page_size': 1})
+        self.assertEqual(200, response.status_code)
+        timings = self.timings(response)
+        self.assertEqual({'db', 'serializer', 'render', 'total'}, set(timings))
+        self.assertGreaterEqual(timings['total'], timings['db'] + timings['serializer'] + timings['render'])
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+    def test_histograms(self):
+        for _ in range(3):
+            self.client.get(reverse('book-detail', args=(self.book.id,)))
+        url = reverse('userbookrelation-detail', args=(self.book.id,))
+        self.client.patch(url, json.dumps({'like': True}), content_type='application/json')
+
+        self.user.is_staff = True
+        self.user.save()
+        endpoints = self.client.get(reverse('request-metrics')).json()['endpoints']
+        self.assertEqual(3, endpoints['GET book-detail']['count'])
+        self.assertEqual(3, sum(endpoints['GET book-detail']['total']['buckets']))
+        self.assertEqual(1, endpoints['PATCH userbookrelation-detail']['count'])
+        self.assertGreater(endpoints['PATCH userbookrelation-detail']['queries'], 0)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        response = self.client.get(reverse('book-list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual({}, metrics.histograms.snapshot())
+
+    def test_metrics_view_hidden(self):
+        response = self.client.get(reverse('request-metrics'), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(404, response.status_code)
+        # INTERNAL_IPS, as every request behind a local proxy.
+        response = self.client.get(reverse('request-metrics'), REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(404, response.status_code)
+
+    def test_metrics_view_staff(self):
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('request-metrics'), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(200, response.status_code)
+
+    def test_metrics_view_allowed_ips(self):
+        with self.settings(REQUEST_METRICS_ALLOWED_IPS=['10.0.0.1']):
+            response = self.client.get(reverse('request-metrics'), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(200, response.status_code)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(REQUEST_METRICS_DIR=directory):
+            self.client.get(reverse('book-detail', args=(self.book.id,)))
+            metrics.dump(force=True)
+            self.assertTrue(os.path.exists(metrics.dump_path(directory)))
+            out = StringIO()
+            call_command('request_metrics', stdout=out)
+        self.assertIn('GET book-detail', out.getvalue())
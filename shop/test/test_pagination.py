@@ -0,0 +1,83 @@
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from shop.models import Book, UserBookRelation
+
+
+class BooksPaginationTestCase(APITestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create(username='test_username')
+        prices = ['300.00', '100.00', '200.00', '100.00', '300.00', '100.00', '50.00']
+        self.books = [
+            Book.objects.create(name=f'Book{i}', author_name=f'Author{i % 3}',
+                                price=price, owner=self.user)
+            for i, price in enumerate(prices)
+        ]
+        self.url = reverse('book-list')
+
+    def walk(self, **params):
+        ids = []
+        response = self.client.get(self.url, data=dict(params, page_size=2))
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids.extend(book['id'] for book in response.data['results'])
+            if response.data['next'] is None:
+                return ids, response
+            response = self.client.get(response.data['next'])
+
+    def test_default_ordering(self):
+        ids, _ = self.walk()
+        self.assertEqual([book.id for book in self.books], ids)
+
+    def test_ordering_fields(self):
+        tiebreakers = {'price': 'id', '-price': '-id', 'author_name': 'id', '-author_name': '-id'}
+        for ordering, tiebreaker in tiebreakers.items():
+            expected = list(Book.objects.order_by(ordering, tiebreaker).values_list('id', flat=True))
+            ids, _ = self.walk(ordering=ordering)
+            self.assertEqual(expected, ids, ordering)
+
+    def test_leaderboard_ordering(self):
+        users = [User.objects.create(username=f'reader{i}') for i in range(3)]
+        rates = [[5], [4, 5], [], [1, 2, 3], [5, 5, 4], [], [3]]
+        for book, book_rates in zip(self.books, rates):
+            for user, rate in zip(users, book_rates):
+                UserBookRelation.objects.create(user=user, book=book, rate=rate, like=rate > 3)
+
+        expected = list(Book.objects.order_by('-likes_count', '-id').values_list('id', flat=True))
+        self.assertEqual(expected, self.walk(ordering='-likes_count')[0])
+
+        ids, last_page = self.walk(ordering='-average_rating')
+        books = {book.id: book for book in Book.objects.with_rating()}
+        ratings = [books[book_id].average_rating for book_id in ids]
+        self.assertEqual([5.0, 14 / 3, 4.5, 3.0, 2.0, None, None], ratings)
+        self.assertEqual([self.books[5].id, self.books[2].id], ids[-2:])
+        self.assertIsNone(last_page.data['results'][-1]['average_rating'])
+
+    def test_previous(self):
+        _, last_page = self.walk(ordering='price')
+        ids = [book['id'] for book in last_page.data['results']]
+        response = last_page
+        while response.data['previous'] is not None:
+            response = self.client.get(response.data['previous'])
+            self.assertEqual(response.status_code, 200)
+            ids[:0] = [book['id'] for book in response.data['results']]
+        expected = list(Book.objects.order_by('price', 'id').values_list('id', flat=True))
+        self.assertEqual(expected, ids)
+
+    def test_deep_page_query_count(self):
+        _, last_page = self.walk()
+        with self.assertNumQueries(1):
+            self.client.get(last_page.data['previous'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, data={'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_from_other_ordering(self):
+        response = self.client.get(self.url, data={'page_size': 2})
+        cursor = parse_qs(urlparse(response.data['next']).query)['cursor'][0]
+        response = self.client.get(self.url, data={'ordering': 'price', 'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,194 @@
+import threading
+import time
+from unittest import skipUnless
+
+import psycopg2.extensions
+from django.db import connection as db_connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from shop.backends.postgresql_pool import base
+from shop.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    def pool(self, **options):
+        return ConnectionPool(FakeConnection, check=lambda connection: not connection.broken,
+                              reset=lambda connection: not connection.broken, **options)
+
+    def test_reuse(self):
+        pool = self.pool()
+        connection = pool.acquire()
+        pool.release(connection)
+        self.assertIs(connection, pool.acquire())
+        self.assertEqual(1, pool.status()['connects'])
+
+    def test_timeout(self):
+        pool = self.pool(max_size=2, timeout=0.05)
+        first, second = pool.acquire(), pool.acquire()
+        self.assertIsNot(first, second)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(1, pool.status()['timeouts'])
+
+        # A waiting thread gets the connection released by another one.
+        threading.Timer(0.02, pool.release, args=(first,)).start()
+        pool.timeout = 1
+        self.assertIs(first, pool.acquire())
+
+    def test_recycling(self):
+        pool = self.pool(max_lifetime=0.01)
+        connection = pool.acquire()
+        time.sleep(0.02)
+        pool.release(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual({'size': 0, 'idle': 0}, {key: pool.status()[key] for key in ('size', 'idle')})
+
+    def test_idle_timeout(self):
+        pool = self.pool(max_idle=0.01)
+        connection = pool.acquire()
+        pool.release(connection)
+        time.sleep(0.02)
+        self.assertIsNot(connection, pool.acquire())
+        self.assertTrue(connection.closed)
+
+    def test_health_check(self):
+        pool = self.pool(check_interval=0)
+        connection = pool.acquire()
+        pool.release(connection)
+        connection.broken = True
+        self.assertIsNot(connection, pool.acquire())
+        self.assertTrue(connection.closed)
+
+    def test_health_check_unlocked(self):
+        pool = self.pool(max_size=2, check_interval=0)
+        pool.release(pool.acquire())
+        acquired = []
+
+        def check(connection):
+            # Another thread gets a connection while this one checks.
+            thread = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+            thread.start()
+            thread.join(1)
+            return True
+
+        pool.check = check
+        pool.acquire()
+        self.assertEqual(1, len(acquired))
+
+    def test_discard(self):
+        pool = self.pool(max_size=1)
+        connection = pool.acquire()
+        pool.release(connection, discard=True)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(connection, pool.acquire())
+
+    def test_threads(self):
+        pool = self.pool(max_size=4, timeout=5)
+        in_use, peak, lock = set(), [0], threading.Lock()
+
+        def worker():
+            for _ in range(50):
+                connection = pool.acquire()
+                with lock:
+                    self.assertNotIn(connection, in_use)
+                    in_use.add(connection)
+                    peak[0] = max(peak[0], len(in_use))
+                with lock:
+                    in_use.discard(connection)
+                pool.release(connection)
+
+        threads = [threading.Thread(target=worker) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(peak[0], 4)
+        self.assertLessEqual(pool.status()['connects'], 4)
+
+    def test_close(self):
+        pool = self.pool()
+        connection, idle = pool.acquire(), pool.acquire()
+        pool.release(idle)
+        pool.close()
+        self.assertTrue(idle.closed)
+        pool.release(connection)
+        self.assertTrue(connection.closed)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, sql):
+        if self.connection.broken:
+            raise base.Database.OperationalError('server closed the connection unexpectedly')
+        if not self.connection.autocommit and sql == 'DISCARD ALL':
+            raise base.Database.errors.ActiveSqlTransaction('DISCARD ALL cannot run inside a transaction block')
+        self.connection.executed.append(sql)
+
+
+class FakePsycopgConnection(FakeConnection):
+    def __init__(self):
+        super().__init__()
+        self.autocommit = False
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        self.executed = []
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.executed.append('ROLLBACK')
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class ResetTestCase(SimpleTestCase):
+    def test_reset(self):
+        connection = FakePsycopgConnection()
+        self.assertTrue(base.reset(connection))
+        self.assertEqual(['ROLLBACK', 'DISCARD ALL'], connection.executed)
+        self.assertFalse(connection.autocommit)
+
+    def test_reset_failed(self):
+        connection = FakePsycopgConnection()
+        connection.broken = True
+        self.assertFalse(base.reset(connection))
+
+
+@skipUnless(db_connection.settings_dict['ENGINE'] == 'shop.backends.postgresql_pool',
+            'Needs the pooled PostgreSQL backend.')
+class PooledSessionTestCase(TransactionTestCase):
+    def test_session_reset(self):
+        db_connection.close()
+        with db_connection.cursor() as cursor:
+            cursor.execute("SET application_name = 'leaked'")
+            cursor.execute('CREATE TEMPORARY TABLE leaked (id integer)')
+        session = db_connection.connection
+        db_connection.close()
+
+        with db_connection.cursor() as cursor:
+            self.assertIs(session, db_connection.connection)
+            cursor.execute('SHOW application_name')
+            self.assertNotEqual('leaked', cursor.fetchone()[0])
+            cursor.execute("SELECT to_regclass('leaked')")
+            self.assertIsNone(cursor.fetchone()[0])
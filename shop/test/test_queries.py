@@ -0,0 +1,130 @@
+import json
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from shop.models import Book, UserBookRelation
+from shop.search import clear_inverted_indexes
+
+
+class QueryBudgetTestCase(APITestCase):
+    """
+    Number of queries every endpoint of ``books.urls`` may run. Each request
+    is made against a catalogue of ``BOOKS`` books read by ``READERS`` users,
+    so a query per row shows up as a budget overrun.
+    """
+    BOOKS = 10
+    READERS = 3
+
+    def setUp(self) -> None:
+        cache.clear()
+        clear_inverted_indexes()
+        ContentType.objects.clear_cache()
+        self.user = User.objects.create(username='test_username')
+        self.staff = User.objects.create(username='test_staff', is_staff=True, is_superuser=True)
+        readers = [User.objects.create(username=f'reader_{i}') for i in range(self.READERS)]
+        self.books = [
+            Book.objects.create(name=f'Book{i}', author_name=f'Author{i}',
+                                price=f'{i + 1}00.00', owner=self.user)
+            for i in range(self.BOOKS)
+        ]
+        for book in self.books:
+            for reader in readers:
+                UserBookRelation.objects.create(user=reader, book=book, like=True, rate=4)
+        self.book = self.books[0]
+        self.detail_url = reverse('book-detail', args=(self.book.id,))
+
+    def request(self, method, url, data=None):
+        if data is None:
+            return getattr(self.client, method)(url)
+        return getattr(self.client, method)(url, json.dumps(data), content_type='application/json')
+
+    def assertQueries(self, num, method, url, data=None, status=200):
+        cache.clear()
+        with self.assertNumQueries(num):
+            response = self.request(method, url, data)
+        self.assertEqual(status, response.status_code)
+        return response
+
+    def test_book_list(self):
+        self.assertQueries(1, 'get', reverse('book-list'))
+        self.assertQueries(1, 'get', reverse('book-list') + '?ordering=-price&price=100.00')
+        # Warm the in-process search index, built with one query on first use.
+        self.request('get', reverse('book-list') + '?search=Book1')
+        self.assertQueries(1, 'get', reverse('book-list') + '?search=Book2')
+
+    def test_book_list_my_relation(self):
+        self.client.force_login(self.user)
+        self.assertQueries(4, 'get', reverse('book-list') + '?include=my_relation')
+
+    def test_book_list_stream(self):
+        response = self.request('get', reverse('book-list') + '?stream=1')
+        with self.assertNumQueries(1):
+            b''.join(response.streaming_content)
+
+    def test_book_facets(self):
+        self.assertQueries(1, 'get', reverse('book-facets'))
+        self.assertQueries(1, 'get', reverse('book-facets') + '?price_min=300&author_name=Author3,Author4')
+
+    def test_book_sync(self):
+        # Changed books and tombstones.
+        self.assertQueries(2, 'get', reverse('book-list') + '?since=')
+
+    def test_book_detail(self):
+        self.assertQueries(1, 'get', self.detail_url)
+
+    def test_book_create(self):
+        self.client.force_login(self.user)
+        data = {'name': 'New', 'author_name': 'Author', 'price': '10.00'}
+        self.assertQueries(5, 'post', reverse('book-list'), data, status=201)
+
+    def test_book_update(self):
+        self.client.force_login(self.user)
+        data = {'name': 'Book0', 'author_name': 'Author0', 'price': '50.00'}
+        self.assertQueries(6, 'put', self.detail_url, data)
+        # Same price bucket, the facet counts are left alone.
+        self.assertQueries(5, 'patch', self.detail_url, {'price': '60.00'})
+
+    def test_book_update_by_staff(self):
+        self.client.force_login(self.staff)
+        self.assertQueries(6, 'patch', self.detail_url, {'price': '60.00'})
+
+    def test_book_update_forbidden(self):
+        self.client.force_login(User.objects.create(username='test_username2'))
+        self.assertQueries(3, 'patch', self.detail_url, {'price': '60.00'}, status=403)
+
+    def test_book_delete(self):
+        self.client.force_login(self.user)
+        self.assertQueries(8, 'delete', self.detail_url, status=204)
+
+    def test_book_bulk(self):
+        self.client.force_login(self.user)
+        url = reverse('book-bulk')
+        self.assertQueries(8, 'patch', url, [{'id': book.id, 'price': '1.00'} for book in self.books])
+        self.assertQueries(11, 'delete', url, [book.id for book in self.books])
+
+    def test_book_relation(self):
+        self.client.force_login(self.user)
+        url = reverse('userbookrelation-detail', args=(self.book.id,))
+        self.assertQueries(3, 'patch', url, {'like': True})
+        self.assertQueries(3, 'patch', url, {'rate': 5})
+
+    def test_book_relation_list(self):
+        self.client.force_login(self.user)
+        ids = ','.join(str(book.id) for book in self.books)
+        self.assertQueries(3, 'get', reverse('userbookrelation-list') + f'?books={ids}')
+        self.assertQueries(3, 'get', reverse('userbookrelation-list') + '?bookmarks=1')
+
+    def test_auth(self):
+        self.assertQueries(0, 'get', '/auth/')
+
+    def test_admin(self):
+        self.client.force_login(self.staff)
+        self.assertQueries(3, 'get', reverse('admin:index'))
+        self.assertQueries(5, 'get', reverse('admin:shop_book_changelist'))
+        self.assertQueries(5, 'get', reverse('admin:shop_userbookrelation_changelist'))
+        self.assertQueries(8, 'get', reverse('admin:shop_userbookrelation_change',
+                                             args=(UserBookRelation.objects.first().id,)))
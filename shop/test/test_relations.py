@@ -0,0 +1,54 @@
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from shop.models import Book, UserBookRelation
+
+
+class UserRelationsTestCase(APITestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create(username='test_username')
+        self.user2 = User.objects.create(username='test_username2')
+        self.books = [Book.objects.create(name=f'Book{i}', author_name=f'Author{i}', price='100.00')
+                      for i in range(3)]
+        UserBookRelation.objects.create(user=self.user, book=self.books[0], like=True, rate=5)
+        UserBookRelation.objects.create(user=self.user, book=self.books[2], in_bookmarks=True)
+        UserBookRelation.objects.create(user=self.user2, book=self.books[1], in_bookmarks=True)
+        self.url = reverse('userbookrelation-list')
+        self.client.force_login(self.user)
+
+    def test_by_books(self):
+        ids = ','.join(str(book.id) for book in self.books[:2])
+        response = self.client.get(self.url, data={'books': ids})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([{'book': self.books[0].id, 'like': True, 'in_bookmarks': False, 'rate': 5}],
+                         response.data)
+
+    def test_bookmarks(self):
+        response = self.client.get(self.url, data={'bookmarks': '1'})
+        self.assertEqual([self.books[2].id], [relation['book'] for relation in response.data])
+
+    def test_bad_request(self):
+        self.assertEqual(400, self.client.get(self.url).status_code)
+        self.assertEqual(400, self.client.get(self.url, data={'books': '1,x'}).status_code)
+        self.client.logout()
+        self.assertEqual(403, self.client.get(self.url, data={'books': '1'}).status_code)
+
+    def test_include_my_relation(self):
+        response = self.client.get(reverse('book-list'), data={'include': 'my_relation'})
+        relations = [book['my_relation'] for book in response.data['results']]
+        self.assertEqual([
+            {'like': True, 'in_bookmarks': False, 'rate': 5},
+            None,
+            {'like': False, 'in_bookmarks': True, 'rate': None},
+        ], relations)
+
+        # Not served from or stored in the shared cache.
+        self.client.force_login(self.user2)
+        response = self.client.get(reverse('book-list'), data={'include': 'my_relation'})
+        self.assertEqual([None, {'like': False, 'in_bookmarks': True, 'rate': None}, None],
+                         [book['my_relation'] for book in response.data['results']])
+
+        self.client.logout()
+        response = self.client.get(reverse('book-list'), data={'include': 'my_relation'})
+        self.assertEqual([None] * 3, [book['my_relation'] for book in response.data['results']])
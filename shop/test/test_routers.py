@@ -0,0 +1,125 @@
+import json
+import time
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpResponse
+from django.test import override_settings, RequestFactory, SimpleTestCase
+from django.urls import reverse
+from rest_framework.test import APITransactionTestCase
+
+from shop.cache import get_cache
+from shop.models import Book, UserBookRelation
+from shop.routers import PIN_COOKIE, ReplicaMiddleware, ReplicaRouter
+from shop.search import clear_inverted_indexes
+
+REPLICA = 'replica'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA], REPLICA_LAG_SECONDS=5)
+class ReplicaRoutingTestCase(SimpleTestCase):
+    def route(self, method, cookies=None, model=Book):
+        """
+        Database a read of ``model`` goes to during a ``method`` request,
+        and the response.
+        """
+        request = RequestFactory().generic(method, '/book/')
+        request.COOKIES.update(cookies or {})
+        routed = []
+
+        def view(request):
+            routed.append(ReplicaRouter().db_for_read(model))
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view)(request)
+        return routed[0], response
+
+    def test_safe_methods(self):
+        self.assertEqual(REPLICA, self.route('GET')[0])
+        self.assertEqual(REPLICA, self.route('HEAD')[0])
+        self.assertEqual(DEFAULT_DB_ALIAS, self.route('GET', model=User)[0])
+        self.assertEqual(DEFAULT_DB_ALIAS, ReplicaRouter().db_for_read(Book))
+
+    def test_writes_pin_to_primary(self):
+        database, response = self.route('PATCH')
+        self.assertEqual(DEFAULT_DB_ALIAS, database)
+        self.assertEqual(DEFAULT_DB_ALIAS, ReplicaRouter().db_for_write(Book))
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual(5, cookie['max-age'])
+
+        self.assertEqual(DEFAULT_DB_ALIAS, self.route('GET', {PIN_COOKIE: cookie.value})[0])
+        self.assertEqual(REPLICA, self.route('GET', {PIN_COOKIE: str(time.time() - 1)})[0])
+        self.assertEqual(REPLICA, self.route('GET', {PIN_COOKIE: 'garbage'})[0])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        database, response = self.route('GET')
+        self.assertEqual(DEFAULT_DB_ALIAS, database)
+        self.assertNotIn(PIN_COOKIE, self.route('PATCH')[1].cookies)
+
+
+@skipUnless(REPLICA in settings.DATABASES, f'Needs a "{REPLICA}" database standing in for a replica.')
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaReadYourWritesTestCase(APITransactionTestCase):
+    """
+    Two separate databases without replication in between: books created in
+    the replica only are visible to reads routed there. Not a TestCase, whose
+    transaction around each test keeps every read on the primary.
+    """
+    databases = {DEFAULT_DB_ALIAS, REPLICA} & set(settings.DATABASES)
+
+    def setUp(self) -> None:
+        get_cache().clear()
+        clear_inverted_indexes()
+        self.user = User.objects.create(username='test_username')
+        User.objects.using(REPLICA).create(id=self.user.id, username='test_username')
+        self.book = Book.objects.create(name='Book1', author_name='Author1', price='100.00')
+        Book.objects.using(REPLICA).create(id=self.book.id, name='Stale', author_name='Author1', price='100.00')
+        self.client.force_login(self.user)
+
+    def names(self):
+        response = self.client.get(reverse('book-list'))
+        return [book['name'] for book in json.loads(response.content)['results']]
+
+    def search(self, terms):
+        response = self.client.get(reverse('book-list'), data={'search': terms})
+        return [book['name'] for book in json.loads(response.content)['results']]
+
+    def test_reads_from_replica(self):
+        self.assertEqual(['Stale'], self.names())
+
+    def test_streamed_reads_from_replica(self):
+        response = self.client.get(reverse('book-list'), data={'stream': '1'})
+        self.assertEqual(['Stale'], [book['name'] for book in json.loads(b''.join(response.streaming_content))])
+
+    def test_search_reads_from_replica(self):
+        # Each database gets its own search index.
+        self.assertEqual([], self.search('book1'))
+        self.assertEqual(['Stale'], self.search('stale'))
+        self.client.patch(reverse('userbookrelation-detail', args=(self.book.id,)),
+                          json.dumps({'like': True}), content_type='application/json')
+        self.assertEqual(['Book1'], self.search('book1'))
+
+    def test_read_your_writes(self):
+        url = reverse('userbookrelation-detail', args=(self.book.id,))
+        response = self.client.patch(url, json.dumps({'like': True}), content_type='application/json')
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(UserBookRelation.objects.filter(user=self.user, like=True).exists())
+        self.assertFalse(UserBookRelation.objects.using(REPLICA).exists())
+
+        pin = self.client.cookies.pop(PIN_COOKIE)
+
+        # Another client still reads the replica, without caching what it read.
+        self.assertEqual(['Stale'], self.names())
+
+        # Pinned to the primary by the cookie the PATCH set.
+        self.client.cookies[PIN_COOKIE] = pin
+        self.assertEqual(['Book1'], self.names())
+        response = self.client.get(reverse('userbookrelation-list'), data={'books': self.book.id})
+        self.assertEqual([True], [relation['like'] for relation in json.loads(response.content)])
+
+    def test_transactions_stay_on_primary(self):
+        with transaction.atomic():
+            self.assertEqual(DEFAULT_DB_ALIAS, ReplicaRouter().db_for_read(Book))
@@ -0,0 +1,79 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from shop.cache import get_cache
+from shop.models import Book
+from shop.search import InvertedIndex
+
+
+class BooksSearchTestCase(APITestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create(username='test_username')
+        self.book_1 = Book.objects.create(name='Python Cookbook', author_name='David Beazley',
+                                          price='100.00', owner=self.user)
+        self.book_2 = Book.objects.create(name='Fluent Python', author_name='Luciano Ramalho',
+                                          price='200.00', owner=self.user)
+        self.book_3 = Book.objects.create(name='Python', author_name='Python Team',
+                                          price='300.00', owner=self.user)
+        self.book_4 = Book.objects.create(name='Dive into Python 3', author_name='Mark Pilgrim',
+                                          price='50.00', owner=self.user)
+        self.url = reverse('book-list')
+
+    def search(self, **params):
+        response = self.client.get(self.url, data=params)
+        self.assertEqual(response.status_code, 200)
+        return [book['id'] for book in response.data['results']]
+
+    def test_ranked(self):
+        self.assertEqual([self.book_3.id, self.book_1.id, self.book_2.id, self.book_4.id],
+                         self.search(search='python'))
+
+    def test_all_terms(self):
+        self.assertEqual([self.book_2.id], self.search(search='PYTHON, fluent'))
+        self.assertEqual([], self.search(search='python ruby'))
+
+    def test_whole_words(self):
+        self.assertEqual([], self.search(search='pyth'))
+
+    def test_ordering(self):
+        self.assertEqual([self.book_4.id, self.book_1.id, self.book_2.id, self.book_3.id],
+                         self.search(search='python', ordering='price'))
+
+    def test_pages(self):
+        ids = []
+        response = self.client.get(self.url, data={'search': 'python', 'page_size': 1})
+        while True:
+            ids.extend(book['id'] for book in response.data['results'])
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(self.search(search='python'), ids)
+
+    def test_follows_writes(self):
+        self.assertEqual([self.book_2.id], self.search(search='fluent'))
+        self.book_2.name = 'Fluent Ruby'
+        self.book_2.save()
+        self.assertEqual([self.book_2.id], self.search(search='ruby'))
+        self.assertNotIn(self.book_2.id, self.search(search='python'))
+        self.book_2.delete()
+        self.assertEqual([], self.search(search='ruby'))
+
+    def test_many_matches(self):
+        # Past max_inline_matches the ranks go through a temporary table.
+        ranked, by_price = self.search(search='python'), self.search(search='python', ordering='price')
+        get_cache().clear()
+        with mock.patch.object(InvertedIndex, 'max_inline_matches', 1):
+            self.assertEqual(ranked, self.search(search='python'))
+            self.assertEqual(by_price, self.search(search='python', ordering='price'))
+            self.assertEqual([self.book_2.id], self.search(search='fluent python'))
+            ids = []
+            response = self.client.get(self.url, data={'search': 'python', 'page_size': 1})
+            while True:
+                ids.extend(book['id'] for book in response.data['results'])
+                if response.data['next'] is None:
+                    break
+                response = self.client.get(response.data['next'])
+            self.assertEqual(ranked, ids)
@@ -0,0 +1,53 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.test import TestCase
+
+from shop.counters import check_counters
+from shop.models import Book, UserBookRelation
+from shop.seeding import secondary_indexes
+
+
+class SeedBooksTestCase(TestCase):
+    def seed(self, **options):
+        options = {'books': 30, 'users': 8, 'relations': 100, 'chunk_size': 7, 'stdout': StringIO(), **options}
+        call_command('seed_books', **options)
+
+    def indexes(self):
+        return sorted(secondary_indexes(connection, Book._meta.db_table) +
+                      secondary_indexes(connection, UserBookRelation._meta.db_table))
+
+    def test_seed(self):
+        indexes = self.indexes()
+        self.seed()
+        self.assertEqual(8, User.objects.count())
+        self.assertEqual(30, Book.objects.count())
+        self.assertEqual(100, UserBookRelation.objects.count())
+        self.assertEqual([], check_counters(Book.objects.all(), UserBookRelation.objects.all()))
+        self.assertEqual(indexes, self.indexes())
+
+        # The triggers are back.
+        book = Book.objects.create(name='Book', author_name='Author', price='1.00')
+        UserBookRelation.objects.create(user=User.objects.first(), book=book, rate=4)
+        book.refresh_from_db()
+        self.assertEqual((1, 4.0), (book.rating_count, book.rating_average))
+
+    def test_same_seed_same_data(self):
+        self.seed(seed=3)
+        first = list(Book.objects.order_by('id').values_list('name', 'author_name', 'price', 'likes_count'))
+        Book.objects.all().delete()
+        self.seed(seed=3, method='orm', keep_indexes=True)
+        second = list(Book.objects.order_by('id').values_list('name', 'author_name', 'price', 'likes_count'))
+        self.assertEqual(first, second)
+        self.assertEqual(16, User.objects.count())
+
+        # New ids and the sequences moved past them.
+        book = Book.objects.create(name='Book', author_name='Author', price='1.00')
+        self.assertEqual(Book.objects.aggregate(id=Max('id'))['id'], book.id)
+
+    def test_copy_needs_postgresql(self):
+        with self.assertRaises(CommandError):
+            self.seed(method='copy')
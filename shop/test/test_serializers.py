@@ -1,9 +1,9 @@
 from django.contrib.auth.models import User
-from django.db.models import Count, Case, When, Avg
 from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
 
 from shop.models import Book, UserBookRelation
-from shop.serizalizers import BookSerializer
+from shop.serizalizers import BookSerializer, CompiledSerializer
 
 
 class BooksSerializerTestCase(TestCase):
@@ -23,10 +23,7 @@ class BooksSerializerTestCase(TestCase):
         UserBookRelation.objects.create(user=user2, book=book_2, like=True, rate=5)
         UserBookRelation.objects.create(user=user3, book=book_2, like=False)
 
-        books = Book.objects.all().annotate(
-            likes_count=Count(Case(When(userbookrelation__like=True, then=1))),
-            average_rating=Avg('userbookrelation__rate')
-        ).order_by('id')
+        books = Book.objects.all().with_rating().order_by('id')
 
         data = BookSerializer(books, many=True).data
         expected_data = [
@@ -48,3 +45,18 @@ class BooksSerializerTestCase(TestCase):
             },
         ]
         self.assertEqual(expected_data, data)
+
+
+class CompiledSerializerTestCase(TestCase):
+    def test_same_output(self):
+        users = [User.objects.create(username=f'user{i}') for i in range(8)]
+        ratings = [[], [5], [4, 4, 5], [1, 2], [3, 3, 2, 2, 2, 3, 3, 2], [1, 1, 1, 1, 1, 1, 1, 2]]
+        for i, rates in enumerate(ratings):
+            book = Book.objects.create(name=f'Book{i} \u2028', author_name=f'Автор{i}', price=f'{i * 7}.05')
+            for user, rate in zip(users, rates):
+                UserBookRelation.objects.create(user=user, book=book, like=rate > 2, rate=rate)
+
+        books = Book.objects.all().with_rating().order_by('id')
+        expected = JSONRenderer().render(BookSerializer(books, many=True).data)
+        data = CompiledSerializer(BookSerializer).serialize(books)
+        self.assertEqual(expected, JSONRenderer().render(data))
@@ -0,0 +1,62 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from shop.cache import get_cache
+from shop.models import Book
+from shop.slowlog import fingerprint, normalize, read_entries
+
+
+class SlowQueryLogTestCase(APITestCase):
+    def setUp(self) -> None:
+        self.book = Book.objects.create(name='Book1', author_name='Author1', price='100.00')
+        get_cache().clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'slow.log')
+
+    def test_normalize(self):
+        first = normalize('SELECT "id" FROM "shop_book" WHERE "price" = 10.5 AND "id" IN (%s, %s)')
+        second = normalize('SELECT "id"  FROM "shop_book"\n WHERE "price" = 7 AND "id" IN (%s)')
+        self.assertEqual('SELECT "id" FROM "shop_book" WHERE "price" = ? AND "id" IN (...)', first)
+        self.assertEqual(fingerprint(first), fingerprint(second))
+        self.assertEqual('INSERT INTO "t" ("a") SELECT ? UNION ALL ...',
+                         normalize('INSERT INTO "t" ("a") SELECT %s UNION ALL SELECT %s UNION ALL SELECT %s'))
+        self.assertEqual('SELECT CASE WHEN ... ELSE ? END',
+                         normalize('SELECT CASE WHEN "id" = %s THEN %s WHEN "id" = %s THEN %s ELSE %s END'))
+
+    def test_capture(self):
+        with override_settings(SLOW_QUERY_LOG=self.path, SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_EXPLAIN_RATE=1):
+            self.client.get(reverse('book-list'), data={'price': '100.00'})
+            self.client.get(reverse('book-list'), data={'price': '200.00'})
+        entries = [entry for entry in read_entries(self.path) if '"shop_book"."price" =' in entry['sql']]
+        self.assertEqual(2, len(entries))
+        self.assertEqual(entries[0]['fingerprint'], entries[1]['fingerprint'])
+        self.assertEqual('GET book-list', entries[0]['endpoint'])
+        self.assertIn("'100.00'", entries[0]['params'])
+        self.assertTrue(any('views.py' in frame for frame in entries[0]['stack']))
+        self.assertTrue(entries[0]['plan'])
+
+        out = StringIO()
+        call_command('slow_queries', file=self.path, plans=True, stdout=out)
+        self.assertIn(entries[0]['fingerprint'], out.getvalue())
+        self.assertIn('GET book-list (2)', out.getvalue())
+
+    def test_rotation(self):
+        with override_settings(SLOW_QUERY_LOG=self.path, SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG_MAX_BYTES=500,
+                               SLOW_QUERY_LOG_BACKUPS=2):
+            for _ in range(5):
+                list(Book.objects.all())
+        self.assertTrue(os.path.exists(self.path + '.1'))
+        self.assertFalse(os.path.exists(self.path + '.3'))
+        self.assertTrue(list(read_entries(self.path)))
+
+    def test_disabled(self):
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0):
+            list(Book.objects.all())
+        self.assertFalse(os.path.exists(self.path))
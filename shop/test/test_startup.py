@@ -0,0 +1,24 @@
+from django.test import SimpleTestCase
+
+from shop.benchmarks import startup
+
+
+class StartupProfilesTestCase(SimpleTestCase):
+    def test_api_only(self):
+        module, env = startup.PROFILES['api-only']
+        timings, (imports, packages), _ = startup.boot(module, env)
+        self.assertEqual('200 OK', timings['status'])
+        self.assertIn('shop.views', timings['modules'])
+        for package in startup.WATCHED:
+            self.assertNotIn(package, timings['modules'])
+        self.assertGreater(imports, 0)
+        self.assertIn('django', packages)
+
+    def test_parse_importtime(self):
+        lines = [
+            'import time: self [us] | cumulative | imported package',
+            'import time:       100 |        100 |   shop.facets',
+            'import time:       300 |        400 | shop.signals',
+            'Traceback (most recent call last):',
+        ]
+        self.assertEqual((0.0004, {'shop': 0.0004}), startup.parse_importtime(lines))
@@ -0,0 +1,40 @@
+import json
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from shop.models import Book
+from shop.serizalizers import BookSerializer
+
+
+class BooksStreamingTestCase(APITestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create(username='test_username')
+        for i in range(5):
+            Book.objects.create(name=f'Book{i}', author_name=f'Author{i}',
+                                price=f'{100 + i}.00', owner=self.user)
+        self.url = reverse('book-list')
+        self.expected = json.loads(json.dumps(
+            BookSerializer(Book.objects.with_rating().order_by('id'), many=True).data
+        ))
+
+    def test_stream_json(self):
+        response = self.client.get(self.url, data={'stream': '1', 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(self.expected, json.loads(b''.join(response.streaming_content)))
+
+    def test_stream_ndjson(self):
+        response = self.client.get(self.url, data={'ordering': '-price'},
+                                   HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(self.expected[::-1], [json.loads(line) for line in lines])
+
+    def test_stream_empty(self):
+        response = self.client.get(self.url, data={'stream': '1', 'search': 'missing'})
+        self.assertEqual([], json.loads(b''.join(response.streaming_content)))
@@ -0,0 +1,128 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APITestCase
+
+from shop import sync
+from shop.models import Book, BookTombstone, UserBookRelation
+
+
+@override_settings(BOOK_SYNC_SETTLE_SECONDS=1)
+class BookSyncTestCase(APITestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create(username='test_username')
+        self.books = [
+            Book.objects.create(name=f'Book{i}', author_name=f'Author{i}', price=f'{i}0.00', owner=self.user)
+            for i in range(1, 6)
+        ]
+        # Settled and all at the same time, update() leaves updated_at alone.
+        self.past = timezone.now() - timedelta(minutes=5)
+        Book.objects.update(updated_at=self.past)
+        self.url = reverse('book-list')
+
+    def sync(self, token='', **params):
+        response = self.client.get(self.url, data=dict(params, since=token))
+        self.assertEqual(200, response.status_code)
+        return response.data
+
+    def test_full_sync_pages(self):
+        token, ids, pages = '', [], 0
+        while True:
+            data = self.sync(token, page_size=2)
+            ids += [book['id'] for book in data['changed']]
+            token, pages = data['since'], pages + 1
+            if not data['more']:
+                break
+        self.assertEqual([book.id for book in self.books], ids)
+        self.assertEqual(3, pages)
+        data = self.sync(token)
+        self.assertEqual(([], [], False), (data['changed'], data['deleted'], data['more']))
+
+    def test_changes(self):
+        token = self.sync()['since']
+        deleted = {self.books[0].id, self.books[4].id}
+        book = self.books[1]
+        book.price = '99.00'
+        book.save(update_fields=['price'])
+        # Counter triggers bump the book too.
+        UserBookRelation.objects.create(user=self.user, book=self.books[3], like=True)
+        self.books[4].delete()
+        Book.objects.filter(pk__in=[self.books[0].pk]).delete()
+
+        data = self.sync(token)
+        self.assertEqual([(book.id, '99.00'), (self.books[3].id, '40.00')],
+                         [(book['id'], book['price']) for book in data['changed']])
+        self.assertEqual(1, data['changed'][1]['likes_count'])
+        self.assertEqual(deleted, set(data['deleted']))
+        self.assertEqual(2, BookTombstone.objects.count())
+
+    def test_tombstones(self):
+        book_id = self.books[0].id
+        BookTombstone.objects.create(book_id=book_id, deleted_at=self.past)
+        token = self.sync()['since']
+        self.books[0].delete()
+        self.assertEqual([book_id], self.sync(token)['deleted'])
+
+        Book.objects.create(id=book_id, name='Again', author_name='Author1', price='10.00')
+        self.assertFalse(BookTombstone.objects.filter(book_id=book_id).exists())
+        Book.objects.bulk_create([Book(id=self.books[4].id + 1, name='Bulk', author_name='Author1', price='1.00')])
+        BookTombstone.objects.create(book_id=self.books[4].id + 2)
+        Book.objects.bulk_create([Book(id=self.books[4].id + 2, name='Bulk', author_name='Author1', price='1.00')])
+        self.assertEqual(0, BookTombstone.objects.count())
+
+    def test_unsettled_changes_are_resent(self):
+        with override_settings(BOOK_SYNC_SETTLE_SECONDS=60):
+            token = self.sync()['since']
+            self.books[0].save()
+            self.assertEqual([self.books[0].id], [book['id'] for book in self.sync(token)['changed']])
+            self.assertEqual([self.books[0].id], [book['id'] for book in self.sync(token)['changed']])
+
+    def test_token_never_moves_back(self):
+        ahead = (timezone.now() + timedelta(hours=1), 3)
+        changed_after, _ = sync.decode_token(self.sync(sync.encode_token(ahead, None))['since'])
+        self.assertEqual(ahead, changed_after)
+
+    def test_invalid_token(self):
+        for token in ('abc', 'e30=', sync.encode_token(None, None)[:-4]):
+            response = self.client.get(self.url, data={'since': token})
+            self.assertEqual(400, response.status_code, token)
+            self.assertIn('since', response.data)
+
+    def test_bulk_update_bumps(self):
+        token = self.sync()['since']
+        Book.objects.bulk_update(self.books[:2], ['name'])
+        self.assertEqual([book.id for book in self.books[:2]], [book['id'] for book in self.sync(token)['changed']])
+
+
+class BookLastModifiedTestCase(APITestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.book = Book.objects.create(name='Book1', author_name='Author1', price='10.00')
+        Book.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+        self.book.refresh_from_db()
+        self.url = reverse('book-detail', args=(self.book.id,))
+
+    def test_if_modified_since(self):
+        response = self.client.get(self.url)
+        last_modified = response['Last-Modified']
+        self.assertEqual(http_date(self.book.updated_at.timestamp()), last_modified)
+
+        # Cached and uncached, with and without If-None-Match.
+        for _ in range(2):
+            response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(304, response.status_code)
+            self.assertEqual(last_modified, response['Last-Modified'])
+            cache.clear()
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(200, response.status_code)
+
+        UserBookRelation.objects.create(user=User.objects.create(username='reader'), book=self.book, rate=5)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('5.00', response.data['average_rating'])
@@ -0,0 +1,64 @@
+import json
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from shop.models import Book
+from shop.throttling import TokenBucketStore, get_store, parse_rate
+
+
+class TokenBucketStoreTestCase(SimpleTestCase):
+    def test_take(self):
+        now = [0.0]
+        store = TokenBucketStore(max_keys=2, clock=lambda: now[0])
+        self.assertEqual([0, 0, 0], [store.take('a', 3, 0.5) for _ in range(3)])
+        self.assertEqual(2.0, store.take('a', 3, 0.5))
+        now[0] = 2.0
+        self.assertEqual(0, store.take('a', 3, 0.5))
+        self.assertEqual(2.0, store.take('a', 3, 0.5))
+        # Never more than the capacity.
+        now[0] = 100.0
+        self.assertEqual([0, 0, 0], [store.take('a', 3, 0.5) for _ in range(3)])
+        self.assertNotEqual(0, store.take('a', 3, 0.5))
+
+        store.take('b', 3, 0.5)
+        store.take('c', 3, 0.5)
+        self.assertEqual(2, len(store))
+        self.assertEqual(0, store.take('a', 3, 0.5))
+
+    def test_parse_rate(self):
+        self.assertEqual((120, 60), parse_rate('120/min'))
+        self.assertEqual((5, 1), parse_rate('5/s'))
+
+
+@override_settings(RELATION_THROTTLE_RATES={'user': '3/min', 'ip': '5/min'})
+class RelationThrottleTestCase(APITestCase):
+    def setUp(self) -> None:
+        get_store().clear()
+        self.users = [User.objects.create(username=f'test_username_{i}') for i in range(3)]
+        self.book = Book.objects.create(name='Book1', author_name='Author1', price='10.00')
+        self.url = reverse('userbookrelation-detail', args=(self.book.id,))
+
+    def patch(self, user, **extra):
+        self.client.force_login(user)
+        return self.client.patch(self.url, json.dumps({'like': True}), content_type='application/json', **extra)
+
+    def test_per_user(self):
+        self.assertEqual([200] * 3, [self.patch(self.users[0]).status_code for _ in range(3)])
+        response = self.patch(self.users[0])
+        self.assertEqual(429, response.status_code)
+        self.assertEqual('20', response['Retry-After'])
+        # Reads are not throttled.
+        self.assertEqual(200, self.client.get(reverse('userbookrelation-list'), {'bookmarks': 1}).status_code)
+        self.assertEqual(200, self.patch(self.users[1]).status_code)
+
+    def test_per_ip(self):
+        statuses = [self.patch(user).status_code for user in self.users for _ in range(2)]
+        self.assertEqual([200] * 5 + [429], statuses)
+        self.assertEqual(200, self.patch(self.users[2], REMOTE_ADDR='10.0.0.1').status_code)
+
+    @override_settings(RELATION_THROTTLE_RATES={'user': None, 'ip': None})
+    def test_disabled(self):
+        self.assertEqual([200] * 10, [self.patch(self.users[0]).status_code for _ in range(10)])
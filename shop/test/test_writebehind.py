@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from shop import writebehind
+from shop.models import Book, UserBookRelation, UserBookRelationQuerySet
+from shop.writebehind import RelationBuffer
+
+
+@override_settings(RELATION_WRITE_BEHIND=True, RELATION_WRITE_BEHIND_INTERVAL=None,
+                   RELATION_WRITE_BEHIND_BATCH_SIZE=3)
+class WriteBehindTestCase(APITestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create(username='test_username')
+        self.book_1 = Book.objects.create(name='Book1', author_name='Author1', price='100.00')
+        self.book_2 = Book.objects.create(name='Book2', author_name='Author2', price='200.00')
+        self.client.force_login(self.user)
+
+    def tearDown(self) -> None:
+        writebehind.shutdown()
+
+    def patch(self, book, data):
+        url = reverse('userbookrelation-detail', args=(book.id,))
+        return self.client.patch(url, json.dumps(data), content_type='application/json')
+
+    def test_queued(self):
+        with self.assertNumQueries(2):
+            response = self.patch(self.book_1, {'like': True})
+        self.assertEqual(202, response.status_code)
+        self.assertEqual({'book': self.book_1.id, 'like': True}, response.data)
+        self.patch(self.book_1, {'rate': 3})
+        self.patch(self.book_1, {'rate': 4})
+        self.assertFalse(UserBookRelation.objects.exists())
+
+        self.assertEqual(1, writebehind.get_buffer().flush())
+        relation = UserBookRelation.objects.get(user=self.user, book=self.book_1)
+        self.assertEqual((True, 4), (relation.like, relation.rate))
+        self.book_1.refresh_from_db()
+        self.assertEqual((1, 4, 1), (self.book_1.likes_count, self.book_1.rating_sum, self.book_1.rating_count))
+
+    def test_flush_on_size(self):
+        self.patch(self.book_1, {'like': True})
+        self.patch(self.book_2, {'like': True})
+        self.assertFalse(UserBookRelation.objects.exists())
+        book_3 = Book.objects.create(name='Book3', author_name='Author3', price='300.00')
+        self.patch(book_3, {'in_bookmarks': True})
+        self.assertEqual(3, UserBookRelation.objects.count())
+        self.assertEqual(0, len(writebehind.get_buffer()))
+
+    def test_missing_book_skipped(self):
+        self.patch(self.book_1, {'like': True})
+        writebehind.get_buffer().add(self.user.id, self.book_2.id + 100, {'like': True})
+        self.assertEqual(2, writebehind.get_buffer().flush())
+        self.assertEqual([self.book_1.id], list(UserBookRelation.objects.values_list('book', flat=True)))
+
+
+class RelationBufferLogTestCase(APITestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create(username='test_username')
+        self.book = Book.objects.create(name='Book1', author_name='Author1', price='100.00')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'relations-1.log')
+
+    def test_recover(self):
+        buffer = RelationBuffer(path=self.path, interval=None)
+        buffer.add(self.user.id, self.book.id, {'like': True})
+        buffer.add(self.user.id, self.book.id, {'rate': 2})
+        # The process dies before flushing.
+        recovered = RelationBuffer(path=self.path, interval=None)
+        self.assertEqual({(self.user.id, self.book.id): {'like': True, 'rate': 2}}, recovered.pending)
+
+    def test_failed_flush(self):
+        buffer = RelationBuffer(path=self.path, interval=None)
+        buffer.add(self.user.id, self.book.id, {'like': True, 'rate': 2})
+        with mock.patch.object(UserBookRelationQuerySet, 'bulk_upsert', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                buffer.flush()
+        buffer.add(self.user.id, self.book.id, {'rate': 5})
+        expected = {(self.user.id, self.book.id): {'like': True, 'rate': 5}}
+        self.assertEqual(expected, buffer.pending)
+        self.assertEqual(expected, RelationBuffer(path=self.path, interval=None).pending)
+
+        self.assertEqual(1, buffer.flush())
+        buffer.close()
+        self.assertEqual([], os.listdir(self.directory.name))
+        self.assertEqual(5, UserBookRelation.objects.get().rate)
+
+    def test_drain_command(self):
+        # A pid no process can have.
+        path = writebehind.log_path(self.directory.name, 2 ** 22 + 1)
+        RelationBuffer(path=path, interval=None).add(self.user.id, self.book.id, {'like': True})
+        call_command('drain_relation_buffer', dir=self.directory.name, stdout=StringIO())
+        self.assertTrue(UserBookRelation.objects.get().like)
+        self.assertEqual([], os.listdir(self.directory.name))
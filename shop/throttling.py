@@ -0,0 +1,128 @@
+"""
+Throttles of the ``book_relation`` writes, per user and per client IP.
+
+Each client has a token bucket per scope holding up to ``n`` tokens and
+refilled at ``n`` per period for a rate of ``'n/period'`` in
+``settings.RELATION_THROTTLE_RATES`` (``'s'``, ``'m'``, ``'h'`` or ``'d'``,
+like DRF's rates). A write takes a token; a client with an empty bucket gets
+429 Too Many Requests with ``Retry-After`` set to when the next token is
+due. Bursts up to ``n`` go through, sustained traffic is held to the rate.
+A scope rated ``None`` is not throttled.
+
+Buckets live in the memory of the process, each worker counts its own
+clients: the limit of a deployment is the rate times the number of workers
+a client's requests are spread over. Only the ``max_keys`` most recently
+seen clients are kept, a forgotten client starts over with a full bucket.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.throttling import BaseThrottle
+
+DEFAULT_RATES = {'user': '120/min', 'ip': '600/min'}
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """
+    ``(tokens, period in seconds)`` of a ``'n/period'`` rate.
+    """
+    tokens, period = rate.split('/')
+    return int(tokens), PERIODS[period[0]]
+
+
+class TokenBucketStore:
+    def __init__(self, max_keys=10000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+    def take(self, key, capacity, per_second):
+        """
+        Take a token from the bucket of ``key``. Returns 0 if there was one,
+        else the seconds until there is.
+        """
+        with self.lock:
+            now = self.clock()
+            tokens, last = self.buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * per_second)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / per_second
+            self.buckets[key] = (tokens, now)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+            return wait
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TokenBucketStore(max_keys=getattr(settings, 'RELATION_THROTTLE_MAX_KEYS', 10000))
+    return _store
+
+
+@receiver(setting_changed)
+def reset_store(setting, **kwargs):
+    global _store
+    if setting.startswith('RELATION_THROTTLE'):
+        _store = None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle the writes of each client, as identified by ``get_ident()``,
+    with the rate of ``scope``.
+    """
+    scope = None
+    methods = ('PUT', 'PATCH')
+
+    def get_rate(self):
+        return getattr(settings, 'RELATION_THROTTLE_RATES', DEFAULT_RATES).get(self.scope)
+
+    def allow_request(self, request, view):
+        rate = self.get_rate()
+        if request.method not in self.methods or rate is None:
+            return True
+        ident = self.get_ident(request)
+        if ident is None:
+            return True
+        tokens, period = parse_rate(rate)
+        self.delay = get_store().take(f'{self.scope}:{ident}', tokens, tokens / period)
+        return not self.delay
+
+    def wait(self):
+        # Whole seconds, DRF truncates Retry-After.
+        return math.ceil(self.delay)
+
+
+class RelationUserThrottle(TokenBucketThrottle):
+    scope = 'user'
+
+    def get_ident(self, request):
+        return request.user.pk if request.user.is_authenticated else None
+
+
+class RelationIPThrottle(TokenBucketThrottle):
+    scope = 'ip'
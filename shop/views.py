@@ -1,44 +1,227 @@
-from django.db.models import Count, Case, When, Avg
+from django.db import router
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
+from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.mixins import UpdateModelMixin
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
 
-from shop.models import Book, UserBookRelation
-from shop.serizalizers import BookSerializer, UserBookRelationSerializer
+from shop import facets, metrics, sync, writebehind
+from shop.bulk import BulkMixin
+from shop.cache import CachedResponseMixin
+from shop.filters import BookFilter, BookOrderingFilter
+from shop.models import Book, BookFacet, UserBookRelation
+from shop.pagination import KeysetPagination
+from shop.renderers import ColumnarRenderer, MessagePackRenderer, NDJSONRenderer, stream_json_array
+from shop.search import BookSearchFilter
+from shop.serizalizers import BookSerializer, UserBookRelationSerializer, CompiledSerializer
 from shop.permisions import IsOwnerOrStaffOrReadOnly
+from shop.throttling import RelationIPThrottle, RelationUserThrottle
 
 
-class BookViewSet(ModelViewSet):
-    queryset = Book.objects.all().annotate(
-        likes_count=Count(Case(When(userbookrelation__like=True, then=1))),
-        average_rating=Avg('userbookrelation__rate')
-    ).order_by('id')
+class BookViewSet(metrics.TimedRenderMixin, CachedResponseMixin, BulkMixin, ModelViewSet):
+    queryset = Book.objects.all().with_rating().order_by('id')
     serializer_class = BookSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    list_serializer = CompiledSerializer(BookSerializer)
+    pagination_class = KeysetPagination
+    renderer_classes = [JSONRenderer, NDJSONRenderer, MessagePackRenderer, ColumnarRenderer]
+    filter_backends = [DjangoFilterBackend, BookSearchFilter, BookOrderingFilter]
     permission_classes = [IsOwnerOrStaffOrReadOnly]
-    filter_fields = ['price']
-    search_fields = ['name', 'author_name']
-    ordering_fields = ['price', 'author_name']
+    filterset_class = BookFilter
+    ordering_fields = ['price', 'author_name', 'likes_count', 'average_rating']
+    stream_query_param = 'stream'
+    stream_chunk_size = 2000
+    include_query_param = 'include'
+    since_query_param = 'since'
+    facet_limit_query_param = 'limit'
+    facet_limit = 100
+    max_facet_limit = 1000
+
+    def list(self, request, *args, **kwargs):
+        if self.since_query_param in request.query_params:
+            return self.sync_list(request)
+        if self.is_streaming(request):
+            return self.stream_list(request)
+        if self.includes_my_relation(request) and request.user.is_authenticated:
+            # Per user, and bookmarks do not invalidate the cache.
+            return self.list_page(request, *args, **kwargs)
+        return self.cached_list(self.list_page, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_retrieve(self.retrieve_book, request, *args, **kwargs)
+
+    @action(detail=False)
+    def facets(self, request, *args, **kwargs):
+        """
+        Number of books per author (the ``?limit=`` authors with the most
+        books) and per price bucket among the books the same filters and
+        search select in the list.
+        """
+        return self.cached_response(f'facets:{self.list_cache_prefix()}', self.facet_counts,
+                                    request, *args, **kwargs)
+
+    def facet_counts(self, request, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get(self.facet_limit_query_param, self.facet_limit))
+        except ValueError:
+            raise ValidationError({self.facet_limit_query_param: ['A valid integer is required.']})
+        limit = max(0, min(limit, self.max_facet_limit))
+        if self.is_filtered(request):
+            counts = facets.live_counts(self.filter_queryset(self.get_queryset()))
+        else:
+            counts = facets.stored_counts(BookFacet.objects.all())
+        with metrics.timed('serializer'):
+            data = facets.facet_response(counts, limit)
+        return Response(data)
+
+    def is_filtered(self, request):
+        params = set(self.filterset_class.base_filters) | {BookSearchFilter.search_param}
+        return any(request.query_params.get(param) for param in params)
+
+    def retrieve_book(self, request, *args, **kwargs):
+        instance = self.get_object()
+        with metrics.timed('serializer'):
+            data = self.get_serializer(instance).data
+        return Response(data, headers={'Last-Modified': http_date(instance.updated_at.timestamp())})
+
+    def sync_list(self, request):
+        """
+        The books changed and deleted since ``?since=<token>``, see shop.sync.
+        """
+        try:
+            data = sync.sync_page(self.list_serializer, request.query_params[self.since_query_param],
+                                  self.paginator.get_page_size(request))
+        except ValueError as error:
+            raise ValidationError({self.since_query_param: [str(error)]})
+        return Response(data)
+
+    def list_page(self, request, *args, **kwargs):
+        queryset = self.list_serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        with metrics.timed('serializer'):
+            data = list(self.list_serializer.to_representation(queryset if page is None else page))
+            if self.includes_my_relation(request):
+                self.attach_relations(request, data)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def includes_my_relation(self, request):
+        include = request.query_params.get(self.include_query_param, '')
+        return 'my_relation' in include.split(',')
+
+    def attach_relations(self, request, books):
+        """
+        Set ``my_relation`` on each book to the caller's like/bookmark/rate,
+        ``None`` without a relation, read for the whole page in one query.
+        """
+        relations = {}
+        if request.user.is_authenticated and books:
+            rows = UserBookRelation.objects.filter(
+                user=request.user, book__in=[book['id'] for book in books]
+            ).values_list('book_id', 'like', 'in_bookmarks', 'rate')
+            relations = {
+                book_id: {'like': like, 'in_bookmarks': in_bookmarks, 'rate': rate}
+                for book_id, like, in_bookmarks, rate in rows
+            }
+        for book in books:
+            book['my_relation'] = relations.get(book['id'])
+
+    def is_streaming(self, request):
+        return (isinstance(request.accepted_renderer, NDJSONRenderer) or
+                request.query_params.get(self.stream_query_param) in ('1', 'true'))
+
+    def stream_list(self, request):
+        """
+        Stream every matching book without pagination, reading the queryset
+        through a server-side cursor so memory use does not grow with the
+        number of rows.
+        """
+        # Read lazily after the view returns, once ReplicaMiddleware has reset
+        # the replica of the request: pick the database now.
+        queryset = self.filter_queryset(self.get_queryset()).using(router.db_for_read(Book))
+        queryset = self.list_serializer.values(queryset)
+        rows = self.list_serializer.to_representation(queryset.iterator(chunk_size=self.stream_chunk_size))
+
+        renderer = request.accepted_renderer
+        if hasattr(renderer, 'stream'):
+            content = renderer.stream(rows)
+        else:
+            content = stream_json_array(renderer, rows)
+        return StreamingHttpResponse(content, content_type=renderer.media_type)
 
     def perform_create(self, serializer):
         serializer.validated_data['owner'] = self.request.user
         serializer.save()
 
+    def get_bulk_create_kwargs(self, serializer):
+        return dict(serializer.validated_data, owner=self.request.user)
 
-class UserBookRelationView(UpdateModelMixin, GenericViewSet):
+
+class UserBookRelationView(metrics.TimedRenderMixin, UpdateModelMixin, GenericViewSet):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [RelationUserThrottle, RelationIPThrottle]
     queryset = UserBookRelation.objects.all()
     serializer_class = UserBookRelationSerializer
     lookup_field = 'book'
+    lookup_value_regex = r'\d+'
+    max_books = 1000
+
+    def list(self, request, *args, **kwargs):
+        """
+        The user's relations to ``?books=<id>,<id>,...``, or to every book
+        in their bookmarks with ``?bookmarks=1``. Books the user has no
+        relation to are left out. Changes still queued by write-behind are
+        not visible yet.
+        """
+        relations = self.get_queryset().filter(user=request.user)
+        books = request.query_params.get('books')
+        if books is not None:
+            try:
+                book_ids = {int(book_id) for book_id in books.split(',') if book_id}
+            except ValueError:
+                raise ValidationError({'books': ['Expected a comma separated list of book ids.']})
+            if len(book_ids) > self.max_books:
+                raise ValidationError({'books': [f'Ensure there are no more than {self.max_books} ids.']})
+            relations = relations.filter(book__in=book_ids)
+        elif request.query_params.get('bookmarks') in ('1', 'true'):
+            relations = relations.filter(in_bookmarks=True)
+        else:
+            raise ValidationError({'non_field_errors': ['Pass either ?books=<ids> or ?bookmarks=1.']})
+
+        with metrics.timed('serializer'):
+            data = self.get_serializer(relations.order_by('book'), many=True).data
+        return Response(data)
+
+    def update(self, request, *args, **kwargs):
+        """
+        Create or update the user's relation to the book in one upsert, or
+        queue the change if write-behind is enabled (see shop.writebehind).
+        Throttled per user and per IP, see shop.throttling.
+        """
+        partial = kwargs.pop('partial', False)
+        serializer = self.get_serializer(data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        book_id = int(self.kwargs['book'])
 
-    def get_object(self):
-        obj, _ = UserBookRelation.objects.get_or_create(user=self.request.user,
-                                                        book_id=self.kwargs['book'])
+        buffer = writebehind.get_buffer()
+        if buffer is not None:
+            buffer.add(request.user.id, book_id, serializer.validated_data)
+            return Response(dict(serializer.validated_data, book=book_id), status=status.HTTP_202_ACCEPTED)
 
-        return obj
+        relation = UserBookRelation.objects.upsert(request.user, book_id, **serializer.validated_data)
+        if relation is None:
+            raise NotFound()
+        serializer.instance = relation
+        with metrics.timed('serializer'):
+            data = serializer.data
+        return Response(data)
 
 
 def auth(request):
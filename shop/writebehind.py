@@ -0,0 +1,237 @@
+"""
+Write-behind buffer for the ``book_relation`` endpoint.
+
+With ``settings.RELATION_WRITE_BEHIND`` enabled, like/bookmark/rate PATCHes
+are answered with 202 Accepted as soon as they are validated and queued
+here. Queued changes are merged per ``(user, book)``, a later value of a
+field replacing an earlier one, and written with ``bulk_upsert()`` in one
+transaction every ``RELATION_WRITE_BEHIND_INTERVAL`` seconds or as soon as
+``RELATION_WRITE_BEHIND_BATCH_SIZE`` pairs are pending.
+
+The queue lives in memory. If ``RELATION_WRITE_BEHIND_DIR`` is set, every
+change is also appended to ``relations-<pid>.log`` in that directory before
+the request is answered, so changes survive a crash of the process: the
+``drain_relation_buffer`` command writes the logs of dead processes to the
+database. Without it, changes still queued when the process dies are lost.
+
+The buffer is flushed at interpreter exit. Servers that stop workers some
+other way should call ``shutdown()`` from their worker exit hook.
+"""
+import atexit
+import json
+import logging
+import os
+import shutil
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, transaction
+from django.dispatch import receiver
+
+from shop.models import UserBookRelation
+
+logger = logging.getLogger(__name__)
+
+LOG_PREFIX = 'relations-'
+LOG_SUFFIX = '.log'
+FLUSHING_SUFFIX = '.flushing'
+
+
+class RelationBuffer:
+    """
+    Pending relation changes, ``{(user_id, book_id): {field: value}}``,
+    optionally mirrored to an append-only log file at ``path``.
+
+    A flush moves the log aside to ``<path>.flushing`` together with the
+    pending changes it holds and deletes it once they are committed. If the
+    write fails, the changes are queued again under any newer ones and the
+    log is put back. A buffer opened on an existing log starts with the
+    changes it holds, which is how logs left by dead processes are drained.
+    """
+
+    def __init__(self, path=None, interval=1.0, batch_size=500, using=DEFAULT_DB_ALIAS):
+        self.path = path
+        self.interval = interval
+        self.batch_size = batch_size
+        self.using = using
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.pending = {}
+        self.log = None
+        self.thread = None
+        self.closed = False
+        if path is not None:
+            self.recover()
+
+    @property
+    def flushing_path(self):
+        return self.path + FLUSHING_SUFFIX
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, user_id, book_id, values):
+        with self.lock:
+            self.merge(user_id, book_id, values)
+            if self.path is not None:
+                if self.log is None:
+                    self.log = open(self.path, 'a', encoding='utf-8')
+                self.log.write(json.dumps([user_id, book_id, values]) + '\n')
+                self.log.flush()
+            full = len(self.pending) >= self.batch_size
+
+        if self.interval:
+            self.start()
+            if full:
+                self.wakeup.set()
+        elif full:
+            self.flush()
+
+    def merge(self, user_id, book_id, values):
+        key = (user_id, book_id)
+        self.pending[key] = {**self.pending.get(key, {}), **values}
+
+    def flush(self):
+        """
+        Write every pending change in one transaction. Returns the number of
+        ``(user, book)`` pairs written.
+        """
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+                if self.log is not None:
+                    self.log.close()
+                    self.log = None
+                    os.replace(self.path, self.flushing_path)
+            if not batch:
+                self.remove_flushing()
+                return 0
+
+            rows = [(user_id, book_id, values) for (user_id, book_id), values in batch.items()]
+            try:
+                with transaction.atomic(using=self.using):
+                    UserBookRelation.objects.db_manager(self.using).bulk_upsert(rows)
+            except Exception:
+                with self.lock:
+                    for key, values in batch.items():
+                        self.pending[key] = {**values, **self.pending.get(key, {})}
+                    self.restore_log()
+                raise
+            self.remove_flushing()
+            return len(batch)
+
+    def recover(self):
+        with self.lock:
+            self.restore_log()
+            if os.path.exists(self.path):
+                with open(self.path, encoding='utf-8') as log:
+                    for line in log:
+                        try:
+                            user_id, book_id, values = json.loads(line)
+                        except ValueError:
+                            # Torn last line of a process killed mid-write,
+                            # the request it belongs to was never answered.
+                            continue
+                        self.merge(user_id, book_id, values)
+
+    def restore_log(self):
+        """
+        Put the changes of a failed or interrupted flush back in front of
+        the changes logged since.
+        """
+        if self.path is None or not os.path.exists(self.flushing_path):
+            return
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+        restored = self.path + '.tmp'
+        with open(restored, 'wb') as out:
+            for path in (self.flushing_path, self.path):
+                if os.path.exists(path):
+                    with open(path, 'rb') as log:
+                        shutil.copyfileobj(log, out)
+        os.replace(restored, self.path)
+        os.remove(self.flushing_path)
+
+    def remove_flushing(self):
+        if self.path is not None and os.path.exists(self.flushing_path):
+            os.remove(self.flushing_path)
+
+    def start(self):
+        if self.thread is None and not self.closed:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name='relation-write-behind', daemon=True)
+                    self.thread.start()
+
+    def run(self):
+        while not self.closed:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Could not flush %d book relation changes, retrying later.', len(self))
+
+    def close(self):
+        """
+        Stop the flush thread and write whatever is still pending. The log is
+        removed once it is empty.
+        """
+        self.closed = True
+        self.wakeup.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.flush()
+        if self.path is not None and os.path.exists(self.path) and not self.pending:
+            os.remove(self.path)
+
+
+def log_path(directory, pid=None):
+    return os.path.join(directory, f'{LOG_PREFIX}{pid or os.getpid()}{LOG_SUFFIX}')
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """
+    The process' buffer, or ``None`` if write-behind is disabled.
+    """
+    global _buffer
+    if not getattr(settings, 'RELATION_WRITE_BEHIND', False):
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                directory = getattr(settings, 'RELATION_WRITE_BEHIND_DIR', None)
+                if directory is not None:
+                    os.makedirs(directory, exist_ok=True)
+                _buffer = RelationBuffer(
+                    path=log_path(directory) if directory else None,
+                    interval=getattr(settings, 'RELATION_WRITE_BEHIND_INTERVAL', 1.0),
+                    batch_size=getattr(settings, 'RELATION_WRITE_BEHIND_BATCH_SIZE', 500),
+                )
+    return _buffer
+
+
+@atexit.register
+def shutdown():
+    """
+    Flush and close the process' buffer, if any.
+    """
+    global _buffer
+    with _buffer_lock:
+        buffer, _buffer = _buffer, None
+    if buffer is not None:
+        buffer.close()
+
+
+@receiver(setting_changed)
+def reset_buffer(setting, **kwargs):
+    if setting.startswith('RELATION_WRITE_BEHIND'):
+        shutdown()